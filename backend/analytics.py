@@ -0,0 +1,217 @@
+"""
+Revenue and funnel analytics kept as daily rollups.
+
+``analytics_daily`` holds one document per (day, dimension, key), e.g.
+('2026-03-02', 'package', 'premium'), with counters:
+
+* checkouts      - checkout sessions created
+* activations    - subscriptions activated by the Stripe webhook
+* cancellations  - subscriptions cancelled
+* mrr_delta      - change in monthly recurring revenue (cents) that day
+* one_time       - one-time revenue collected (cents)
+* audits         - free audits requested (funnel only)
+
+Dimensions: 'package', 'addon' (one row per add-on in the bundle), 'category'
+(Premium included category), 'status' (transitions into a status) and
+'funnel' (key 'all'). Rows are maintained with ``$inc`` upserts when a checkout
+is created, a webhook changes a subscription or an audit is requested, and
+``backfill`` rebuilds them from ``subscriptions`` and ``free_audits`` with
+aggregation pipelines. Reads only touch the pre-aggregated rows.
+
+Recording never raises: a failed rollup update is logged and counted
+(analytics.errors) and can be repaired with a backfill.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import PyMongoError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('package', 'addon', 'category', 'status', 'funnel')
+
+Row = Tuple[str, str, Dict[str, int]]  # (dimension, key, counters)
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _subscription_rows(subscription: dict, counter: str, revenue: int = 0) -> List[Row]:
+    """Rollup rows touched when ``counter`` happens to a subscription; revenue is +1/-1 for MRR changes"""
+    rows: List[Row] = [('funnel', 'all', {counter: 1})]
+    package_counters = {counter: 1}
+    if revenue:
+        package_counters['mrr_delta'] = revenue * subscription.get('total_monthly', 0)
+        if revenue > 0 and subscription.get('total_one_time'):
+            package_counters['one_time'] = subscription['total_one_time']
+    if subscription.get('package'):
+        rows.append(('package', subscription['package'], package_counters))
+    for code in subscription.get('addons') or []:
+        rows.append(('addon', code, {counter: 1}))
+    if subscription.get('included_category'):
+        rows.append(('category', subscription['included_category'], {counter: 1}))
+    return rows
+
+
+class Analytics:
+    def __init__(self, collection, subscriptions=None, audits=None):
+        self.collection = collection
+        self.subscriptions = subscriptions
+        self.audits = audits
+
+    def index_models(self) -> List[IndexModel]:
+        return [IndexModel([('dimension', ASCENDING), ('day', ASCENDING)])]
+
+    @staticmethod
+    def _update(day: str, dimension: str, key: str, counters: Dict[str, int]) -> UpdateOne:
+        return UpdateOne(
+            {'_id': f"{day}|{dimension}|{key}"},
+            {'$inc': counters, '$setOnInsert': {'day': day, 'dimension': dimension, 'key': key}},
+            upsert=True
+        )
+
+    async def _apply(self, rows: Iterable[Row], day: Optional[str] = None):
+        day = day or today()
+        updates = [self._update(day, dimension, key, counters) for dimension, key, counters in rows]
+        if not updates:
+            return
+        try:
+            await self.collection.bulk_write(updates, ordered=False)
+            metrics.inc('analytics.updates', len(updates))
+        except PyMongoError as e:
+            metrics.inc('analytics.errors')
+            logger.error(f"Analytics rollup update failed: {e}")
+
+    async def record_checkout(self, subscription: dict):
+        await self._apply(_subscription_rows(subscription, 'checkouts'))
+
+    async def record_activation(self, subscription: dict):
+        await self._apply(_subscription_rows(subscription, 'activations', revenue=1) + [
+            ('status', 'active', {'activations': 1})
+        ])
+
+    async def record_cancellation(self, subscription: dict):
+        await self._apply(_subscription_rows(subscription, 'cancellations', revenue=-1) + [
+            ('status', 'cancelled', {'cancellations': 1})
+        ])
+
+    async def record_audit(self, audit: dict):
+        await self._apply([('funnel', 'all', {'audits': 1})])
+
+    # -- backfill ---------------------------------------------------------
+
+    @staticmethod
+    def _day(*fields: str) -> dict:
+        """YYYY-MM-DD of the first present ISO timestamp field"""
+        value = f"${fields[-1]}"
+        for field in reversed(fields[:-1]):
+            value = {'$ifNull': [f"${field}", value]}
+        return {'$substr': [value, 0, 10]}
+
+    async def _group(self, collection, match: dict, day: dict, dimension: str, key, counters: Dict[str, object],
+                     unwind: Optional[str] = None) -> List[UpdateOne]:
+        pipeline = [{'$match': match}]
+        if unwind:
+            pipeline.append({'$unwind': f"${unwind}"})
+        pipeline.append({'$group': {
+            '_id': {'day': day, 'key': key},
+            **{name: {'$sum': value} for name, value in counters.items()}
+        }})
+        updates = []
+        async for group in collection.aggregate(pipeline):
+            values = {name: group[name] for name in counters if group[name]}
+            if values and group['_id']['key'] is not None:
+                updates.append(self._update(group['_id']['day'], dimension, group['_id']['key'], values))
+        return updates
+
+    async def backfill(self) -> int:
+        """
+        Rebuild every rollup row from the source collections; returns the
+        number of rows. Updates recorded while it runs may be lost, so run it
+        when traffic is quiet.
+        """
+        subs = self.subscriptions
+        created = self._day('created_at')
+        activated = self._day('activated_at', 'updated_at')
+        cancelled = self._day('cancelled_at', 'updated_at')
+        checked_out = {'status': {'$ne': 'failed'}, 'stripe_session_id': {'$type': 'string'}}
+        was_active = {'status': {'$in': ['active', 'cancelled']}}
+        is_cancelled = {'status': 'cancelled'}
+
+        updates: List[UpdateOne] = []
+        for counter, match, day, revenue in (
+            ('checkouts', checked_out, created, 0),
+            ('activations', was_active, activated, 1),
+            ('cancellations', is_cancelled, cancelled, -1),
+        ):
+            package_counters = {counter: 1}
+            if revenue:
+                package_counters['mrr_delta'] = {'$multiply': ['$total_monthly', revenue]}
+            if revenue > 0:
+                package_counters['one_time'] = '$total_one_time'
+            updates += await self._group(subs, match, day, 'funnel', 'all', {counter: 1})
+            updates += await self._group(subs, match, day, 'package', '$package', package_counters)
+            updates += await self._group(subs, match, day, 'addon', '$addons', {counter: 1}, unwind='addons')
+            updates += await self._group(subs, {**match, 'included_category': {'$type': 'string'}}, day,
+                                         'category', '$included_category', {counter: 1})
+        updates += await self._group(subs, was_active, activated, 'status', 'active', {'activations': 1})
+        updates += await self._group(subs, is_cancelled, cancelled, 'status', 'cancelled', {'cancellations': 1})
+        updates += await self._group(self.audits, {}, created, 'funnel', 'all', {'audits': 1})
+
+        await self.collection.delete_many({})
+        if updates:
+            await self.collection.bulk_write(updates, ordered=False)
+        rows = await self.collection.count_documents({})
+        metrics.inc('analytics.backfills')
+        logger.info(f"Analytics backfill rebuilt {rows} rollup rows")
+        return rows
+
+    # -- reads ------------------------------------------------------------
+
+    async def daily(self, dimension: str, since: str = '', until: str = '9999') -> List[dict]:
+        return await self.collection.find(
+            {'dimension': dimension, 'day': {'$gte': since, '$lte': until}}, {'_id': 0}
+        ).sort([('day', ASCENDING)]).to_list(None)
+
+    async def summary(self, days: int = 30) -> dict:
+        """Headline numbers: MRR (all time), and per-package, add-on, category and funnel totals for the window"""
+        since = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+        totals: Dict[str, Dict[str, Dict[str, int]]] = {d: defaultdict(lambda: defaultdict(int)) for d in DIMENSIONS}
+        mrr_by_package: Dict[str, int] = defaultdict(int)
+        # MRR needs every package row; everything else only the window
+        async for row in self.collection.find({'dimension': 'package'}, {'_id': 0, 'key': 1, 'mrr_delta': 1}):
+            mrr_by_package[row['key']] += row.get('mrr_delta', 0)
+        async for row in self.collection.find({'dimension': {'$in': list(DIMENSIONS)}, 'day': {'$gte': since}}, {'_id': 0}):
+            for name, value in row.items():
+                if name not in ('day', 'dimension', 'key'):
+                    totals[row['dimension']][row['key']][name] += value
+
+        funnel = totals['funnel']['all']
+        activations = funnel['activations']
+        return {
+            'since': since,
+            'days': days,
+            'mrr': sum(mrr_by_package.values()),
+            'mrr_by_package': dict(mrr_by_package),
+            'packages': {key: dict(values) for key, values in totals['package'].items()},
+            'addon_attach_rates': {
+                key: round(values['activations'] / activations, 4) if activations else 0.0
+                for key, values in totals['addon'].items()
+            },
+            'category_mix': {key: values['activations'] for key, values in totals['category'].items()},
+            'funnel': {
+                'audits': funnel['audits'],
+                'checkouts': funnel['checkouts'],
+                'activations': activations,
+                'cancellations': funnel['cancellations'],
+                'audit_to_checkout': round(funnel['checkouts'] / funnel['audits'], 4) if funnel['audits'] else 0.0,
+                'checkout_to_activation': round(activations / funnel['checkouts'], 4) if funnel['checkouts'] else 0.0,
+            },
+        }
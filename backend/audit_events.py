@@ -0,0 +1,130 @@
+"""
+In-process pub/sub for audit progress (used by the SSE endpoint).
+
+The audit pipeline publishes stage transitions and LLM tokens under the
+audit id; every watcher of that audit gets its own queue and first receives
+the history published so far, so any number of watchers share one
+generation and late joiners still see the whole answer. A topic is closed by a terminal
+event (published by the pipeline, or passed to ``close`` when a watcher reads
+it from the database) and then kept for ``retention_seconds``. A topic that
+never closes, e.g. when the job runs in another process, is dropped after
+``ttl_seconds`` unless someone is still watching it.
+
+Events are dicts: {'event': 'stage' | 'token' | 'done' | 'error', 'data': {...}}.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ('done', 'error')
+
+
+class _Topic:
+    def __init__(self):
+        self.history: List[dict] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.closed = False
+        self.expiry: Optional[asyncio.TimerHandle] = None
+
+
+class AuditEventBus:
+    def __init__(self, retention_seconds: float = 600, ttl_seconds: float = 3600, history_limit: int = 20000):
+        self.retention_seconds = retention_seconds
+        self.ttl_seconds = ttl_seconds
+        self.history_limit = history_limit
+        self._topics: Dict[str, _Topic] = {}
+
+    def _topic(self, key: str) -> _Topic:
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = self._topics[key] = _Topic()
+            self._expire_in(key, topic, self.ttl_seconds)
+        return topic
+
+    def _expire_in(self, key: str, topic: _Topic, seconds: float):
+        if topic.expiry is not None:
+            topic.expiry.cancel()
+        topic.expiry = asyncio.get_running_loop().call_later(seconds, self._expire, key, topic)
+
+    def _expire(self, key: str, topic: _Topic):
+        if topic.subscribers and not topic.closed:
+            self._expire_in(key, topic, self.ttl_seconds)
+        elif self._topics.get(key) is topic:
+            del self._topics[key]
+
+    def publish(self, key: str, event: str, **data):
+        """Fan an event out to every watcher of ``key`` (never blocks)"""
+        topic = self._topic(key)
+        if topic.closed:
+            return
+        message = {'event': event, 'data': data}
+        if len(topic.history) < self.history_limit:
+            topic.history.append(message)
+        for queue in topic.subscribers:
+            queue.put_nowait(message)
+        metrics.inc('audit_events.published')
+        if event in TERMINAL_EVENTS:
+            topic.closed = True
+            self._expire_in(key, topic, self.retention_seconds)
+
+    def publish_text(self, key: str, streamed: str, text: str):
+        """
+        Make watchers end up with ``text`` when tokens published so far
+        (``streamed``) differ from it, e.g. a cached answer or a fallback after
+        a stream that broke off: a 'generating' stage resets what they have.
+        """
+        if streamed == text:
+            return
+        if streamed:
+            self.publish(key, 'stage', stage='generating')
+        self.publish(key, 'token', text=text)
+
+    def close(self, key: str, message: dict):
+        """Close ``key`` with a terminal event learned elsewhere; a no-op if nobody holds the topic"""
+        if key in self._topics:
+            self.publish(key, message['event'], **message['data'])
+
+    def history(self, key: str) -> List[dict]:
+        topic = self._topics.get(key)
+        return list(topic.history) if topic else []
+
+    def watchers(self, key: str) -> int:
+        topic = self._topics.get(key)
+        return len(topic.subscribers) if topic else 0
+
+    async def subscribe(self, key: str, idle_timeout: Optional[float] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Yield the history, then live events until a terminal one. If
+        ``idle_timeout`` is set, None is yielded after that many seconds
+        without events (lets the caller send keep-alives or poll elsewhere).
+        """
+        topic = self._topic(key)
+        queue: asyncio.Queue = asyncio.Queue()
+        for message in topic.history:
+            queue.put_nowait(message)
+        if not topic.closed:
+            topic.subscribers.add(queue)
+        metrics.add_gauge('audit_events.watchers', 1)
+        try:
+            while True:
+                if topic.closed and queue.empty():
+                    return
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield message
+                if message['event'] in TERMINAL_EVENTS:
+                    return
+        finally:
+            topic.subscribers.discard(queue)
+            if not topic.subscribers and not topic.history and self._topics.get(key) is topic:
+                topic.expiry.cancel()
+                del self._topics[key]
+            metrics.add_gauge('audit_events.watchers', -1)
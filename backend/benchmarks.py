@@ -0,0 +1,186 @@
+"""
+Peer benchmarking of audit marketing scores by sector and area.
+
+``score_benchmarks`` holds one score distribution per peer group:
+(sector, geoArea), (sector, '*'), ('*', geoArea) and ('*', '*'). Scores are
+integers 0-10, so a distribution is kept exactly as an 11-bin histogram
+(``counts``, keyed by score) rather than an approximate quantile sketch; it is
+just as small and mergeable, and percentiles come out exact.
+
+``record`` adds a score to its four groups with ``$inc`` upserts when an
+evaluation is generated. The generate stage may run again for the same audit
+(a retried job), so ``record`` first sets ``benchmark_recorded`` on the audit
+with a conditional update and only counts the score if it flipped the flag. ``lookup`` reads those four documents by ``_id`` and
+answers from the most specific group with at least ``min_peers`` scores, so
+sending an email never scans ``free_audits``. ``rebuild`` recomputes every
+group from ``free_audits`` in one pass with NumPy.
+
+Recording never raises: a failed update is logged and counted
+(benchmarks.errors) and can be repaired with a rebuild. A score whose flag
+was set but whose ``$inc`` failed is missing until then, never counted twice.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_SCORE = 10
+ANY = '*'
+
+# Most specific first; the scope names the peer group a percentile refers to
+SCOPES = ('sector_area', 'sector', 'area', 'all')
+
+
+def group_keys(sector: str, area: str) -> Dict[str, tuple]:
+    return {
+        'sector_area': (sector, area),
+        'sector': (sector, ANY),
+        'area': (ANY, area),
+        'all': (ANY, ANY),
+    }
+
+
+def group_id(sector: str, area: str) -> str:
+    return f"{sector}|{area}"
+
+
+def percentile(counts: Dict[str, int], total: int, score: int) -> int:
+    """Share of the group scoring below ``score``, counting ties as half (0-100)"""
+    below = sum(n for value, n in counts.items() if int(value) < score)
+    return round(100 * (below + counts.get(str(score), 0) / 2) / total)
+
+
+class ScoreBenchmarks:
+    def __init__(self, collection, audits=None, min_peers: int = 20):
+        self.collection = collection
+        self.audits = audits
+        self.min_peers = min_peers
+
+    async def record(self, audit: dict):
+        score = audit.get('marketing_score')
+        if score is None or not audit.get('sector') or not audit.get('geoArea'):
+            return
+        try:
+            if not await self._claim(audit):
+                metrics.inc('benchmarks.duplicate')
+                return
+        except PyMongoError as e:
+            metrics.inc('benchmarks.errors')
+            logger.error(f"Benchmark update failed for audit {audit.get('id')}: {e}")
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        updates = [
+            UpdateOne(
+                {'_id': group_id(sector, area)},
+                {
+                    '$inc': {f"counts.{int(score)}": 1, 'total': 1},
+                    '$set': {'updated_at': now},
+                    '$setOnInsert': {'sector': sector, 'geoArea': area},
+                },
+                upsert=True
+            )
+            for sector, area in group_keys(audit['sector'], audit['geoArea']).values()
+        ]
+        try:
+            await self.collection.bulk_write(updates, ordered=False)
+            metrics.inc('benchmarks.recorded')
+        except PyMongoError as e:
+            metrics.inc('benchmarks.errors')
+            logger.error(f"Benchmark update failed for audit {audit.get('id')}: {e}")
+
+    async def _claim(self, audit: dict) -> bool:
+        """Mark the audit as counted; False if an earlier run already did"""
+        if self.audits is None or not audit.get('id'):
+            return True
+        result = await self.audits.update_one(
+            {'id': audit['id'], 'benchmark_recorded': {'$ne': True}},
+            {'$set': {'benchmark_recorded': True}}
+        )
+        return result.modified_count == 1
+
+    async def lookup(self, sector: str, area: str, score: int) -> Optional[dict]:
+        """Percentile of ``score`` in the most specific group with enough peers, or None"""
+        keys = group_keys(sector, area)
+        ids = {group_id(*key): scope for scope, key in keys.items()}
+        docs = {
+            ids[doc['_id']]: doc
+            async for doc in self.collection.find({'_id': {'$in': list(ids)}}, {'counts': 1, 'total': 1})
+        }
+        for scope in SCOPES:
+            doc = docs.get(scope)
+            if doc and doc.get('total', 0) >= self.min_peers:
+                return {
+                    'percentile': percentile(doc['counts'], doc['total'], int(score)),
+                    'scope': scope,
+                    'sector': sector,
+                    'geoArea': area,
+                    'peer_count': doc['total'],
+                }
+        return None
+
+    # -- rebuild ----------------------------------------------------------
+
+    async def rebuild(self, batch_size: int = 5000) -> int:
+        """
+        Recompute every group from the scored audits; returns the number of
+        groups. Scores recorded while it runs may be lost, so run it when
+        traffic is quiet.
+        """
+        sectors: Dict[str, int] = {}
+        areas: Dict[str, int] = {}
+        sector_codes: List[int] = []
+        area_codes: List[int] = []
+        scores: List[int] = []
+        cursor = self.audits.find(
+            {'marketing_score': {'$type': 'number'}, 'sector': {'$type': 'string'}, 'geoArea': {'$type': 'string'}},
+            {'_id': 0, 'sector': 1, 'geoArea': 1, 'marketing_score': 1}
+        ).batch_size(batch_size)
+        async for doc in cursor:
+            sector_codes.append(sectors.setdefault(doc['sector'], len(sectors)))
+            area_codes.append(areas.setdefault(doc['geoArea'], len(areas)))
+            scores.append(doc['marketing_score'])
+
+        # counts[sector, area, score]; the wider groups are sums over its axes
+        counts = np.zeros((len(sectors), len(areas), MAX_SCORE + 1), dtype=np.int64)
+        np.add.at(counts, (
+            np.array(sector_codes, dtype=np.intp),
+            np.array(area_codes, dtype=np.intp),
+            np.clip(np.array(scores, dtype=np.int64), 0, MAX_SCORE),
+        ), 1)
+        by_sector = counts.sum(axis=1)
+        by_area = counts.sum(axis=0)
+
+        groups = {group_id(ANY, ANY): (ANY, ANY, counts.sum(axis=(0, 1)))} if scores else {}
+        for sector, i in sectors.items():
+            groups[group_id(sector, ANY)] = (sector, ANY, by_sector[i])
+        for area, j in areas.items():
+            groups[group_id(ANY, area)] = (ANY, area, by_area[j])
+            for sector, i in sectors.items():
+                if counts[i, j].any():
+                    groups[group_id(sector, area)] = (sector, area, counts[i, j])
+
+        now = datetime.now(timezone.utc).isoformat()
+        replacements = [
+            ReplaceOne({'_id': _id}, {
+                'sector': sector,
+                'geoArea': area,
+                'counts': {str(score): int(n) for score, n in enumerate(histogram) if n},
+                'total': int(histogram.sum()),
+                'updated_at': now,
+            }, upsert=True)
+            for _id, (sector, area, histogram) in groups.items()
+        ]
+        if replacements:
+            await self.collection.bulk_write(replacements, ordered=False)
+        await self.collection.delete_many({'_id': {'$nin': list(groups)}})
+        metrics.inc('benchmarks.rebuilds')
+        logger.info(f"Benchmarks rebuilt from {len(scores)} audits into {len(replacements)} groups")
+        return len(replacements)
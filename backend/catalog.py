@@ -0,0 +1,137 @@
+"""
+Product catalog with pre-serialised, ETag-cached public responses.
+
+``Catalog`` holds an immutable snapshot: the PricingEngine for checkouts and
+the /config/addons body already serialised to bytes with a strong ETag. A
+request is answered with those bytes (or a 304 when the client's
+If-None-Match matches), so a catalog hit does no work at all.
+
+The catalog can be hot-reloaded from a JSON file or a MongoDB document
+({'packages': ..., 'addons': ..., 'validCategories': ...}, the same shape as
+the built-in dicts in server.py). ``watch`` polls the source and, when it
+changed, builds a complete new snapshot and swaps it in with one assignment;
+a source that fails to load is logged and the current snapshot stays.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from fastapi.responses import Response
+
+from metrics import metrics
+from pricing import PricingEngine
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class CachedJson(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def cached_json(payload: Any) -> CachedJson:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return CachedJson(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(','))
+    return any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def json_response(cached: CachedJson, if_none_match: Optional[str], max_age: int) -> Response:
+    headers = {'ETag': cached.etag, 'Cache-Control': f"public, max-age={max_age}"}
+    if etag_matches(if_none_match, cached.etag):
+        metrics.inc('catalog.not_modified')
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type='application/json', headers=headers)
+
+
+class CatalogSnapshot(NamedTuple):
+    pricing: PricingEngine
+    addons_config: CachedJson
+
+
+def build_snapshot(packages: dict, addons: dict, valid_categories: list) -> CatalogSnapshot:
+    try:
+        pricing = PricingEngine(packages, addons, valid_categories)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise CatalogError(f"Invalid catalog: {e!r}") from e
+    return CatalogSnapshot(pricing, cached_json(pricing.addons_config))
+
+
+class Catalog:
+    def __init__(self, packages: dict, addons: dict, valid_categories: list, max_age: int = 300):
+        self.max_age = max_age
+        self.current = build_snapshot(packages, addons, valid_categories)
+        self._stamp = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pricing(self) -> PricingEngine:
+        return self.current.pricing
+
+    def addons_response(self, if_none_match: Optional[str]) -> Response:
+        return json_response(self.current.addons_config, if_none_match, self.max_age)
+
+    def load(self, data: dict):
+        """Swap in a catalog given as {'packages', 'addons', 'validCategories'}"""
+        try:
+            snapshot = build_snapshot(data['packages'], data['addons'], data['validCategories'])
+        except KeyError as e:
+            raise CatalogError(f"Catalog is missing {e}") from e
+        changed = snapshot.addons_config.etag != self.current.addons_config.etag
+        self.current = snapshot
+        metrics.inc('catalog.reloads')
+        logger.info(f"Catalog reloaded (etag {snapshot.addons_config.etag}, changed={changed})")
+
+    async def reload_file(self, path: str) -> bool:
+        """Reload from a JSON file if its modification time changed"""
+        stamp = os.stat(path).st_mtime_ns
+        if stamp == self._stamp:
+            return False
+        with open(path, encoding='utf-8') as f:
+            self.load(json.load(f))
+        self._stamp = stamp
+        return True
+
+    async def reload_collection(self, collection, doc_id: str = 'catalog') -> bool:
+        """Reload from a MongoDB document if its ``updated_at`` changed"""
+        doc = await collection.find_one({'_id': doc_id})
+        if doc is None or doc.get('updated_at') == self._stamp:
+            return False
+        self.load(doc)
+        self._stamp = doc.get('updated_at')
+        return True
+
+    async def _watch(self, reload: Callable[[], Awaitable[bool]], interval: float):
+        while True:
+            try:
+                await reload()
+            except Exception as e:
+                logger.error(f"Catalog reload failed, keeping the current catalog: {e}")
+            await asyncio.sleep(interval)
+
+    def watch(self, reload: Callable[[], Awaitable[bool]], interval: float = 30):
+        self._task = asyncio.create_task(self._watch(reload, interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
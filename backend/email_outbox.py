@@ -0,0 +1,240 @@
+"""
+Durable email outbox.
+
+Request handlers and workers call ``EmailOutbox.enqueue`` which only inserts a
+document into ``email_outbox``. A dispatcher loop claims due messages in
+batches and delivers them:
+
+* messages without attachments go through the transport's batch call (Resend's
+  batch endpoint, up to 100 per request), the rest are sent individually and
+  concurrently (see email_transport.py); if a batch call fails its messages
+  are sent individually, so one rejected message only fails itself;
+* every provider request takes a token from a token bucket sized to the
+  provider rate limit;
+* failures are retried with exponential backoff until ``max_attempts``;
+* a claim is a lease, so messages held by a crashed worker are picked up
+  again once it expires. A delivery that cannot be recorded is logged and
+  counted (email_outbox.unrecorded) but never marked failed, which would
+  retry it straight away.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from metrics import metrics
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+RESEND_BATCH_LIMIT = 100
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class EmailOutbox:
+    def __init__(
+        self,
+        collection,
+        transport,
+        sender_address: str,
+        rate_per_second: float = 2,
+        batch_size: int = RESEND_BATCH_LIMIT,
+        max_attempts: int = 6,
+        retry_base_seconds: int = 30,
+        lease_seconds: int = 120,
+        poll_interval: float = 1.0,
+    ):
+        self.collection = collection
+        self.transport = transport
+        self.sender_address = sender_address
+        self.bucket = TokenBucket(rate_per_second)
+        self.batch_size = min(batch_size, RESEND_BATCH_LIMIT)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def index_models(self) -> List[IndexModel]:
+        return [
+            IndexModel([('status', 1), ('next_attempt_at', 1)]),
+            IndexModel([('claim', 1)]),
+        ]
+
+    async def enqueue(
+        self,
+        to: str,
+        subject: str,
+        html: str,
+        attachments: Optional[List[dict]] = None,
+        message_id: Optional[str] = None,
+    ) -> str:
+        """
+        Queue a message for delivery. attachments are Resend-style dicts:
+        {"filename": ..., "content": <base64 str>}. Passing a deterministic
+        message_id makes enqueueing idempotent (as in JobQueue.enqueue), so a
+        retried job or event handler does not send the message twice.
+        """
+        now = utcnow()
+        doc = {
+            '_id': message_id or str(uuid.uuid4()),
+            'message': {
+                'from': self.sender_address,
+                'to': [to],
+                'subject': subject,
+                'html': html,
+            },
+            'status': 'queued',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+        }
+        if attachments:
+            doc['message']['attachments'] = attachments
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            logger.info(f"Email {doc['_id']} already queued")
+            metrics.inc('email_outbox.duplicates')
+            return doc['_id']
+        metrics.inc('email_outbox.enqueued')
+        self._wakeup.set()
+        return doc['_id']
+
+    async def claim_batch(self) -> List[dict]:
+        """Claim up to batch_size due messages (three round trips regardless of batch size)"""
+        now = utcnow()
+        due = {'$or': [
+            {'status': 'queued', 'next_attempt_at': {'$lte': now}},
+            {'status': 'sending', 'next_attempt_at': {'$lte': now}},  # lease expired
+        ]}
+        ids = [doc['_id'] async for doc in self.collection.find(due, {'_id': 1}).sort('next_attempt_at', 1).limit(self.batch_size)]
+        if not ids:
+            return []
+        claim = str(uuid.uuid4())
+        await self.collection.update_many(
+            {'_id': {'$in': ids}, **due},
+            {
+                '$set': {
+                    'status': 'sending',
+                    'claim': claim,
+                    'next_attempt_at': now + timedelta(seconds=self.lease_seconds),
+                },
+                '$inc': {'attempts': 1},
+            }
+        )
+        return await self.collection.find({'claim': claim}).to_list(self.batch_size)
+
+    async def _mark_sent(self, doc_ids: List[str], provider_ids: List[str]):
+        now = utcnow()
+        await self.collection.bulk_write([
+            UpdateOne(
+                {'_id': doc_id},
+                {'$set': {'status': 'sent', 'sent_at': now, 'provider_id': provider_id},
+                 '$unset': {'claim': ''}}
+            )
+            for doc_id, provider_id in zip(doc_ids, provider_ids)
+        ], ordered=False)
+        metrics.inc('email_outbox.sent', len(doc_ids))
+
+    async def _mark_failed(self, docs: List[dict], error: Exception):
+        now = utcnow()
+        updates = []
+        for doc in docs:
+            attempts = doc['attempts']
+            if attempts >= self.max_attempts:
+                update = {'status': 'failed'}
+                metrics.inc('email_outbox.failed')
+                logger.error(f"Giving up on email {doc['_id']} to {doc['message']['to']}: {error}")
+            else:
+                update = {
+                    'status': 'queued',
+                    'next_attempt_at': now + timedelta(seconds=self.retry_base_seconds * 2 ** (attempts - 1)),
+                }
+                metrics.inc('email_outbox.retried')
+            update['last_error'] = str(error)
+            updates.append(UpdateOne({'_id': doc['_id']}, {'$set': update, '$unset': {'claim': ''}}))
+        await self.collection.bulk_write(updates, ordered=False)
+
+    async def _record_sent(self, docs: List[dict], provider_ids: List[str]):
+        try:
+            await self._mark_sent([doc['_id'] for doc in docs], provider_ids)
+        except Exception as e:
+            # Delivered already: leave the claim to its lease rather than retrying now
+            metrics.inc('email_outbox.unrecorded', len(docs))
+            logger.error(f"Sent {len(docs)} email(s) but could not record the delivery: {e}")
+
+    async def _send_single(self, doc: dict):
+        await self.bucket.acquire()
+        try:
+            provider_id = await self.transport.send(doc['message'])
+        except Exception as e:
+            logger.error(f"Failed to send email to {doc['message']['to']}: {e}")
+            await self._mark_failed([doc], e)
+            return
+        await self._record_sent([doc], [provider_id])
+
+    async def _send_batch(self, docs: List[dict]):
+        await self.bucket.acquire()
+        try:
+            provider_ids = await self.transport.send_batch([doc['message'] for doc in docs])
+        except Exception as e:
+            # The provider rejects the whole batch for one bad message: find it by sending one by one
+            logger.warning(f"Email batch of {len(docs)} failed, sending individually: {e}")
+            metrics.inc('email_outbox.batch_fallbacks')
+            await asyncio.gather(*(self._send_single(doc) for doc in docs))
+            return
+        await self._record_sent(docs, provider_ids)
+
+    async def dispatch_once(self) -> int:
+        """Deliver one batch of due messages. Returns how many were claimed."""
+        docs = await self.claim_batch()
+        if not docs:
+            return 0
+
+        batchable = [doc for doc in docs if not doc['message'].get('attachments')]
+        single = [doc for doc in docs if doc['message'].get('attachments')]
+
+        if len(batchable) > 1:
+            await self._send_batch(batchable)
+        else:
+            single = batchable + single
+
+        if single:
+            await asyncio.gather(*(self._send_single(doc) for doc in single))
+
+        return len(docs)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Email dispatcher error: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
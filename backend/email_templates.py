@@ -0,0 +1,240 @@
+"""
+Precompiled email templates with locale variants.
+
+Templates live in templates/email/*.html, translations in
+templates/email/locales/<locale>.json. Everything that does not depend on the
+recipient is resolved once, when the engine is built:
+
+1. ``[[key.path]]`` markers are replaced with the locale's strings;
+2. the ``<style>`` block is inlined into ``style=""`` attributes (rules with
+   pseudo-classes such as ``:hover`` stay in a reduced ``<style>`` block);
+3. the result is compiled into a list of render functions.
+
+Rendering then only fills the per-recipient values, with a small mustache
+subset: ``{{name}}`` (HTML-escaped), ``{{{name}}}`` (raw), ``{{#name}}..{{/name}}``
+(rendered if truthy; repeated per item for lists, with ``{{.}}`` as the item)
+and ``{{^name}}..{{/name}}`` (rendered if falsy).
+"""
+
+import html
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).parent / 'templates' / 'email'
+DEFAULT_LOCALE = 'it'
+
+_I18N_RE = re.compile(r'\[\[([\w.]+)\]\]')
+_STYLE_BLOCK_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_CSS_RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+_START_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>')
+_CLASS_ATTR_RE = re.compile(r'\sclass="([^"]*)"')
+_STYLE_ATTR_RE = re.compile(r'\sstyle="([^"]*)"')
+_TAG_RE = re.compile(r'\{\{\{\s*([\w.]+)\s*\}\}\}|\{\{\s*([#^/]?)\s*([\w.]+)\s*\}\}')
+
+Renderer = Callable[[dict, List[str]], None]
+
+
+class TemplateError(ValueError):
+    pass
+
+
+# ------------------------------------------------------------
+# Build time: locale strings and CSS inlining
+# ------------------------------------------------------------
+
+def _lookup(strings: dict, path: str):
+    value = strings
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(path)
+        value = value[part]
+    return value
+
+
+def _parse_declarations(block: str) -> List[Tuple[str, str]]:
+    declarations = []
+    for item in block.split(';'):
+        if ':' in item:
+            prop, value = item.split(':', 1)
+            declarations.append((prop.strip(), value.strip()))
+    return declarations
+
+
+def inline_css(source: str) -> str:
+    """
+    Move <style> rules into style attributes. Supports tag, .class and
+    tag.class selectors (comma-separated lists allowed); anything else is
+    kept in a <style> block. Existing inline styles win over stylesheet rules.
+    """
+    match = _STYLE_BLOCK_RE.search(source)
+    if not match:
+        return source
+
+    rules = []      # (specificity, order, tag, class, declarations)
+    leftover = []
+    for order, (selectors, body) in enumerate(_CSS_RULE_RE.findall(match.group(1))):
+        declarations = _parse_declarations(body)
+        for selector in (s.strip() for s in selectors.split(',')):
+            simple = re.fullmatch(r'([a-zA-Z][a-zA-Z0-9]*)?(?:\.([\w-]+))?', selector)
+            if selector and simple:
+                tag, cls = simple.groups()
+                rules.append(((1 if cls else 0) + (1 if tag and cls else 0), order, tag, cls, declarations))
+            else:
+                leftover.append(f"{selector} {{ {body.strip()} }}")
+    rules.sort(key=lambda rule: (rule[0], rule[1]))
+
+    def apply(tag_match):
+        tag, attrs, self_closing = tag_match.group(1), tag_match.group(2) or '', tag_match.group(3)
+        class_match = _CLASS_ATTR_RE.search(attrs)
+        classes = set(class_match.group(1).split()) if class_match else set()
+
+        styles: Dict[str, str] = {}
+        for _, _, rule_tag, rule_class, declarations in rules:
+            if (rule_tag is None or rule_tag.lower() == tag.lower()) and (rule_class is None or rule_class in classes):
+                styles.update(declarations)
+        if not styles:
+            return tag_match.group(0)
+
+        style_match = _STYLE_ATTR_RE.search(attrs)
+        if style_match:
+            styles.update(_parse_declarations(style_match.group(1)))
+            attrs = attrs[:style_match.start()] + attrs[style_match.end():]
+        style = '; '.join(f"{prop}: {value}" for prop, value in styles.items())
+        return f'<{tag}{attrs} style="{style}"{self_closing}>'
+
+    head, body = source[:match.start()], source[match.end():]
+    style_block = f"<style>\n{chr(10).join(leftover)}\n</style>" if leftover else ''
+    return head + style_block + _START_TAG_RE.sub(apply, body)
+
+
+# ------------------------------------------------------------
+# Compile time: mustache subset -> list of render functions
+# ------------------------------------------------------------
+
+def _text(chunk: str) -> Renderer:
+    return lambda context, out: out.append(chunk)
+
+
+def _var(name: str, escape: bool) -> Renderer:
+    if escape:
+        def render(context, out):
+            value = context.get(name)
+            if value is not None:
+                out.append(html.escape(str(value), quote=True))
+    else:
+        def render(context, out):
+            value = context.get(name)
+            if value is not None:
+                out.append(str(value))
+    return render
+
+
+def _section(name: str, children: List[Renderer], inverted: bool) -> Renderer:
+    def render(context, out):
+        value = context.get(name)
+        if inverted:
+            if not value:
+                for child in children:
+                    child(context, out)
+            return
+        if not value:
+            return
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                item_context = {**context, '.': item}
+                for child in children:
+                    child(item_context, out)
+        else:
+            for child in children:
+                child(context, out)
+    return render
+
+
+def compile_template(source: str) -> List[Renderer]:
+    root: List[Renderer] = []
+    stack: List[Tuple[str, bool, List[Renderer]]] = []
+    current = root
+    position = 0
+    for match in _TAG_RE.finditer(source):
+        if match.start() > position:
+            current.append(_text(source[position:match.start()]))
+        position = match.end()
+
+        raw_name, kind, name = match.groups()
+        if raw_name:
+            current.append(_var(raw_name, escape=False))
+        elif kind in ('#', '^'):
+            stack.append((name, kind == '^', current))
+            current = []
+        elif kind == '/':
+            if not stack or stack[-1][0] != name:
+                raise TemplateError(f"Unexpected closing tag {{{{/{name}}}}}")
+            section_name, inverted, parent = stack.pop()
+            parent.append(_section(section_name, current, inverted))
+            current = parent
+        else:
+            current.append(_var(name, escape=True))
+    if stack:
+        raise TemplateError(f"Unclosed section {{{{#{stack[-1][0]}}}}}")
+    if position < len(source):
+        current.append(_text(source[position:]))
+    return root
+
+
+class CompiledTemplate:
+    def __init__(self, name: str, locale: str, subject: str, renderers: List[Renderer]):
+        self.name = name
+        self.locale = locale
+        self.subject = subject
+        self._renderers = renderers
+
+    def render(self, **context) -> str:
+        out: List[str] = []
+        for renderer in self._renderers:
+            renderer(context, out)
+        return ''.join(out)
+
+
+class EmailTemplateEngine:
+    """Compiles every template for every locale once; render() is a cache lookup plus fill-in"""
+
+    def __init__(self, template_dir: Path = TEMPLATE_DIR, default_locale: str = DEFAULT_LOCALE):
+        self.default_locale = default_locale
+        self.locales: Dict[str, dict] = {
+            path.stem: json.loads(path.read_text(encoding='utf-8'))
+            for path in sorted((template_dir / 'locales').glob('*.json'))
+        }
+        self._compiled: Dict[Tuple[str, str], CompiledTemplate] = {}
+        for path in sorted(template_dir.glob('*.html')):
+            source = path.read_text(encoding='utf-8')
+            for locale, strings in self.locales.items():
+                self._compiled[(path.stem, locale)] = self._build(path.stem, locale, source, strings)
+        logger.info(f"Compiled {len(self._compiled)} email templates ({', '.join(self.locales)})")
+
+    def _build(self, name: str, locale: str, source: str, strings: dict) -> CompiledTemplate:
+        def translate(match):
+            try:
+                return str(_lookup(strings, match.group(1)))
+            except KeyError:
+                raise TemplateError(f"Missing '{match.group(1)}' in {locale} strings for template {name}")
+
+        localized = _I18N_RE.sub(translate, source)
+        subject = str(_lookup(strings, f"{name}.subject"))
+        return CompiledTemplate(name, locale, subject, compile_template(inline_css(localized)))
+
+    def normalize_locale(self, locale: str = None) -> str:
+        locale = (locale or '').lower()[:2]
+        return locale if locale in self.locales else self.default_locale
+
+    def get(self, name: str, locale: str = None) -> CompiledTemplate:
+        return self._compiled[(name, self.normalize_locale(locale))]
+
+    def render(self, name: str, locale: str = None, **context) -> Tuple[str, str]:
+        """Return (subject, html) for the template in the given locale"""
+        template = self.get(name, locale)
+        return template.subject, template.render(**context)
@@ -0,0 +1,240 @@
+"""
+Email transports used by the outbox dispatcher (see email_outbox.py).
+
+A transport delivers Resend-style message dicts
+({"from", "to", "subject", "html", "attachments"?}) and owns its network
+resources: ``start()`` is called from the app startup hook and ``close()`` on
+shutdown, so connections are opened once and reused across sends.
+"""
+
+import asyncio
+import base64
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid, parseaddr
+from typing import List, Optional
+
+import httpx
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = 'https://api.resend.com'
+
+
+class EmailTransportError(Exception):
+    pass
+
+
+class EmailTransport(ABC):
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def send(self, message: dict) -> str:
+        """Deliver one message, returns the provider message id"""
+
+    async def send_batch(self, messages: List[dict]) -> List[str]:
+        """Deliver several messages; transports without a batch API send them concurrently"""
+        return list(await asyncio.gather(*(self.send(message) for message in messages)))
+
+
+class LogTransport(EmailTransport):
+    """Used when no provider is configured: logs instead of sending"""
+
+    async def send(self, message: dict) -> str:
+        logger.info(f"[MOCK EMAIL] To: {', '.join(message['to'])}")
+        logger.info(f"[MOCK EMAIL] Subject: {message['subject']}")
+        for attachment in message.get('attachments', []):
+            logger.info(f"[MOCK EMAIL] Attachment: {attachment['filename']}")
+        logger.info(f"[MOCK EMAIL] Content: {message['html'][:200]}...")
+        return f"mock-{uuid.uuid4()}"
+
+
+class ResendTransport(EmailTransport):
+    """
+    Resend REST API over a long-lived httpx.AsyncClient: pooled keep-alive
+    connections, per-request timeouts and at most ``max_concurrency``
+    requests in flight.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = RESEND_API_URL,
+        max_concurrency: int = 10,
+        timeout: float = 10.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Authorization': f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60,
+                ),
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, path: str, payload) -> dict:
+        if self._client is None:
+            raise EmailTransportError("ResendTransport used before start()")
+        async with self._semaphore:
+            try:
+                response = await self._client.post(path, json=payload)
+            except httpx.HTTPError as e:
+                raise EmailTransportError(f"Resend request failed: {e!r}") from e
+        if response.status_code >= 400:
+            raise EmailTransportError(f"Resend returned {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    async def send(self, message: dict) -> str:
+        return (await self._post('/emails', message))['id']
+
+    async def send_batch(self, messages: List[dict]) -> List[str]:
+        response = await self._post('/emails/batch', messages)
+        return [item['id'] for item in response['data']]
+
+
+def build_mime_message(message: dict) -> EmailMessage:
+    """Turn a Resend-style message dict into a MIME message (HTML body, base64 attachments)"""
+    mime = EmailMessage()
+    mime['From'] = message['from']
+    mime['To'] = ', '.join(message['to'])
+    mime['Subject'] = message['subject']
+    mime['Date'] = formatdate(localtime=False)
+    mime['Message-ID'] = make_msgid(domain=parseaddr(message['from'])[1].rpartition('@')[2] or None)
+    mime.set_content('This message requires an HTML capable email client.')
+    mime.add_alternative(message['html'], subtype='html')
+    for attachment in message.get('attachments', []):
+        filename = attachment['filename']
+        maintype, subtype = ('application', 'pdf') if filename.lower().endswith('.pdf') else ('application', 'octet-stream')
+        mime.add_attachment(base64.b64decode(attachment['content']), maintype=maintype, subtype=subtype, filename=filename)
+    return mime
+
+
+class SmtpTransport(EmailTransport):
+    """
+    SMTP delivery through a small pool of persistent, authenticated
+    connections (aiosmtplib). Connections are opened lazily, upgraded with
+    STARTTLS, logged in once and then reused for every following message, so
+    the TCP + TLS + AUTH handshake is paid once per connection rather than
+    once per email. A connection the server has dropped (idle timeout,
+    restart) is reopened and the message retried once. After any other SMTP
+    error the connection is reset (RSET) before it goes back to the pool, or
+    closed if that fails.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        pool_size: int = 3,
+        starttls: bool = True,
+        use_tls: bool = False,
+        timeout: float = 30.0,
+    ):
+        import aiosmtplib
+        self._aiosmtplib = aiosmtplib
+        self.host = host
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.pool_size = pool_size
+        self.starttls = starttls
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._pool: Optional[asyncio.Queue] = None
+
+    async def start(self):
+        if self._pool is None:
+            # Slots start empty (None) and are connected on first use
+            self._pool = asyncio.Queue()
+            for _ in range(self.pool_size):
+                self._pool.put_nowait(None)
+
+    async def close(self):
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        while not pool.empty():
+            connection = pool.get_nowait()
+            if connection is not None and connection.is_connected:
+                try:
+                    await connection.quit()
+                except Exception:
+                    connection.close()
+
+    async def _connect(self):
+        connection = self._aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.starttls and not self.use_tls,
+            timeout=self.timeout,
+        )
+        try:
+            await connection.connect()
+        except self._aiosmtplib.SMTPException as e:
+            connection.close()
+            raise EmailTransportError(f"SMTP connect/login to {self.host}:{self.port} failed: {e}") from e
+        metrics.inc('email_transport.smtp.connects')
+        return connection
+
+    async def send(self, message: dict) -> str:
+        if self._pool is None:
+            raise EmailTransportError("SmtpTransport used before start()")
+        mime = build_mime_message(message)
+        sender = parseaddr(message['from'])[1]
+        pool = self._pool
+        connection = await pool.get()
+        try:
+            for attempt in (1, 2):
+                if connection is None or not connection.is_connected:
+                    connection = await self._connect()
+                try:
+                    await connection.send_message(mime, sender=sender, recipients=message['to'])
+                    break
+                except (self._aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    connection.close()
+                    connection = None
+                    if attempt == 2:
+                        raise EmailTransportError(f"SMTP connection lost: {e}") from e
+                    metrics.inc('email_transport.smtp.reconnects')
+                except self._aiosmtplib.SMTPException as e:
+                    # The server may still hold this transaction's envelope; clear it before reuse
+                    try:
+                        await connection.rset()
+                    except Exception:
+                        connection.close()
+                        connection = None
+                    raise EmailTransportError(f"SMTP delivery failed: {e}") from e
+        finally:
+            # Stale connections are detected (is_connected) on next use
+            pool.put_nowait(connection)
+        metrics.inc('email_transport.smtp.sent')
+        return mime['Message-ID']
@@ -0,0 +1,111 @@
+"""
+Content-addressed cache for AI evaluations.
+
+The key is a SHA-256 of the normalised prompt inputs (case, whitespace and
+channel order do not matter) plus a namespace that changes with the prompt
+and model, so editing the prompt invalidates old entries. Entries live in
+``evaluation_cache`` and expire through a TTL index.
+
+Concurrent requests for the same key (a double-submitted form) share one
+computation instead of calling the model twice.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import IndexModel
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _normalise_text(value) -> str:
+    return re.sub(r'\s+', ' ', str(value or '')).strip().lower()
+
+
+def evaluation_cache_key(audit_data: dict, namespace: str = '') -> str:
+    """Hash of the audit fields that determine the evaluation (contact details are left out)"""
+    normalised = {
+        'companyName': _normalise_text(audit_data.get('companyName')),
+        'sector': _normalise_text(audit_data.get('sector')),
+        'geoArea': _normalise_text(audit_data.get('geoArea')),
+        'channels': sorted({_normalise_text(c) for c in audit_data.get('channels') or []}),
+        'objective': _normalise_text(audit_data.get('objective')),
+        'budget': _normalise_text(audit_data.get('budget')),
+        'mainProblem': _normalise_text(audit_data.get('mainProblem')),
+        'previousAttempts': _normalise_text(audit_data.get('previousAttempts')),
+        'improvementImportance': int(audit_data.get('improvementImportance') or 3),
+    }
+    payload = json.dumps([namespace, normalised], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EvaluationCache:
+    def __init__(self, collection, ttl_seconds: int = 7 * 24 * 3600, namespace: str = ''):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def index_models(self):
+        return [IndexModel([('created_at', 1)], expireAfterSeconds=self.ttl_seconds)]
+
+    def key(self, audit_data: dict) -> str:
+        return evaluation_cache_key(audit_data, self.namespace)
+
+    def _count(self, outcome: str):
+        metrics.inc(f"evaluation_cache.{outcome}")
+        hits = metrics.counters['evaluation_cache.hit']
+        total = hits + metrics.counters['evaluation_cache.miss']
+        metrics.set_gauge('evaluation_cache.hit_rate', hits / total if total else 0)
+
+    async def get(self, key: str) -> Optional[dict]:
+        doc = await self.collection.find_one({'_id': key}, {'_id': 0, 'result': 1})
+        return doc['result'] if doc else None
+
+    async def put(self, key: str, result: dict):
+        await self.collection.update_one(
+            {'_id': key},
+            {'$set': {'result': result, 'created_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def get_or_compute(self, audit_data: dict, compute: Callable[[dict], Awaitable[dict]]) -> dict:
+        """
+        Return the cached evaluation for these inputs, or compute and store it.
+        Exceptions from ``compute`` propagate and nothing is cached.
+        """
+        key = self.key(audit_data)
+        if key in self._inflight:
+            self._count('hit')
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self.get(key)
+            if result is not None:
+                self._count('hit')
+                logger.info(f"Evaluation cache hit {key[:12]}")
+            else:
+                self._count('miss')
+                result = await compute(audit_data)
+                await self.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Nobody else may be waiting; don't warn about an unretrieved exception
+                future.exception()
+            raise
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,235 @@
+"""
+Single-pass parser for the evaluation text produced by the LLM (or the mock).
+
+``parse_evaluation`` walks the text once, line by line, classifying each
+line with one precompiled pattern, and returns a JSON-serialisable tree:
+
+    {
+        'title': 'VALUTAZIONE STRATEGICA DEL MARKETING',
+        'preamble': [block, ...],              # before the first section
+        'sections': [
+            {'number': 1, 'heading': 'INTRODUZIONE', 'final': False, 'blocks': [block, ...]},
+            ...
+            {'number': None, 'heading': 'VALUTAZIONE FINALE', 'final': True, 'blocks': [...]},
+        ],
+        'score': 5, 'level': 'Medio', 'score_explanation': '...',
+        'footer': ['Documento riservato – uso informativo', ...],
+    }
+
+A block is {'type': 'paragraph', 'text': ...} or
+{'type': 'list', 'ordered': bool, 'items': [...]}. The tree is stored with
+the audit and consumed by the PDF renderer, the emails and the API, so the
+text is never re-scanned.
+"""
+
+import re
+from typing import List, Optional
+
+DEFAULT_SCORE = 5
+DEFAULT_LEVEL = 'Medio'
+LEVELS = {'basso': 'Basso', 'medio': 'Medio', 'avanzato': 'Avanzato'}
+
+_LINE_RE = re.compile(
+    r'(?P<rule>(?:-{3,}|_{3,}|\*{3,}))$'
+    r'|#{1,6}\s+(?P<md_heading>.+)'
+    r'|(?P<bullet>[•\-*–])\s+(?P<bullet_text>.+)'
+    r'|(?P<number>\d{1,2})[.)]\s+(?P<number_text>.+)'
+)
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_BOLD_LINE_RE = re.compile(r'\*\*([^*]+)\*\*:?$')
+# The label may carry the scale, as the prompt asks: "Punteggio complessivo marketing (0–10): 7/10"
+_SCORE_RE = re.compile(
+    r'punteggio\b[^\d\n]{0,80}?'
+    r'(?:\(\s*(?:da\s+)?\d{1,2}\s*(?:[-–—/]|a)\s*10\s*\)[^\d\n]{0,20}?)?'
+    r'(\d{1,2})(?:[.,]\d)?\s*(?:/|su)\s*10',
+    re.IGNORECASE
+)
+_LEVEL_RE = re.compile(r'livello\b[^\n:]{0,80}:\s*\W{0,3}(basso|medio|avanzato)\b', re.IGNORECASE)
+_NUMBERED_RE = re.compile(r'(\d{1,2})[.)]\s+(.+)')
+_FINAL_RE = re.compile(r'valutazione finale', re.IGNORECASE)
+_LEADING_SYMBOLS_RE = re.compile(r'^[^\w(«"\'’]+')
+
+
+def _clean(text: str) -> str:
+    return _BOLD_RE.sub(r'\1', text).strip()
+
+
+def _is_heading_text(text: str) -> bool:
+    letters = [c for c in text if c.isalpha()]
+    return bool(letters) and all(c.isupper() for c in letters) and len(text) <= 120
+
+
+class _Builder:
+    def __init__(self):
+        self.tree = {
+            'title': None,
+            'preamble': [],
+            'sections': [],
+            'score': None,
+            'level': None,
+            'score_explanation': '',
+            'footer': [],
+        }
+        self.blocks = self.tree['preamble']
+        self.section: Optional[dict] = None
+        self.open_block: Optional[dict] = None  # paragraph or list that a continuation line extends
+        self.open_text: List[str] = []  # lines of its paragraph or last item, joined once it closes
+        self.explanation: List[str] = []
+        self.in_footer = False
+        self.last_number: Optional[int] = None  # of the last numbered section
+        # A mixed-case numbered line that may be the next section heading; the line after it decides
+        self.pending_heading: Optional[tuple] = None
+
+    def heading(self, text: str, number: Optional[int] = None):
+        """The first heading before any content is the title, the rest open sections"""
+        if number is None:
+            numbered = _NUMBERED_RE.match(text)
+            if numbered:
+                number, text = int(numbered.group(1)), numbered.group(2)
+        if number is None and self.tree['title'] is None and not self.tree['sections'] and not self.tree['preamble']:
+            self.tree['title'] = _LEADING_SYMBOLS_RE.sub('', text)
+        else:
+            self.start_section(text, number)
+
+    def start_section(self, heading: str, number: Optional[int]):
+        heading = _LEADING_SYMBOLS_RE.sub('', heading).rstrip(':').strip()
+        final = bool(_FINAL_RE.search(heading))
+        self.section = {'number': number, 'heading': heading, 'final': final, 'blocks': []}
+        if number is not None:
+            self.last_number = number
+        self.tree['sections'].append(self.section)
+        self.blocks = self.section['blocks']
+        self.close_block()
+
+    def close_block(self):
+        """Store the joined lines of the open paragraph or list item"""
+        block = self.open_block
+        if block and len(self.open_text) > 1:
+            if block['type'] == 'paragraph':
+                block['text'] = ' '.join(self.open_text)
+            else:
+                block['items'][-1] = ' '.join(self.open_text)
+        self.open_block = None
+        self.open_text = []
+
+    def add_list_item(self, text: str, ordered: bool):
+        block = self.open_block
+        if block and block['type'] == 'list' and block['ordered'] == ordered:
+            self.close_block()
+        else:
+            self.close_block()
+            block = {'type': 'list', 'ordered': ordered, 'items': []}
+            self.blocks.append(block)
+        block['items'].append(text)
+        self.open_block = block
+        self.open_text = [text]
+        self.scan_score(text)
+
+    def add_text(self, text: str, continuation: bool):
+        block = self.open_block
+        if block and (block['type'] == 'paragraph' or continuation):
+            self.open_text.append(text)
+        else:
+            self.close_block()
+            block = {'type': 'paragraph', 'text': text}
+            self.blocks.append(block)
+            self.open_block = block
+            self.open_text = [text]
+        self.scan_score(text)
+
+    def scan_score(self, text: str):
+        in_final = bool(self.section and self.section['final'])
+        score = _SCORE_RE.search(text)
+        level = _LEVEL_RE.search(text)
+        if score and (in_final or self.tree['score'] is None):
+            self.tree['score'] = max(0, min(10, int(score.group(1))))
+        if level and (in_final or self.tree['level'] is None):
+            self.tree['level'] = LEVELS[level.group(1).lower()]
+        if in_final and not score and not level:
+            self.explanation.append(text)
+
+    def may_be_heading(self, number: int, text: str) -> bool:
+        """A short numbered line that continues the section numbering, outside a numbered list"""
+        block = self.open_block
+        if block and block['type'] == 'list' and block['ordered']:
+            return False
+        if len(text) > 60 or text.endswith(('.', ',', ';')):
+            return False
+        return number == (self.last_number + 1 if self.last_number is not None else 1)
+
+    def resolve_pending(self, raw: str, stripped: str):
+        """
+        A heading if followed by a blank line, a paragraph or a list numbered
+        from 1, otherwise a list item
+        """
+        number, text = self.pending_heading
+        self.pending_heading = None
+        match = _LINE_RE.match(stripped)
+        if not stripped or not raw[:1].isspace() and (not match or match.group('number') == '1'):
+            self.heading(text, number)
+        else:
+            self.add_list_item(text, ordered=True)
+
+    def line(self, raw: str):
+        stripped = raw.strip()
+        if self.pending_heading:
+            self.resolve_pending(raw, stripped)
+        if not stripped:
+            self.close_block()
+            return
+        if self.in_footer:
+            self.tree['footer'].append(_clean(stripped))
+            return
+
+        match = _LINE_RE.match(stripped)
+        kind = match.lastgroup if match else None
+        if kind == 'rule':
+            # Everything after a horizontal rule at the end is the document footer
+            self.in_footer = bool(self.tree['sections'])
+            self.close_block()
+            return
+        if kind == 'md_heading':
+            self.heading(_clean(match.group('md_heading')))
+            return
+        if kind == 'bullet_text':
+            self.add_list_item(_clean(match.group('bullet_text')), ordered=False)
+            return
+        if kind == 'number_text':
+            text = match.group('number_text')
+            bold = _BOLD_LINE_RE.match(text)
+            if bold or _is_heading_text(text):
+                self.heading(_clean(bold.group(1) if bold else text), int(match.group('number')))
+            elif self.may_be_heading(int(match.group('number')), text):
+                self.pending_heading = (int(match.group('number')), _clean(text))
+            else:
+                self.add_list_item(_clean(text), ordered=True)
+            return
+
+        bold = _BOLD_LINE_RE.match(stripped)
+        text = _clean(bold.group(1) if bold else stripped)
+        if bold or _is_heading_text(text) or _FINAL_RE.search(text) and len(text) <= 60:
+            self.heading(text)
+            return
+        self.add_text(text, continuation=raw[:1].isspace() or self.open_block is not None)
+
+    def finish(self) -> dict:
+        if self.pending_heading:
+            self.resolve_pending('', '')
+        self.close_block()
+        self.tree['score_explanation'] = ' '.join(self.explanation)
+        return self.tree
+
+
+def parse_evaluation(text: str) -> dict:
+    builder = _Builder()
+    for raw in text.splitlines():
+        builder.line(raw)
+    return builder.finish()
+
+
+def evaluation_score(tree: dict) -> int:
+    return tree['score'] if tree.get('score') is not None else DEFAULT_SCORE
+
+
+def evaluation_level(tree: dict) -> str:
+    return tree.get('level') or DEFAULT_LEVEL
@@ -0,0 +1,248 @@
+"""
+Streaming exports of free audits, onboarding forms and subscriptions.
+
+Rows are read from a Motor cursor in batches and written out batch by batch
+as CSV or Parquet (one row group per batch), so memory stays bounded by the
+batch size however large the collection is. Used by the admin export
+endpoint (streamed with chunked encoding) and from the command line:
+
+    python exports.py subscriptions --format parquet --since 2026-01-01 -o subs.parquet
+    python exports.py audits --columns id,email,companyName,marketing_score > audits.csv
+
+Parquet needs pyarrow; CSV has no extra dependencies.
+"""
+
+import argparse
+import asyncio
+import csv
+import importlib.util
+import io
+import os
+import sys
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+from metrics import metrics
+
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'parquet': 'application/vnd.apache.parquet'}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Dataset(NamedTuple):
+    collection: str
+    columns: Dict[str, str]   # name -> 'str' | 'int' | 'bool' | 'list'
+    date_field: str = 'created_at'
+
+
+# Contact and commercial fields only: evaluation text and Stripe payloads stay out
+DATASETS: Dict[str, Dataset] = {
+    'audits': Dataset('free_audits', {
+        'id': 'str', 'created_at': 'str', 'status': 'str', 'fullName': 'str', 'email': 'str',
+        'phone': 'str', 'companyName': 'str', 'website': 'str', 'sector': 'str', 'geoArea': 'str',
+        'channels': 'list', 'objective': 'str', 'budget': 'str', 'mainProblem': 'str',
+        'previousAttempts': 'str', 'improvementImportance': 'int',
+        'marketing_score': 'int', 'marketing_level': 'str', 'lead_score': 'int', 'lead_tier': 'str',
+        'locale': 'str', 'email_sent_at': 'str',
+    }),
+    'onboarding': Dataset('onboarding', {
+        'id': 'str', 'created_at': 'str', 'subscription_id': 'str', 'full_name': 'str', 'email': 'str',
+        'company': 'str', 'website': 'str', 'social_platforms': 'list', 'social_links': 'str',
+        'has_gmb': 'bool', 'gmb_link': 'str', 'ads_platforms': 'list', 'main_objective': 'str', 'notes': 'str',
+    }),
+    'subscriptions': Dataset('subscriptions', {
+        'id': 'str', 'created_at': 'str', 'email': 'str', 'package': 'str', 'included_category': 'str',
+        'selected_platform': 'str', 'addons': 'list', 'status': 'str', 'total_monthly': 'int',
+        'total_one_time': 'int', 'stripe_customer_id': 'str', 'stripe_subscription_id': 'str',
+        'activated_at': 'str', 'cancelled_at': 'str', 'updated_at': 'str', 'locale': 'str',
+    }),
+}
+
+
+def select_columns(dataset: Dataset, columns: Optional[List[str]]) -> List[str]:
+    if not columns:
+        return list(dataset.columns)
+    unknown = [column for column in columns if column not in dataset.columns]
+    if unknown:
+        raise ExportError(f"Unknown columns {unknown}. Valid: {list(dataset.columns)}")
+    return columns
+
+
+def build_query(dataset: Dataset, since: Optional[str] = None, until: Optional[str] = None) -> dict:
+    """Date range on the (indexed) creation timestamp; ISO strings compare chronologically"""
+    bounds = {}
+    if since:
+        bounds['$gte'] = since
+    if until:
+        bounds['$lt'] = until
+    return {dataset.date_field: bounds} if bounds else {}
+
+
+async def iter_batches(collection, dataset: Dataset, columns: List[str], since: Optional[str] = None,
+                       until: Optional[str] = None, batch_size: int = 1000) -> AsyncIterator[List[dict]]:
+    cursor = collection.find(
+        build_query(dataset, since, until),
+        {'_id': 0, **{column: 1 for column in columns}}
+    ).sort([(dataset.date_field, 1)]).batch_size(batch_size)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Spreadsheets evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value, kind: str):
+    if value is None:
+        return ''
+    if kind == 'list':
+        value = '; '.join(str(item) for item in value) if isinstance(value, list) else str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        # Form fields are user input: make them plain text
+        return "'" + value
+    return value
+
+
+async def write_csv(batches: AsyncIterator[List[dict]], dataset: Dataset, columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        for doc in batch:
+            writer.writerow([_csv_value(doc.get(column), dataset.columns[column]) for column in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        metrics.inc('exports.rows', len(batch))
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_value(value, kind: str):
+    if value is None:
+        return None
+    if kind == 'list':
+        return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+    if kind == 'int':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if kind == 'bool':
+        return bool(value)
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+async def write_parquet(batches: AsyncIterator[List[dict]], dataset: Dataset, columns: List[str]) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'str': pa.string(), 'int': pa.int64(), 'bool': pa.bool_(), 'list': pa.list_(pa.string())}
+    schema = pa.schema([(column, types[dataset.columns[column]]) for column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        async for batch in batches:
+            arrays = [
+                pa.array([_arrow_value(doc.get(column), dataset.columns[column]) for doc in batch], type=field.type)
+                for column, field in zip(columns, schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            metrics.inc('exports.rows', len(batch))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(db, dataset_name: str, fmt: str = 'csv', columns: Optional[List[str]] = None,
+                  since: Optional[str] = None, until: Optional[str] = None,
+                  batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """Validate the request and return an async iterator of file chunks"""
+    dataset = DATASETS.get(dataset_name)
+    if dataset is None:
+        raise ExportError(f"Unknown dataset {dataset_name!r}. Valid: {list(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}. Valid: {list(FORMATS)}")
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise ExportError("Parquet export requires pyarrow")
+    columns = select_columns(dataset, columns)
+    batches = iter_batches(db[dataset.collection], dataset, columns, since, until, batch_size)
+    metrics.inc(f"exports.{dataset_name}")
+    writer = write_parquet if fmt == 'parquet' else write_csv
+    return writer(batches, dataset, columns)
+
+
+def export_filename(dataset_name: str, fmt: str) -> str:
+    return f"{dataset_name}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.{fmt}"
+
+
+async def _main(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        chunks = export_stream(
+            client[os.environ['DB_NAME']], args.dataset, args.format,
+            args.columns.split(',') if args.columns else None, args.since, args.until, args.batch_size
+        )
+        out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            async for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+    finally:
+        client.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export a collection to CSV or Parquet")
+    parser.add_argument('dataset', choices=list(DATASETS))
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--columns', help="comma-separated column names (default: all)")
+    parser.add_argument('--since', help="created_at lower bound (inclusive), e.g. 2026-01-01")
+    parser.add_argument('--until', help="created_at upper bound (exclusive)")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except ExportError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Index bootstrap and query-plan verification.
+
+Every index the app relies on is declared here (or contributed by the
+component that owns the collection) and created idempotently on startup.
+QUERY_SHAPES lists the filters/sorts the endpoints and workers actually run;
+``verify_query_plans`` explains each of them and reports any that fall back
+to a collection scan.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    'subscriptions': [
+        IndexModel([('id', ASCENDING)], unique=True),
+        IndexModel(
+            [('stripe_subscription_id', ASCENDING)],
+            unique=True,
+            partialFilterExpression={'stripe_subscription_id': {'$type': 'string'}}
+        ),
+        IndexModel(
+            [('stripe_session_id', ASCENDING)],
+            partialFilterExpression={'stripe_session_id': {'$type': 'string'}}
+        ),
+        IndexModel([('created_at', ASCENDING)]),
+    ],
+    'onboarding': [
+        IndexModel([('id', ASCENDING)], unique=True),
+        IndexModel([('created_at', ASCENDING)]),
+    ],
+    'free_audits': [
+        IndexModel([('id', ASCENDING)], unique=True),
+        IndexModel([('created_at', ASCENDING)]),
+        IndexModel([('lead_score', DESCENDING), ('created_at', DESCENDING)]),
+    ],
+    'audit_pdfs': [
+        IndexModel([('id', ASCENDING)], unique=True),
+    ],
+    'status_checks': [
+        IndexModel([('timestamp', ASCENDING), ('id', ASCENDING)]),
+    ],
+}
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape('subscription by id', 'subscriptions', {'id': 'x'}),
+    QueryShape('subscription by stripe id', 'subscriptions', {'stripe_subscription_id': 'sub_x'}),
+    QueryShape('subscription by checkout session', 'subscriptions', {'stripe_session_id': 'cs_x'}),
+    QueryShape('onboarding by id', 'onboarding', {'id': 'x'}),
+    QueryShape('free audit by id', 'free_audits', {'id': 'x'}),
+    QueryShape('audit pdf by id', 'audit_pdfs', {'id': 'x'}),
+    QueryShape('lead queue', 'free_audits', {'lead_tier': 'hot'}, [('lead_score', DESCENDING), ('created_at', DESCENDING)]),
+    *[
+        QueryShape(f"{collection} export range", collection,
+                   {'created_at': {'$gte': '2026-01-01', '$lt': '2026-02-01'}}, [('created_at', ASCENDING)])
+        for collection in ('free_audits', 'onboarding', 'subscriptions')
+    ],
+    QueryShape(
+        'analytics rows by dimension', 'analytics_daily',
+        {'dimension': 'package', 'day': {'$gte': '2026-01-01', '$lte': '9999'}},
+        [('day', ASCENDING)]
+    ),
+    QueryShape(
+        'status checks page', 'status_checks',
+        {'$or': [{'timestamp': {'$gt': 't'}}, {'timestamp': 't', 'id': {'$gt': 'x'}}]},
+        [('timestamp', ASCENDING), ('id', ASCENDING)]
+    ),
+    QueryShape(
+        'claim due job', 'jobs',
+        {'$or': [
+            {'status': 'queued', 'run_at': {'$lte': _now()}},
+            {'status': 'running', 'lease_until': {'$lt': _now()}},
+        ]},
+        [('run_at', ASCENDING)]
+    ),
+    QueryShape(
+        'pending stripe events', 'stripe_events',
+        {'status': 'pending', 'retry_at': {'$not': {'$gt': _now()}}},
+        [('created', ASCENDING)]
+    ),
+    QueryShape(
+        'pending stripe events for key', 'stripe_events',
+        {'ordering_key': 'sub_x', 'status': 'pending'},
+        [('created', ASCENDING), ('received_at', ASCENDING)]
+    ),
+    QueryShape('stripe event by id', 'stripe_events', {'event_id': 'evt_x'}),
+    QueryShape(
+        'due outbox emails', 'email_outbox',
+        {'$or': [
+            {'status': 'queued', 'next_attempt_at': {'$lte': _now()}},
+            {'status': 'sending', 'next_attempt_at': {'$lte': _now()}},
+        ]},
+        [('next_attempt_at', ASCENDING)]
+    ),
+    QueryShape('claimed outbox emails', 'email_outbox', {'claim': 'x'}),
+]
+
+
+def _stages(plan: dict):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+
+class IndexManager:
+    def __init__(self, db):
+        self.db = db
+        self.indexes: Dict[str, List[IndexModel]] = {name: list(models) for name, models in INDEXES.items()}
+
+    def add(self, collection: str, models: List[IndexModel]):
+        """Declare extra indexes, e.g. from a component that owns the collection"""
+        self.indexes.setdefault(collection, []).extend(models)
+
+    async def ensure_all(self):
+        """Create all declared indexes. Existing identical indexes are left untouched."""
+        for collection, models in self.indexes.items():
+            names = await self.db[collection].create_indexes(models)
+            logger.info(f"Indexes ensured on {collection}: {', '.join(names)}")
+
+    async def explain(self, shape: QueryShape) -> dict:
+        cursor = self.db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        return await cursor.explain()
+
+    async def verify_query_plans(self, shapes: List[QueryShape] = QUERY_SHAPES) -> List[str]:
+        """Return the names of query shapes whose winning plan uses a COLLSCAN"""
+        collscans = []
+        for shape in shapes:
+            plan = await self.explain(shape)
+            stages = set(_stages(plan['queryPlanner']['winningPlan']))
+            if 'COLLSCAN' in stages:
+                logger.warning(f"Query '{shape.name}' on {shape.collection} does a COLLSCAN")
+                collscans.append(shape.name)
+        return collscans
@@ -0,0 +1,267 @@
+"""
+Durable MongoDB-backed job queue.
+
+Jobs live in a collection and carry everything needed to resume them after a
+restart: the handler ``kind``, the current ``stage``, a JSON ``payload``, the
+earliest time it may run (``run_at``) and a lease (``lease_owner`` /
+``lease_until``) that a worker extends with a heartbeat while it works.
+
+A job is claimed atomically with ``find_one_and_update`` so any number of
+workers (or processes) can poll the same collection. Handlers receive the job
+document and either finish it (return ``None``) or move it to another stage
+with ``NextStage`` - the job is written back to Mongo and nothing is kept in
+memory while it waits for its next ``run_at``.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class NextStage(NamedTuple):
+    """Returned by a handler to continue the job at another stage"""
+    stage: str
+    delay_seconds: float = 0
+
+
+JobHandler = Callable[[dict], Awaitable[Optional[NextStage]]]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Persistent job queue with leases, heartbeats and retries"""
+
+    def __init__(
+        self,
+        collection,
+        concurrency: int = 10,
+        lease_seconds: int = 120,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        retry_base_seconds: int = 30,
+    ):
+        self.collection = collection
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._dead_handlers: Dict[str, Callable[[dict, Exception], Awaitable[None]]] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running: set = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def register(self, kind: str, handler: JobHandler, on_dead=None):
+        """
+        Register the coroutine that runs jobs of the given kind. on_dead is
+        awaited with (job, error) once a job has exhausted its retries.
+        """
+        self._handlers[kind] = handler
+        if on_dead:
+            self._dead_handlers[kind] = on_dead
+
+    def index_models(self) -> List[IndexModel]:
+        return [
+            IndexModel([('status', 1), ('run_at', 1)]),
+            IndexModel([('status', 1), ('lease_until', 1)]),
+        ]
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        stage: str = 'start',
+        delay_seconds: float = 0,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        Persist a new job. Passing a deterministic job_id makes enqueueing
+        idempotent: a second enqueue with the same id is ignored.
+        """
+        now = utcnow()
+        job = {
+            '_id': job_id or str(uuid.uuid4()),
+            'kind': kind,
+            'stage': stage,
+            'payload': payload,
+            'status': 'queued',
+            'run_at': now + timedelta(seconds=delay_seconds),
+            'attempts': 0,
+            'lease_owner': None,
+            'lease_until': None,
+            'last_error': None,
+            'created_at': now,
+            'updated_at': now,
+        }
+        try:
+            await self.collection.insert_one(job)
+        except DuplicateKeyError:
+            logger.info(f"Job {job['_id']} already enqueued")
+        return job['_id']
+
+    async def claim(self) -> Optional[dict]:
+        """Atomically claim one due job (or one whose lease has expired)"""
+        now = utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                '$or': [
+                    {'status': 'queued', 'run_at': {'$lte': now}},
+                    {'status': 'running', 'lease_until': {'$lt': now}},
+                ]
+            },
+            {
+                '$set': {
+                    'status': 'running',
+                    'lease_owner': self.worker_id,
+                    'lease_until': now + timedelta(seconds=self.lease_seconds),
+                    'updated_at': now,
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('run_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, job_id: str):
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            now = utcnow()
+            await self.collection.update_one(
+                {'_id': job_id, 'lease_owner': self.worker_id},
+                {'$set': {'lease_until': now + timedelta(seconds=self.lease_seconds), 'updated_at': now}}
+            )
+
+    async def _finish(self, job: dict, result: Optional[NextStage]):
+        now = utcnow()
+        owned = {'_id': job['_id'], 'lease_owner': self.worker_id}
+        if result is None:
+            await self.collection.update_one(
+                owned,
+                {'$set': {'status': 'done', 'lease_owner': None, 'lease_until': None,
+                          'completed_at': now, 'updated_at': now}}
+            )
+            return
+        # Move to the next stage; attempts are counted per stage
+        await self.collection.update_one(
+            owned,
+            {'$set': {
+                'stage': result.stage,
+                'status': 'queued',
+                'run_at': now + timedelta(seconds=result.delay_seconds),
+                'attempts': 0,
+                'lease_owner': None,
+                'lease_until': None,
+                'last_error': None,
+                'updated_at': now,
+            }}
+        )
+
+    async def _fail(self, job: dict, error: Exception) -> bool:
+        """Schedule a retry with exponential backoff. Returns True when the job is dead."""
+        now = utcnow()
+        dead = job.get('attempts', 1) >= self.max_attempts
+        update = {
+            'last_error': str(error),
+            'lease_owner': None,
+            'lease_until': None,
+            'updated_at': now,
+        }
+        if dead:
+            update['status'] = 'dead'
+        else:
+            backoff = self.retry_base_seconds * (2 ** (job.get('attempts', 1) - 1))
+            update['status'] = 'queued'
+            update['run_at'] = now + timedelta(seconds=backoff)
+        await self.collection.update_one(
+            {'_id': job['_id'], 'lease_owner': self.worker_id},
+            {'$set': update}
+        )
+        return dead
+
+    async def run_job(self, job: dict):
+        """Run a claimed job while keeping its lease alive"""
+        handler = self._handlers.get(job['kind'])
+        heartbeat = asyncio.create_task(self._heartbeat(job['_id']))
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+            result = await handler(job)
+        except Exception as e:
+            dead = await self._fail(job, e)
+            logger.error(
+                f"Job {job['_id']} ({job['kind']}/{job['stage']}) failed on attempt "
+                f"{job.get('attempts')}: {e}{' - giving up' if dead else ''}"
+            )
+            if dead and job['kind'] in self._dead_handlers:
+                await self._dead_handlers[job['kind']](job, e)
+        else:
+            await self._finish(job, result)
+        finally:
+            heartbeat.cancel()
+
+    async def _run_and_release(self, job: dict):
+        try:
+            await self.run_job(job)
+        finally:
+            self._semaphore.release()
+
+    async def _worker_loop(self):
+        logger.info(f"Job worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not self._stopping.is_set():
+            await self._semaphore.acquire()
+            try:
+                job = await self.claim()
+            except Exception as e:
+                self._semaphore.release()
+                logger.error(f"Error claiming job: {e}")
+                await self._sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                self._semaphore.release()
+                await self._sleep(self.poll_interval)
+                continue
+
+            task = asyncio.create_task(self._run_and_release(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _sleep(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def start(self):
+        self._stopping.clear()
+        self._loop_task = asyncio.create_task(self._worker_loop())
+
+    async def stop(self, timeout: float = 10):
+        """Stop claiming new jobs and give running ones a chance to finish"""
+        self._stopping.set()
+        if self._loop_task:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            # Unfinished jobs keep their lease and are picked up again once it expires
+            await asyncio.wait(self._running, timeout=timeout)
+        logger.info(f"Job worker {self.worker_id} stopped")
@@ -0,0 +1,154 @@
+"""
+Deterministic lead scoring for free-audit submissions.
+
+Each structured answer of the audit form is worth a number of points (see
+DEFAULT_WEIGHTS): categorical answers are encoded as index arrays into
+per-field weight vectors, channels as a multi-hot matrix, and the score is
+the clipped sum, 0-100. ``LeadScorer.score`` scores one submission at request
+time; ``rescore_all`` re-encodes the whole ``free_audits`` collection in
+batches, scores each batch with a handful of NumPy operations and writes the
+results back with ``bulk_write``.
+
+Every score is stored with the version (a hash) of the weights that produced
+it, so after a weight change only stale documents are rescored.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, List, Sequence
+
+import numpy as np
+from pymongo import UpdateOne
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = ('sector', 'geoArea', 'objective', 'budget')
+
+# Points per answer; anything not listed (or missing) is worth 0
+DEFAULT_WEIGHTS = {
+    'budget': {
+        'under500': 0, '500_1000': 10, '1000_2000': 18, '2000_5000': 25, 'over5000': 30, 'undefined': 5,
+    },
+    'objective': {
+        'acquisition': 12, 'sales': 12, 'leads': 12, 'retention': 8, 'awareness': 6, 'other': 4,
+    },
+    'geoArea': {
+        'ticino': 10, 'romandie': 8, 'national': 8, 'deutschschweiz': 6, 'international': 4,
+    },
+    'sector': {
+        'consulting': 8, 'ecommerce': 8, 'health': 8, 'real_estate': 8, 'retail': 6, 'hospitality': 6,
+        'technology': 6, 'manufacturing': 6, 'finance': 6, 'education': 4, 'other': 4,
+    },
+    # Summed over the selected channels
+    'channels': {
+        'none': 6, 'ads': 3, 'social': 2, 'seo': 2, 'email': 2, 'website': 2, 'offline': 1,
+    },
+    # Points at improvementImportance 5, scaled linearly down to 0 at 1
+    'improvementImportance': 20,
+    'bias': 0,
+    # Minimum score per tier, highest first
+    'tiers': {'hot': 65, 'warm': 40, 'cold': 0},
+}
+
+
+class LeadScorer:
+    def __init__(self, weights: dict = DEFAULT_WEIGHTS):
+        self.weights = weights
+        self.version = hashlib.sha256(json.dumps(weights, sort_keys=True).encode()).hexdigest()[:12]
+
+        # field -> (answer -> index, weight vector with a trailing 0 for unknown answers)
+        self._tables: Dict[str, tuple] = {}
+        for field in CATEGORICAL_FIELDS + ('channels',):
+            table = weights.get(field, {})
+            self._tables[field] = (
+                {answer: i for i, answer in enumerate(table)},
+                np.array(list(table.values()) + [0], dtype=np.float64),
+            )
+        self._importance_points = float(weights.get('improvementImportance', 0))
+        self._bias = float(weights.get('bias', 0))
+        tiers = sorted(weights['tiers'].items(), key=lambda item: item[1], reverse=True)
+        self._tier_names = np.array([name for name, _ in tiers])
+        self._tier_floors = np.array([floor for _, floor in tiers])
+
+    def encode(self, audits: Sequence[dict]) -> Dict[str, np.ndarray]:
+        """Feature arrays: one index array per categorical field, a channel matrix and importance"""
+        n = len(audits)
+        features = {}
+        for field in CATEGORICAL_FIELDS:
+            index, weights = self._tables[field]
+            unknown = len(weights) - 1
+            features[field] = np.fromiter((index.get(audit.get(field), unknown) for audit in audits), np.intp, n)
+
+        channel_index, channel_weights = self._tables['channels']
+        rows, cols = [], []
+        for i, audit in enumerate(audits):
+            for channel in set(audit.get('channels') or ()):
+                j = channel_index.get(channel)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        channels = np.zeros((n, len(channel_weights)), dtype=np.float64)
+        channels[rows, cols] = 1
+        features['channels'] = channels
+
+        features['importance'] = np.fromiter(
+            (audit.get('improvementImportance') or 3 for audit in audits), np.float64, n
+        ).clip(1, 5)
+        return features
+
+    def score_features(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        total = np.full(len(features['importance']), self._bias)
+        for field in CATEGORICAL_FIELDS:
+            total += self._tables[field][1][features[field]]
+        total += features['channels'] @ self._tables['channels'][1]
+        total += self._importance_points * (features['importance'] - 1) / 4
+        return np.clip(np.rint(total), 0, 100).astype(np.int64)
+
+    def tiers(self, scores: np.ndarray) -> np.ndarray:
+        # Index of the first (highest) floor each score reaches
+        reached = scores[:, None] >= self._tier_floors[None, :]
+        return self._tier_names[reached.argmax(axis=1)]
+
+    def score_many(self, audits: Sequence[dict]) -> tuple:
+        scores = self.score_features(self.encode(audits))
+        return scores, self.tiers(scores)
+
+    def score(self, audit: dict) -> dict:
+        """Fields to store on a single audit at request time"""
+        scores, tiers = self.score_many([audit])
+        return {'lead_score': int(scores[0]), 'lead_tier': str(tiers[0]), 'lead_score_version': self.version}
+
+
+SIGNAL_FIELDS = {'_id': 1, 'channels': 1, 'improvementImportance': 1, **{field: 1 for field in CATEGORICAL_FIELDS}}
+
+
+async def rescore_all(collection, scorer: LeadScorer, batch_size: int = 5000) -> int:
+    """Score every audit not yet scored with the current weights; returns the number updated"""
+    updated = 0
+    cursor = collection.find({'lead_score_version': {'$ne': scorer.version}}, SIGNAL_FIELDS).batch_size(batch_size)
+    batch: List[dict] = []
+
+    async def flush():
+        nonlocal updated
+        scores, tiers = scorer.score_many(batch)
+        await collection.bulk_write([
+            UpdateOne({'_id': doc['_id']}, {'$set': {
+                'lead_score': int(score), 'lead_tier': str(tier), 'lead_score_version': scorer.version
+            }})
+            for doc, score, tier in zip(batch, scores, tiers)
+        ], ordered=False)
+        updated += len(batch)
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await flush()
+            batch = []
+    if batch:
+        await flush()
+    metrics.inc('lead_scoring.rescored', updated)
+    logger.info(f"Rescored {updated} audits with lead weights {scorer.version}")
+    return updated
@@ -0,0 +1,346 @@
+"""
+LLM access for the audit pipeline.
+
+``HedgedLlm`` spreads a request over several providers: the fastest one (by
+rolling p95) is called first, and if it has not started answering by its own
+p95 the next provider is fired as a hedge; the first provider to produce
+output wins and the others are cancelled. Failures fail over immediately, and the whole request
+is bounded by a deadline.
+
+``LlmClient`` holds the provider configuration and the imported SDK classes
+once for the whole process; every call still gets its own chat session so
+conversations never leak into each other. ``HttpLlmClient`` talks to an
+OpenAI-compatible chat completions endpoint instead (a self-hosted gateway,
+or the stand-in used by bench/loadtest.py) and can stream the answer
+(``stream: true``), which HedgedLlm forwards to the caller chunk by chunk.
+
+``LlmGovernor`` sits in front of the provider: at most ``max_concurrency``
+calls are in flight, and requests/tokens per minute are paced by token
+buckets. Callers wait in arrival order instead of hitting provider rate
+limits and failing. Queue wait is published through ``metrics`` as
+llm.queue_wait; each governor guards one provider and publishes its own
+in-flight and queued counts as llm.<name>.in_flight and llm.<name>.queued.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, TypeVar
+
+import httpx
+
+from metrics import LatencyStats, metrics
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class LlmError(Exception):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for latin text)"""
+    return len(text) // 4 + 1
+
+
+class LlmClient:
+    def __init__(
+        self,
+        api_key: str,
+        provider: str,
+        model: str,
+        system_message: str,
+        governor: Optional['LlmGovernor'] = None,
+        max_output_tokens: int = 2000,
+    ):
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+        self.system_message = system_message
+        self.governor = governor
+        self.max_output_tokens = max_output_tokens
+        self._chat_cls = None
+        self._message_cls = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+    def _classes(self):
+        if self._chat_cls is None:
+            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            self._chat_cls, self._message_cls = LlmChat, UserMessage
+        return self._chat_cls, self._message_cls
+
+    async def complete(self, prompt: str) -> str:
+        if self.governor is None:
+            return await self._send(prompt)
+        # Wait for a concurrency slot and rate budget on this provider
+        return await self.governor.run(
+            self._send,
+            prompt,
+            estimated_tokens=estimate_tokens(self.system_message + prompt) + self.max_output_tokens
+        )
+
+    async def _send(self, prompt: str) -> str:
+        chat_cls, message_cls = self._classes()
+        chat = chat_cls(
+            api_key=self.api_key,
+            session_id=f"audit-{uuid.uuid4()}",
+            system_message=self.system_message
+        ).with_model(self.provider, self.model)
+        return await chat.send_message(message_cls(text=prompt))
+
+
+class HttpLlmClient(LlmClient):
+    """LlmClient for ``POST {base_url}/chat/completions``, on one pooled connection per process"""
+
+    def __init__(self, api_key: str, base_url: str, provider: str, model: str, system_message: str,
+                 governor: Optional['LlmGovernor'] = None, max_output_tokens: int = 2000, timeout: float = 120,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(api_key, provider, model, system_message, governor, max_output_tokens)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # Created up front (no event loop needed) so concurrent first calls share it
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            headers={'Authorization': f"Bearer {api_key}"},
+            transport=transport
+        )
+
+    def _body(self, prompt: str, stream: bool = False) -> dict:
+        return {
+            'model': self.model,
+            'max_tokens': self.max_output_tokens,
+            'stream': stream,
+            'messages': [
+                {'role': 'system', 'content': self.system_message},
+                {'role': 'user', 'content': prompt},
+            ],
+        }
+
+    async def _send(self, prompt: str) -> str:
+        response = await self._client.post('/chat/completions', json=self._body(prompt))
+        if response.status_code != 200:
+            raise LlmError(f"{self.name} answered {response.status_code}: {response.text[:200]}")
+        return response.json()['choices'][0]['message']['content']
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the answer as the endpoint streams it (server-sent ``data:`` chunks)"""
+        if self.governor is None:
+            async for chunk in self._stream(prompt):
+                yield chunk
+            return
+        estimated = estimate_tokens(self.system_message + prompt) + self.max_output_tokens
+        async with self.governor.slot(estimated_tokens=estimated):
+            with metrics.timer('llm.call'):
+                async for chunk in self._stream(prompt):
+                    yield chunk
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._client.stream('POST', '/chat/completions', json=self._body(prompt, stream=True)) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise LlmError(f"{self.name} answered {response.status_code}: {response.text[:200]}")
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    return
+                choices = json.loads(data).get('choices') or [{}]
+                content = (choices[0].get('delta') or {}).get('content')
+                if content:
+                    yield content
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class LlmGovernor:
+    def __init__(
+        self,
+        name: str = 'default',
+        max_concurrency: int = 4,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 60000,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = TokenBucket(requests_per_minute / 60, capacity=max(1, requests_per_minute / 60 * 5))
+        self._tokens = TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute)
+        self.in_flight = 0
+        self.queued = 0
+
+    def _publish(self):
+        metrics.set_gauge(f"llm.{self.name}.in_flight", self.in_flight)
+        metrics.set_gauge(f"llm.{self.name}.queued", self.queued)
+
+    async def run(self, call: Callable[..., Awaitable[T]], *args, estimated_tokens: int = 1000) -> T:
+        """Run ``call(*args)`` once a concurrency slot and rate budget are available"""
+        async with self.slot(estimated_tokens):
+            with metrics.timer('llm.call'):
+                return await call(*args)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 1000):
+        """Hold a concurrency slot (e.g. for a whole streamed answer) once the rate budget allows"""
+        queued_at = time.monotonic()
+        self.queued += 1
+        self._publish()
+        started = False
+        try:
+            async with self._semaphore:
+                await self._requests.acquire()
+                await self._tokens.acquire(estimated_tokens)
+                started = True
+                self.queued -= 1
+                self.in_flight += 1
+                self._publish()
+                metrics.observe('llm.queue_wait', time.monotonic() - queued_at)
+                yield
+        finally:
+            if started:
+                self.in_flight -= 1
+            else:
+                self.queued -= 1
+            self._publish()
+
+
+class HedgedLlm:
+    """
+    Providers need a ``name`` and ``async complete(prompt) -> str``; if they
+    also have ``stream(prompt)`` (an async iterator of text chunks) it is
+    used instead. LlmClient, or a fake in tests.
+    """
+
+    def __init__(
+        self,
+        providers: List,
+        deadline_seconds: float = 90,
+        hedge_delay_seconds: float = 30,
+        min_hedge_delay_seconds: float = 1,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        if not providers:
+            raise ValueError("HedgedLlm needs at least one provider")
+        self.providers = list(providers)
+        self.deadline_seconds = deadline_seconds
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.min_hedge_delay_seconds = min_hedge_delay_seconds
+        self.min_samples = min_samples
+        self.stats = {}
+        for provider in self.providers:
+            stats = LatencyStats(window)
+            metrics.latencies[f"llm.provider.{provider.name}"] = stats
+            self.stats[provider.name] = stats
+
+    def expected_latency(self, provider) -> float:
+        """Rolling p95 of successful calls, or the configured delay until there are enough samples"""
+        stats = self.stats[provider.name]
+        if len(stats.samples) < self.min_samples:
+            return self.hedge_delay_seconds
+        return stats.percentile(95)
+
+    def ranked(self) -> List:
+        """Providers in the order they should be tried: mostly-failing ones last, then by p95"""
+        def key(item):
+            index, provider = item
+            stats = self.stats[provider.name]
+            failing = stats.count >= self.min_samples and stats.errors / stats.count > 0.5
+            return (failing, self.expected_latency(provider), index)
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
+
+    async def _pump(self, provider, prompt: str, queue: asyncio.Queue):
+        """Run one provider, forwarding its chunks to the shared queue"""
+        start = time.monotonic()
+        try:
+            if hasattr(provider, 'stream'):
+                async for chunk in provider.stream(prompt):
+                    queue.put_nowait(('chunk', provider, chunk))
+            else:
+                queue.put_nowait(('chunk', provider, await provider.complete(prompt)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats[provider.name].observe(time.monotonic() - start, error=True)
+            queue.put_nowait(('error', provider, e))
+            return
+        self.stats[provider.name].observe(time.monotonic() - start)
+        queue.put_nowait(('done', provider, None))
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yield the answer in chunks. Providers race until one produces its
+        first chunk; that provider wins, the others are cancelled and the
+        rest of the answer comes from the winner only.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_seconds
+        ranked = self.ranked()
+        waiting = list(ranked)
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks = {}
+        winner = None
+        errors = []
+
+        def launch():
+            provider = waiting.pop(0)
+            tasks[provider.name] = asyncio.create_task(self._pump(provider, prompt, queue))
+            return loop.time() + max(self.expected_latency(provider), self.min_hedge_delay_seconds) if waiting else None
+
+        hedge_at = launch()
+        try:
+            while True:
+                now = loop.time()
+                if now >= deadline:
+                    metrics.inc('llm.deadline_exceeded')
+                    raise LlmError(f"No LLM answer within {self.deadline_seconds}s")
+                timeout = deadline - now if hedge_at is None else min(deadline, hedge_at) - now
+                try:
+                    kind, provider, value = await asyncio.wait_for(queue.get(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    if hedge_at is not None and loop.time() >= hedge_at:
+                        metrics.inc('llm.hedged')
+                        hedge_at = launch()
+                    continue
+
+                if winner is not None and provider is not winner:
+                    continue
+                if kind == 'chunk':
+                    if winner is None:
+                        winner, hedge_at = provider, None
+                        if provider is not ranked[0]:
+                            metrics.inc('llm.hedge_wins')
+                        for name, task in tasks.items():
+                            if name != provider.name:
+                                task.cancel()
+                    yield value
+                elif kind == 'done':
+                    return
+                else:
+                    logger.warning(f"LLM provider {provider.name} failed: {value!r}")
+                    if winner is not None:
+                        raise LlmError(f"{provider.name} failed mid-answer: {value!r}")
+                    errors.append(f"{provider.name}: {value!r}")
+                    del tasks[provider.name]
+                    if waiting and not tasks:
+                        metrics.inc('llm.failover')
+                        hedge_at = launch()
+                    elif not tasks:
+                        raise LlmError(f"All LLM providers failed ({'; '.join(errors)})")
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def complete(self, prompt: str) -> str:
+        return ''.join([chunk async for chunk in self.stream(prompt)])
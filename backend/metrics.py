@@ -0,0 +1,83 @@
+"""
+In-process metrics: counters, gauges and latency percentiles.
+
+Kept deliberately small - values are per worker process and reset on restart.
+They are exposed through /api/debug/metrics.
+"""
+
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+
+class LatencyStats:
+    """Rolling window of latency samples (seconds)"""
+
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.samples.append(seconds)
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p95_ms': round(self.percentile(95) * 1000, 2),
+            'p99_ms': round(self.percentile(99) * 1000, 2),
+            'max_ms': round(max(self.samples, default=0) * 1000, 2),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.gauges: Dict[str, float] = {}
+        self.latencies: Dict[str, LatencyStats] = defaultdict(LatencyStats)
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def add_gauge(self, name: str, delta: float):
+        self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        self.latencies[name].observe(seconds, error)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the duration of the block, flagging it as an error if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - start, error=True)
+            raise
+        self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        return {
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'latencies': {name: stats.snapshot() for name, stats in self.latencies.items()},
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,270 @@
+"""
+PDF rendering for the strategic evaluation.
+
+reportlab builds are synchronous and CPU-bound, so PdfRenderService runs them
+in a bounded ProcessPoolExecutor instead of on the event loop. Each worker
+imports reportlab and builds the paragraph styles once (see ``warm_up``) and
+reuses them for every document it renders.
+
+When the pool is saturated or a render fails or times out, ``text_pdf`` writes
+the plain evaluation text as a bare PDF by hand, so the attachment is always a
+PDF.
+"""
+
+import asyncio
+import logging
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-process cache filled by warm_up()
+_styles = None
+
+
+def warm_up():
+    """Import reportlab and build the stylesheet once for this process"""
+    global _styles
+    if _styles is not None:
+        return
+
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+
+    styles = getSampleStyleSheet()
+    _styles = {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=20,
+            textColor=HexColor('#1a1a1a'),
+            alignment=TA_CENTER
+        ),
+        'header': ParagraphStyle(
+            'CustomHeader',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceBefore=15,
+            spaceAfter=10,
+            textColor=HexColor('#333333')
+        ),
+        'body': ParagraphStyle(
+            'CustomBody',
+            parent=styles['Normal'],
+            fontSize=11,
+            leading=16,
+            spaceAfter=8,
+            alignment=TA_JUSTIFY
+        ),
+        'footer': ParagraphStyle(
+            'CustomFooter',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=HexColor('#666666'),
+            alignment=TA_CENTER
+        ),
+    }
+
+
+def _escape(text: str) -> str:
+    """Escape special characters for ReportLab"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _blocks_story(blocks: list, body_style) -> list:
+    from reportlab.platypus import Paragraph
+
+    story = []
+    for block in blocks:
+        if block['type'] == 'paragraph':
+            story.append(Paragraph(_escape(block['text']), body_style))
+        else:
+            for index, item in enumerate(block['items'], 1):
+                marker = f"{index}." if block['ordered'] else '•'
+                story.append(Paragraph(f"  {marker} {_escape(item)}", body_style))
+    return story
+
+
+def render_pdf(evaluation: dict, company_name: str, date_str: str, benchmark: Optional[str] = None) -> bytes:
+    """
+    Build the evaluation PDF from the parsed section tree (see
+    evaluation_parser.py), with an optional peer-benchmark sentence under the
+    header. Runs inside a pool worker (or inline as a fallback).
+    """
+    warm_up()
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    title_style = _styles['title']
+    header_style = _styles['header']
+    body_style = _styles['body']
+    footer_style = _styles['footer']
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm
+    )
+
+    story = []
+
+    # Header
+    story.append(Paragraph("Arxéon – Valutazione Strategica", title_style))
+    story.append(Spacer(1, 0.5*cm))
+    story.append(Paragraph(f"Preparata per: {company_name}", body_style))
+    story.append(Paragraph(f"Data: {date_str}", body_style))
+    if benchmark:
+        story.append(Paragraph(_escape(benchmark), body_style))
+    story.append(Spacer(1, 1*cm))
+
+    # Evaluation sections
+    if evaluation.get('title'):
+        story.append(Paragraph(_escape(evaluation['title']), header_style))
+    story.extend(_blocks_story(evaluation['preamble'], body_style))
+    for section in evaluation['sections']:
+        heading = section['heading']
+        if section['number'] is not None:
+            heading = f"{section['number']}. {heading}"
+        if section['final']:
+            story.append(Spacer(1, 0.5*cm))
+        story.append(Paragraph(_escape(heading), header_style))
+        story.extend(_blocks_story(section['blocks'], body_style))
+        story.append(Spacer(1, 0.3*cm))
+
+    # Footer
+    story.append(Spacer(1, 1*cm))
+    story.append(Paragraph("─" * 50, footer_style))
+    story.append(Paragraph("Documento riservato – uso informativo", footer_style))
+    story.append(Paragraph("Arxéon – Marketing strategico orientato ai risultati", footer_style))
+
+    doc.build(story)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def _pdf_string(text: str) -> bytes:
+    """A PDF literal string for the standard Helvetica font (WinAnsi encoding)"""
+    encoded = text.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def text_pdf(text: str, width: int = 95, lines_per_page: int = 60) -> bytes:
+    """
+    A minimal valid PDF of plain text: Helvetica 10pt on A4, wrapped at
+    ``width`` characters. Needs no reportlab and no pool worker.
+    """
+    lines = []
+    for paragraph in text.splitlines():
+        lines.extend(textwrap.wrap(paragraph, width) or [''])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Object n is objects[n - 1]; the page tree (2) is filled in once the pages are known
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for page in pages:
+        stream = b'BT /F1 10 Tf 12 TL 57 785 Td\n'
+        stream += b''.join(b'(' + _pdf_string(line) + b') Tj T*\n' for line in page) + b'ET'
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects)
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(kids)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class PdfRenderService:
+    """
+    Bounded process pool for PDF rendering.
+
+    At most ``workers + queue_depth`` renders are accepted at once; anything
+    beyond that, or a render that exceeds ``timeout`` seconds, falls back to
+    a plain-text PDF so callers never wait unboundedly. A render that timed
+    out keeps its slot until the worker actually finishes it, so the bound
+    holds for the pool and not just for the callers still waiting.
+    """
+
+    def __init__(self, workers: int = 2, queue_depth: int = 8, timeout: float = 30):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(workers + queue_depth)
+        self.fallbacks = 0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+            # Spawn the workers now so the first audit does not pay for it
+            for _ in range(self.workers):
+                self._executor.submit(warm_up)
+            logger.info(f"PDF render pool started ({self.workers} workers, queue depth {self.queue_depth})")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, evaluation: dict, audit_data: dict, benchmark: Optional[str] = None) -> bytes:
+        """Render the evaluation PDF off the event loop, falling back to a plain-text PDF on overload"""
+        company_name = audit_data.get('companyName', 'N/A')
+        date_str = datetime.now().strftime('%d/%m/%Y')
+
+        if self._slots.locked():
+            self.fallbacks += 1
+            logger.warning("PDF render pool saturated - falling back to text")
+            return self._fallback(audit_data, company_name, date_str, benchmark)
+
+        self.start()
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(render_pdf, evaluation, company_name, date_str, benchmark)
+        except Exception:
+            self._slots.release()
+            raise
+        # Released when the worker is done with it, not when we stop waiting
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+        try:
+            # On timeout this cancels the render if it is still queued; a running one finishes
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.fallbacks += 1
+            logger.error(f"PDF render timed out after {self.timeout}s - falling back to text")
+        except Exception as e:
+            self.fallbacks += 1
+            logger.error(f"Error generating PDF: {e}")
+        return self._fallback(audit_data, company_name, date_str, benchmark)
+
+    @staticmethod
+    def _fallback(audit_data: dict, company_name: str, date_str: str, benchmark: Optional[str]) -> bytes:
+        header = ["Arxéon – Valutazione Strategica", f"Preparata per: {company_name}", f"Data: {date_str}"]
+        if benchmark:
+            header.append(benchmark)
+        return text_pdf('\n'.join(header + ['', audit_data.get('evaluation_text', '')]))
@@ -0,0 +1,138 @@
+"""
+Memoised bundle pricing engine.
+
+Built once from the package / add-on catalog. Each add-on gets a bit and each
+package an "allowed add-ons" mask. A (package, add-on set) bundle is priced
+the first time it is quoted and kept, so validating a repeat checkout and
+building its Stripe line items is a dict lookup. Pricing every subset up
+front would cost 2^n bundles per package, too many for an edited catalog
+with a few dozen add-ons; at most ``max_cached_bundles`` are kept.
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class PricingError(ValueError):
+    """Raised for unknown packages/add-ons or add-ons not allowed for a package"""
+
+
+class Bundle(NamedTuple):
+    package: str
+    addons: Tuple[str, ...]          # canonical (catalog) order
+    line_items: Tuple[dict, ...]     # recurring items first, then one-time
+    total_monthly: int
+    total_one_time: int
+    has_one_time: bool
+
+
+def _line_item(name: str, amount: int, recurring: bool) -> dict:
+    price_data = {
+        'currency': 'chf',
+        'product_data': {'name': name},
+        'unit_amount': amount,
+    }
+    if recurring:
+        price_data['recurring'] = {'interval': 'month'}
+    return {'price_data': price_data, 'quantity': 1}
+
+
+class PricingEngine:
+    def __init__(self, packages: dict, addons: dict, valid_categories: List[str], max_cached_bundles: int = 4096):
+        self.packages = packages
+        self.addons = addons
+        self.valid_categories = list(valid_categories)
+
+        self.addon_codes: Tuple[str, ...] = tuple(addons)
+        self.addon_bits: Dict[str, int] = {code: 1 << i for i, code in enumerate(self.addon_codes)}
+        self.allowed_masks: Dict[str, int] = {
+            pkg: sum(bit for code, bit in self.addon_bits.items() if pkg in addons[code]['allowed_packages'])
+            for pkg in packages
+        }
+
+        # Compatibility matrix: package -> addon code -> allowed
+        self.compatibility: Dict[str, Dict[str, bool]] = {
+            pkg: {code: bool(mask & self.addon_bits[code]) for code in self.addon_codes}
+            for pkg, mask in self.allowed_masks.items()
+        }
+
+        self._item_templates = {
+            code: _line_item(addon['name'], addon['amount'], addon['type'] == 'recurring')
+            for code, addon in addons.items()
+        }
+        self.max_cached_bundles = max_cached_bundles
+        self._bundles: Dict[Tuple[str, int], Bundle] = {}
+
+        self.addons_config = self._build_addons_config()
+        self.addon_summaries: Dict[str, str] = {
+            code: f"{addon['name']} - CHF {addon['amount'] / 100:.0f}"
+                  f"{'/mese' if addon['type'] == 'recurring' else ' (una tantum)'}"
+            for code, addon in addons.items()
+        }
+
+    def _build_bundle(self, package: str, mask: int) -> Bundle:
+        pkg = self.packages[package]
+        codes = tuple(code for code in self.addon_codes if mask & self.addon_bits[code])
+        recurring = [code for code in codes if self.addons[code]['type'] == 'recurring']
+        one_time = [code for code in codes if self.addons[code]['type'] != 'recurring']
+
+        line_items = [_line_item(pkg['name'], pkg['amount'], True)]
+        line_items += [self._item_templates[code] for code in recurring + one_time]
+
+        return Bundle(
+            package=package,
+            addons=codes,
+            line_items=tuple(line_items),
+            total_monthly=pkg['amount'] + sum(self.addons[code]['amount'] for code in recurring),
+            total_one_time=sum(self.addons[code]['amount'] for code in one_time),
+            has_one_time=bool(one_time),
+        )
+
+    def _build_addons_config(self) -> dict:
+        addons_by_package = {pkg: [] for pkg in self.packages}
+        for code, addon in self.addons.items():
+            addon_info = {
+                "code": code,
+                "name": addon["name"],
+                "amount": addon["amount"],
+                "type": addon["type"]
+            }
+            for pkg in addon["allowed_packages"]:
+                addons_by_package[pkg].append(addon_info)
+
+        return {
+            "packages": {
+                pkg: {"name": info["name"], "amount": info["amount"]}
+                for pkg, info in self.packages.items()
+            },
+            "addons": addons_by_package,
+            "validCategories": self.valid_categories
+        }
+
+    def addon_mask(self, package: str, addon_codes: Iterable[str]) -> int:
+        """Validate add-on codes for a package and return their bit mask"""
+        if package not in self.allowed_masks:
+            raise PricingError(f"Invalid package: {package}")
+        allowed = self.allowed_masks[package]
+        mask = 0
+        for code in addon_codes:
+            bit = self.addon_bits.get(code)
+            if bit is None:
+                raise PricingError(f"Invalid addon code: {code}")
+            if not bit & allowed:
+                raise PricingError(f"Addon '{code}' not allowed for package '{package}'")
+            mask |= bit
+        return mask
+
+    def quote(self, package: str, addon_codes: Iterable[str]) -> Bundle:
+        """Return the bundle, pricing it on first use. Duplicate add-on codes count once."""
+        key = (package, self.addon_mask(package, addon_codes))
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            bundle = self._build_bundle(*key)
+            if len(self._bundles) < self.max_cached_bundles:
+                self._bundles[key] = bundle
+        return bundle
+
+    def summary_lines(self, addon_codes: Iterable[str]) -> List[str]:
+        """Human-readable add-on lines for emails; unknown codes are skipped"""
+        return [self.addon_summaries[code] for code in addon_codes if code in self.addon_summaries]
@@ -0,0 +1,167 @@
+"""
+Data access for subscriptions, onboarding and free audits.
+
+Each method maps to a single MongoDB round trip and reads only the fields its
+caller needs (see the *_FIELDS projections below).
+
+Subscriptions and audits carry a ``version`` that every update increments;
+updates also wake long-poll requests waiting on the document through the
+optional ``notifier`` (see status_notifier.py).
+"""
+
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from status_notifier import StatusNotifier
+
+
+def projection(*fields: str) -> dict:
+    return {'_id': 0, **{field: 1 for field in fields}}
+
+
+# Public subscription view (ThankYou page, verify-session)
+SUBSCRIPTION_FIELDS = projection(
+    'id', 'email', 'package', 'included_category', 'selected_platform', 'addons',
+    'stripe_customer_id', 'stripe_subscription_id', 'stripe_session_id', 'status', 'payment_status',
+    'total_monthly', 'total_one_time', 'created_at', 'updated_at', 'version'
+)
+# What the confirmation / receipt emails render
+SUBSCRIPTION_EMAIL_FIELDS = projection(
+    'id', 'email', 'package', 'included_category', 'addons', 'total_monthly', 'total_one_time', 'locale'
+)
+
+ONBOARDING_FIELDS = projection(
+    'id', 'subscription_id', 'full_name', 'email', 'company', 'website', 'social_platforms',
+    'social_links', 'has_gmb', 'gmb_link', 'ads_platforms', 'main_objective', 'notes', 'created_at'
+)
+
+# Status view of an audit: the evaluation text and contact details stay server-side
+AUDIT_STATUS_FIELDS = projection(
+    'id', 'status', 'companyName', 'created_at', 'completed_at', 'email_sent_at',
+    'marketing_score', 'marketing_level', 'version',
+    # Outline of the parsed evaluation; the full text is only delivered by email
+    'evaluation.title', 'evaluation.sections.number', 'evaluation.sections.heading',
+    'evaluation.score_explanation'
+)
+
+# Sales lead queue (admin only)
+LEAD_FIELDS = projection(
+    'id', 'created_at', 'status', 'fullName', 'email', 'phone', 'companyName', 'sector', 'geoArea',
+    'budget', 'objective', 'lead_score', 'lead_tier'
+)
+
+STATUS_CHECK_FIELDS = projection('id', 'client_name', 'timestamp')
+
+
+def encode_status_cursor(check: dict) -> str:
+    """Keyset position of a status check, for ?after= (see StatusCheckRepository.page)"""
+    return f"{check['timestamp']},{check['id']}"
+
+
+def decode_status_cursor(after: str) -> Tuple[str, str]:
+    timestamp, sep, check_id = after.rpartition(',')
+    if not sep or not timestamp or not check_id:
+        raise ValueError(f"Invalid status cursor: {after!r}")
+    return timestamp, check_id
+
+
+class SubscriptionRepository:
+    def __init__(self, collection, notifier: Optional[StatusNotifier] = None):
+        self.collection = collection
+        self.notifier = notifier
+
+    def _changed(self, doc: Optional[dict]):
+        if self.notifier and doc and doc.get('id'):
+            self.notifier.notify(f"subscription:{doc['id']}")
+
+    async def insert(self, doc: dict):
+        # insert_one adds _id to the dict it is given; keep the caller's copy clean
+        await self.collection.insert_one({**doc, 'version': 0})
+
+    async def get(self, subscription_id: str, fields: dict = SUBSCRIPTION_FIELDS) -> Optional[dict]:
+        return await self.collection.find_one({'id': subscription_id}, fields)
+
+    async def get_by_session_id(self, session_id: str, fields: dict = SUBSCRIPTION_FIELDS) -> Optional[dict]:
+        return await self.collection.find_one({'stripe_session_id': session_id}, fields)
+
+    async def get_by_stripe_id(self, stripe_subscription_id: str, fields: dict = SUBSCRIPTION_EMAIL_FIELDS) -> Optional[dict]:
+        return await self.collection.find_one({'stripe_subscription_id': stripe_subscription_id}, fields)
+
+    async def update(self, subscription_id: str, fields: dict, returning: dict = SUBSCRIPTION_EMAIL_FIELDS) -> Optional[dict]:
+        """Apply $set and return the updated document in the same round trip"""
+        doc = await self.collection.find_one_and_update(
+            {'id': subscription_id},
+            {'$set': fields, '$inc': {'version': 1}},
+            projection={**returning, 'id': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        self._changed(doc)
+        return doc
+
+    async def update_by_stripe_id(self, stripe_subscription_id: str, fields: dict,
+                                  returning: dict = SUBSCRIPTION_EMAIL_FIELDS) -> Optional[dict]:
+        doc = await self.collection.find_one_and_update(
+            {'stripe_subscription_id': stripe_subscription_id},
+            {'$set': fields, '$inc': {'version': 1}},
+            projection={**returning, 'id': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        self._changed(doc)
+        return doc
+
+
+class OnboardingRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, doc: dict):
+        await self.collection.insert_one(dict(doc))
+
+    async def get(self, onboarding_id: str, fields: dict = ONBOARDING_FIELDS) -> Optional[dict]:
+        return await self.collection.find_one({'id': onboarding_id}, fields)
+
+
+class AuditRepository:
+    def __init__(self, collection, notifier: Optional[StatusNotifier] = None):
+        self.collection = collection
+        self.notifier = notifier
+
+    async def insert(self, doc: dict):
+        await self.collection.insert_one({**doc, 'version': 0})
+
+    async def get(self, audit_id: str, fields: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one({'id': audit_id}, fields or {'_id': 0})
+
+    async def get_status(self, audit_id: str) -> Optional[dict]:
+        return await self.get(audit_id, AUDIT_STATUS_FIELDS)
+
+    async def update(self, audit_id: str, fields: dict):
+        await self.collection.update_one({'id': audit_id}, {'$set': fields, '$inc': {'version': 1}})
+        if self.notifier:
+            self.notifier.notify(f"audit:{audit_id}")
+
+
+class StatusCheckRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def page(self, after: Optional[Tuple[str, str]] = None, limit: int = 0, batch_size: int = 500):
+        """
+        Cursor over status checks in (timestamp, id) order, starting after the
+        given keyset position. Served by the (timestamp, id) index, so every
+        page costs the same however deep it is. ``limit=0`` means no limit.
+        """
+        query = {}
+        if after:
+            timestamp, check_id = after
+            query = {'$or': [
+                {'timestamp': {'$gt': timestamp}},
+                {'timestamp': timestamp, 'id': {'$gt': check_id}},
+            ]}
+        return (
+            self.collection.find(query, STATUS_CHECK_FIELDS)
+            .sort([('timestamp', 1), ('id', 1)])
+            .limit(limit)
+            .batch_size(batch_size)
+        )
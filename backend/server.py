@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Header, BackgroundTasks
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -6,14 +7,41 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Literal
+from typing import Callable, List, Optional, Literal, Tuple
 import uuid
 from datetime import datetime, timezone
 import stripe
 import json
 import asyncio
 import base64
-from io import BytesIO
+import hashlib
+import hmac
+import functools
+from bson import Binary
+from jobs import JobQueue, NextStage
+from pdf_renderer import PdfRenderService
+from stripe_gateway import StripeGateway
+from metrics import metrics
+from pricing import PricingError
+from catalog import Catalog, cached_json, json_response
+from stripe_events import StripeEventConsumer
+from indexes import IndexManager
+from email_outbox import EmailOutbox
+from email_transport import LogTransport, ResendTransport, SmtpTransport
+from email_templates import EmailTemplateEngine
+from evaluation_cache import EvaluationCache
+from evaluation_parser import evaluation_level, evaluation_score, parse_evaluation
+from llm import HedgedLlm, HttpLlmClient, LlmClient, LlmGovernor
+from audit_events import AuditEventBus, TERMINAL_EVENTS
+from repository import (
+    LEAD_FIELDS, AuditRepository, OnboardingRepository, StatusCheckRepository, SubscriptionRepository,
+    decode_status_cursor, encode_status_cursor
+)
+from status_notifier import StatusNotifier
+from analytics import DIMENSIONS, Analytics
+from exports import ExportError, FORMATS, export_filename, export_stream
+from lead_scoring import DEFAULT_WEIGHTS, LeadScorer, rescore_all
+from benchmarks import ScoreBenchmarks
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -23,10 +51,59 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Repositories (see repository.py); updates wake long-poll requests (see status_notifier.py)
+status_notifier = StatusNotifier()
+subscriptions_repo = SubscriptionRepository(db.subscriptions, notifier=status_notifier)
+onboarding_repo = OnboardingRepository(db.onboarding)
+audits_repo = AuditRepository(db.free_audits, notifier=status_notifier)
+status_checks_repo = StatusCheckRepository(db.status_checks)
+
+# Daily revenue/funnel rollups, updated on checkout, webhook and audit (see analytics.py)
+analytics = Analytics(db.analytics_daily, subscriptions=db.subscriptions, audits=db.free_audits)
+
+# Deterministic lead score for every audit (see lead_scoring.py); weights can
+# be overridden from a JSON file, then POST /api/admin/leads/rescore
+LEAD_WEIGHTS_FILE = os.environ.get('LEAD_WEIGHTS_FILE', '')
+
+def load_lead_weights() -> dict:
+    if not LEAD_WEIGHTS_FILE:
+        return DEFAULT_WEIGHTS
+    with open(LEAD_WEIGHTS_FILE, encoding='utf-8') as f:
+        return {**DEFAULT_WEIGHTS, **json.load(f)}
+
+lead_scorer = LeadScorer(load_lead_weights())
+
+# Score distributions per sector x area, for "Nth percentile among peers" (see benchmarks.py)
+benchmarks = ScoreBenchmarks(
+    db.score_benchmarks,
+    audits=db.free_audits,
+    min_peers=int(os.environ.get('BENCHMARK_MIN_PEERS', '20'))
+)
+
+# Admin endpoints are disabled unless a key is configured
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', '')
+
+# Upper bound for ?wait= on the status endpoints
+LONG_POLL_MAX_SECONDS = float(os.environ.get('LONG_POLL_MAX_SECONDS', '30'))
+# Follow subscription/audit changes from other processes (needs a replica set)
+STATUS_CHANGE_STREAMS = os.environ.get('STATUS_CHANGE_STREAMS', 'false').lower() == 'true'
+
+def long_poll_timeout(wait: float) -> float:
+    return max(0.0, min(wait, LONG_POLL_MAX_SECONDS))
+
 # Stripe configuration
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', '')
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
 
+# Stripe calls run on their own client and thread pool (see stripe_gateway.py)
+stripe_gateway = StripeGateway(
+    STRIPE_SECRET_KEY,
+    # Only set to point at a stand-in (see bench/loadtest.py)
+    api_base=os.environ.get('STRIPE_API_BASE'),
+    max_concurrency=int(os.environ.get('STRIPE_MAX_CONCURRENCY', '16')),
+    timeout=float(os.environ.get('STRIPE_TIMEOUT', '10'))
+)
+
 # App Base URL configuration (for Stripe redirects)
 APP_BASE_URL = os.environ.get('APP_BASE_URL', '')
 
@@ -36,10 +113,68 @@ FRONTEND_URL = FRONTEND_URL.rstrip('/')  # Remove trailing slash
 
 # Resend configuration
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
+EMAIL_FROM = os.environ.get('EMAIL_FROM', 'Arxéon <noreply@arxeon.ch>')
+RESEND_RATE_LIMIT = float(os.environ.get('RESEND_RATE_LIMIT', '2'))  # requests per second
+RESEND_API_URL = os.environ.get('RESEND_API_URL', 'https://api.resend.com')
+
+# SMTP configuration (own mail host; takes precedence over Resend when SMTP_HOST is set)
+SMTP_HOST = os.environ.get('SMTP_HOST', '')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+SMTP_USER = os.environ.get('SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '3'))
 
 # Emergent LLM Key for AI generation
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
 
+# Background job queue configuration
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', '10'))
+JOB_WORKER_ENABLED = os.environ.get('JOB_WORKER_ENABLED', 'true').lower() == 'true'
+AUDIT_EMAIL_DELAY_SECONDS = int(os.environ.get('AUDIT_EMAIL_DELAY_SECONDS', '300'))  # 5 minutes
+
+# Durable queue for audit processing (survives restarts, see jobs.py)
+job_queue = JobQueue(db.jobs, concurrency=JOB_WORKER_CONCURRENCY)
+
+# Email transport with pooled connections, opened on startup (see email_transport.py)
+if SMTP_HOST:
+    email_transport = SmtpTransport(
+        SMTP_HOST,
+        SMTP_PORT,
+        username=SMTP_USER,
+        password=SMTP_PASSWORD,
+        pool_size=SMTP_POOL_SIZE,
+        starttls=SMTP_STARTTLS,
+        use_tls=SMTP_PORT == 465
+    )
+elif RESEND_API_KEY:
+    email_transport = ResendTransport(
+        RESEND_API_KEY,
+        base_url=RESEND_API_URL,
+        max_concurrency=int(os.environ.get('EMAIL_MAX_CONCURRENCY', '10')),
+        timeout=float(os.environ.get('EMAIL_TIMEOUT', '10'))
+    )
+else:
+    email_transport = LogTransport()
+
+# Outgoing email is queued in Mongo and delivered by a dispatcher (see email_outbox.py)
+email_outbox = EmailOutbox(
+    db.email_outbox,
+    email_transport,
+    EMAIL_FROM,
+    rate_per_second=RESEND_RATE_LIMIT
+)
+
+# Email templates, compiled once per locale at import (see email_templates.py)
+email_engine = EmailTemplateEngine()
+
+# PDF rendering process pool
+pdf_service = PdfRenderService(
+    workers=int(os.environ.get('PDF_RENDER_WORKERS', '2')),
+    queue_depth=int(os.environ.get('PDF_RENDER_QUEUE_DEPTH', '8')),
+    timeout=float(os.environ.get('PDF_RENDER_TIMEOUT', '30'))
+)
+
 def get_base_url(request: Request) -> str:
     """Get base URL from env or derive from request headers"""
     if APP_BASE_URL:
@@ -156,6 +291,19 @@ ADDON_PRICES = {
 # Valid included categories for Premium
 VALID_CATEGORIES = ["sito", "social", "ads", "email", "seo"]
 
+# Bundles priced once on first quote (see pricing.py), and the public
+# catalog pre-serialised; hot-reloadable from CATALOG_FILE or the catalog
+# collection (see catalog.py)
+CATALOG_FILE = os.environ.get('CATALOG_FILE', '')
+CATALOG_FROM_DB = os.environ.get('CATALOG_FROM_DB', 'false').lower() == 'true'
+CATALOG_RELOAD_SECONDS = float(os.environ.get('CATALOG_RELOAD_SECONDS', '30'))
+catalog = Catalog(
+    PACKAGE_PRICES,
+    ADDON_PRICES,
+    VALID_CATEGORIES,
+    max_age=int(os.environ.get('CATALOG_MAX_AGE', '300'))
+)
+
 # ============================================================
 # MODELS
 # ============================================================
@@ -176,6 +324,7 @@ class BundleCheckoutRequest(BaseModel):
     includedCategory: Optional[str] = None  # Required for premium
     selectedPlatform: Optional[str] = None  # For social/ads category
     customerEmail: Optional[EmailStr] = None
+    locale: Optional[str] = None  # it/fr, used for Stripe Checkout and emails
 
 # Subscription/Order Model for DB
 class Subscription(BaseModel):
@@ -192,6 +341,7 @@ class Subscription(BaseModel):
     status: str = "pending"
     total_monthly: int = 0
     total_one_time: int = 0
+    locale: str = "it"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -226,104 +376,36 @@ class OnboardingRequest(BaseModel):
     ads_platforms: List[str] = []
     main_objective: str
     notes: Optional[str] = None
+    locale: Optional[str] = None
 
 # ============================================================
 # EMAIL SERVICE
 # ============================================================
 
-async def send_email(to: str, subject: str, html_content: str):
-    """Send email via Resend or fallback to logging"""
-    if RESEND_API_KEY:
-        try:
-            import resend
-            resend.api_key = RESEND_API_KEY
-            
-            params = {
-                "from": "Arxéon <noreply@arxeon.ch>",
-                "to": [to],
-                "subject": subject,
-                "html": html_content
-            }
-            
-            email = resend.Emails.send(params)
-            logger.info(f"Email sent successfully to {to}: {email}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send email via Resend: {e}")
-    
-    # Mock/Log fallback
-    logger.info(f"[MOCK EMAIL] To: {to}")
-    logger.info(f"[MOCK EMAIL] Subject: {subject}")
-    logger.info(f"[MOCK EMAIL] Content: {html_content[:200]}...")
+async def send_email(to: str, subject: str, html_content: str, message_id: Optional[str] = None):
+    """
+    Queue an email in the outbox; delivery happens off the request path.
+    Retried senders (jobs, Stripe events) pass a deterministic message_id.
+    """
+    await email_outbox.enqueue(to, subject, html_content, message_id=message_id)
     return True
 
-def generate_confirmation_email(subscription: dict) -> str:
-    """Generate HTML email for subscription confirmation"""
-    package_name = PACKAGE_PRICES.get(subscription.get('package', ''), {}).get('name', 'Pacchetto')
-    
-    addons_html = ""
-    for addon_code in subscription.get('addons', []):
-        addon = ADDON_PRICES.get(addon_code, {})
-        if addon:
-            price = addon['amount'] / 100
-            suffix = "/mese" if addon['type'] == 'recurring' else " (una tantum)"
-            addons_html += f"<li>{addon['name']} - CHF {price:.0f}{suffix}</li>"
-    
-    category_text = ""
-    if subscription.get('included_category'):
-        category_text = f"<p><strong>Categoria inclusa:</strong> {subscription['included_category'].title()}</p>"
+def generate_confirmation_email(subscription: dict) -> Tuple[str, str]:
+    """Render the subscription confirmation email, returns (subject, html)"""
+    package_name = catalog.pricing.packages.get(subscription.get('package', ''), {}).get('name', 'Pacchetto')
+    addons = catalog.pricing.summary_lines(subscription.get('addons', []))
     
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'Inter', Arial, sans-serif; background: #161716; color: #ffffff; padding: 40px; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: #2a2c29; border-radius: 12px; padding: 40px; }}
-            h1 {{ color: #c8f000; margin-bottom: 20px; }}
-            .highlight {{ color: #c8f000; }}
-            ul {{ padding-left: 20px; }}
-            li {{ margin-bottom: 10px; color: #9a9a96; }}
-            .total {{ font-size: 24px; font-weight: bold; margin-top: 20px; }}
-            .footer {{ margin-top: 40px; padding-top: 20px; border-top: 1px solid #343633; color: #6f716d; font-size: 12px; }}
-            .cta {{ display: inline-block; background: #c8f000; color: #161716; padding: 12px 24px; border-radius: 8px; text-decoration: none; font-weight: bold; margin-top: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Grazie per aver scelto Arxéon</h1>
-            <p>Il tuo abbonamento è stato attivato.</p>
-            
-            <h3>Riepilogo:</h3>
-            <p><strong>Pacchetto:</strong> <span class="highlight">{package_name}</span></p>
-            {category_text}
-            
-            {f"<h4>Add-on selezionati:</h4><ul>{addons_html}</ul>" if addons_html else ""}
-            
-            <p class="total">
-                Totale mensile: <span class="highlight">CHF {subscription.get('total_monthly', 0) / 100:.0f}</span>
-                {f"<br>Una tantum: CHF {subscription.get('total_one_time', 0) / 100:.0f}" if subscription.get('total_one_time', 0) > 0 else ""}
-            </p>
-            
-            <h3>Prossimi passi:</h3>
-            <ol>
-                <li>Compila il formulario di onboarding</li>
-                <li>Analizziamo il tuo caso</li>
-                <li>Prenota la prima consulenza</li>
-            </ol>
-            
-            <a href="{FRONTEND_URL}/onboarding?subscription_id={subscription.get('id', '')}" class="cta">
-                Inizia l'onboarding →
-            </a>
-            
-            <div class="footer">
-                <p>Arxéon - Marketing strategico orientato ai risultati</p>
-                <p>info@arxeon.ch | Lugano, Svizzera</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    return email_engine.render(
+        'subscription_confirmation',
+        subscription.get('locale'),
+        package_name=package_name,
+        included_category=(subscription.get('included_category') or '').title(),
+        has_addons=bool(addons),
+        addons=addons,
+        total_monthly=f"{subscription.get('total_monthly', 0) / 100:.0f}",
+        total_one_time=f"{subscription.get('total_one_time', 0) / 100:.0f}" if subscription.get('total_one_time', 0) > 0 else '',
+        onboarding_url=f"{FRONTEND_URL}/onboarding?subscription_id={subscription.get('id', '')}"
+    )
 
 # ============================================================
 # STRIPE BUNDLE CHECKOUT ENDPOINT
@@ -335,7 +417,7 @@ async def create_bundle_checkout(request: BundleCheckoutRequest):
     Create a Stripe Checkout Session for package + add-ons bundle.
     Frontend sends only codes, backend maps to Stripe price_ids.
     """
-    if not stripe.api_key:
+    if not STRIPE_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Stripe not configured. Please set STRIPE_SECRET_KEY.")
     
     package = request.package
@@ -344,76 +426,20 @@ async def create_bundle_checkout(request: BundleCheckoutRequest):
     selected_platform = request.selectedPlatform
     customer_email = request.customerEmail
     
-    # Validate package
-    if package not in PACKAGE_PRICES:
-        raise HTTPException(status_code=400, detail=f"Invalid package: {package}")
-    
     # Validate Premium requires included category
     if package == "premium":
-        if not included_category or included_category not in VALID_CATEGORIES:
+        if not included_category or included_category not in catalog.pricing.valid_categories:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Premium package requires includedCategory. Valid: {VALID_CATEGORIES}"
+                detail=f"Premium package requires includedCategory. Valid: {catalog.pricing.valid_categories}"
             )
     
-    # Validate add-ons
-    validated_addons = []
-    for addon_code in selected_addons:
-        if addon_code not in ADDON_PRICES:
-            raise HTTPException(status_code=400, detail=f"Invalid addon code: {addon_code}")
-        
-        addon = ADDON_PRICES[addon_code]
-        if package not in addon['allowed_packages']:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Addon '{addon_code}' not allowed for package '{package}'"
-            )
-        validated_addons.append(addon_code)
-    
-    # Build line_items
-    line_items = []
-    total_monthly = 0
-    total_one_time = 0
-    
-    # Add package base price
-    pkg = PACKAGE_PRICES[package]
-    line_items.append({
-        'price_data': {
-            'currency': 'chf',
-            'product_data': {'name': pkg['name']},
-            'unit_amount': pkg['amount'],
-            'recurring': {'interval': 'month'}
-        },
-        'quantity': 1
-    })
-    total_monthly += pkg['amount']
-    
-    # Add validated add-ons
-    for addon_code in validated_addons:
-        addon = ADDON_PRICES[addon_code]
-        
-        if addon['type'] == 'recurring':
-            line_items.append({
-                'price_data': {
-                    'currency': 'chf',
-                    'product_data': {'name': addon['name']},
-                    'unit_amount': addon['amount'],
-                    'recurring': {'interval': 'month'}
-                },
-                'quantity': 1
-            })
-            total_monthly += addon['amount']
-        else:
-            # One-time items - add to subscription as invoice items
-            line_items.append({
-                'price_data': {
-                    'currency': 'chf',
-                    'product_data': {'name': addon['name']},
-                    'unit_amount': addon['amount'],
-                },
-                'quantity': 1
-            })
-            total_one_time += addon['amount']
+    # Validate package + add-ons and look up the (memoised) bundle
+    try:
+        bundle = catalog.pricing.quote(package, selected_addons)
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    validated_addons = list(bundle.addons)
     
     # Create subscription record in DB
     subscription = Subscription(
@@ -422,69 +448,25 @@ async def create_bundle_checkout(request: BundleCheckoutRequest):
         included_category=included_category,
         selected_platform=selected_platform,
         addons=validated_addons,
-        total_monthly=total_monthly,
-        total_one_time=total_one_time,
+        total_monthly=bundle.total_monthly,
+        total_one_time=bundle.total_one_time,
+        locale=email_engine.normalize_locale(request.locale),
         status="pending"
     )
     
     sub_dict = subscription.model_dump()
     sub_dict['created_at'] = sub_dict['created_at'].isoformat()
     sub_dict['updated_at'] = sub_dict['updated_at'].isoformat()
-    await db.subscriptions.insert_one(sub_dict)
     
     try:
-        # Determine checkout mode
-        has_recurring = any(ADDON_PRICES.get(a, {}).get('type') == 'recurring' for a in validated_addons) or True  # Package is always recurring
-        has_one_time = any(ADDON_PRICES.get(a, {}).get('type') == 'one_time' for a in validated_addons)
-        
-        # If we have both recurring and one-time, use subscription mode
-        # One-time items will be charged as part of the first invoice
+        # Package is always recurring, so use subscription mode;
+        # one-time items are charged as part of the first invoice
         mode = 'subscription'
         
-        # Separate line items for subscription mode with one-time charges
-        subscription_items = []
-        one_time_items = []
-        
-        for addon_code in validated_addons:
-            addon = ADDON_PRICES[addon_code]
-            if addon['type'] == 'one_time':
-                one_time_items.append({
-                    'price_data': {
-                        'currency': 'chf',
-                        'product_data': {'name': addon['name']},
-                        'unit_amount': addon['amount'],
-                    },
-                    'quantity': 1
-                })
-            else:
-                subscription_items.append({
-                    'price_data': {
-                        'currency': 'chf',
-                        'product_data': {'name': addon['name']},
-                        'unit_amount': addon['amount'],
-                        'recurring': {'interval': 'month'}
-                    },
-                    'quantity': 1
-                })
-        
-        # Always add package as recurring
-        subscription_items.insert(0, {
-            'price_data': {
-                'currency': 'chf',
-                'product_data': {'name': pkg['name']},
-                'unit_amount': pkg['amount'],
-                'recurring': {'interval': 'month'}
-            },
-            'quantity': 1
-        })
-        
-        # Combine all items (Stripe handles mixed items in subscription mode)
-        all_line_items = subscription_items + one_time_items
-        
         # Create Stripe Checkout Session
         session_params = {
             'payment_method_types': ['card'],
-            'line_items': all_line_items,
+            'line_items': list(bundle.line_items),
             'mode': mode,
             'success_url': f"{FRONTEND_URL}/thank-you?session_id={{CHECKOUT_SESSION_ID}}&subscription_id={subscription.id}",
             'cancel_url': f"{FRONTEND_URL}/checkout/{package}",
@@ -503,19 +485,18 @@ async def create_bundle_checkout(request: BundleCheckoutRequest):
                     'addon_codes': ','.join(validated_addons)
                 }
             },
-            'locale': 'it',
+            'locale': email_engine.normalize_locale(request.locale),
         }
         
         if customer_email:
             session_params['customer_email'] = customer_email
         
-        session = stripe.checkout.Session.create(**session_params)
+        session = await stripe_gateway.create_checkout_session(**session_params)
         
-        # Update subscription with session ID
-        await db.subscriptions.update_one(
-            {'id': subscription.id},
-            {'$set': {'stripe_session_id': session.id}}
-        )
+        # Save the subscription once, together with its session ID
+        sub_dict['stripe_session_id'] = session.id
+        await subscriptions_repo.insert(sub_dict)
+        await analytics.record_checkout(sub_dict)
         
         logger.info(f"Created checkout session {session.id} for subscription {subscription.id}")
         
@@ -527,11 +508,9 @@ async def create_bundle_checkout(request: BundleCheckoutRequest):
         
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error: {e}")
-        # Mark subscription as failed
-        await db.subscriptions.update_one(
-            {'id': subscription.id},
-            {'$set': {'status': 'failed'}}
-        )
+        # Keep a record of the failed attempt
+        sub_dict['status'] = 'failed'
+        await subscriptions_repo.insert(sub_dict)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating checkout session: {e}")
@@ -541,33 +520,9 @@ async def create_bundle_checkout(request: BundleCheckoutRequest):
 # STRIPE WEBHOOK
 # ============================================================
 
-@api_router.post("/webhook/stripe")
-async def stripe_webhook(request: Request, stripe_signature: str = Header(None, alias="stripe-signature")):
-    """Handle Stripe webhooks with signature verification"""
-    payload = await request.body()
-    
-    # Verify webhook signature
-    if STRIPE_WEBHOOK_SECRET:
-        try:
-            event = stripe.Webhook.construct_event(
-                payload, stripe_signature, STRIPE_WEBHOOK_SECRET
-            )
-        except ValueError as e:
-            logger.error(f"Invalid payload: {e}")
-            raise HTTPException(status_code=400, detail="Invalid payload")
-        except stripe.error.SignatureVerificationError as e:
-            logger.error(f"Invalid signature: {e}")
-            raise HTTPException(status_code=400, detail="Invalid signature")
-    else:
-        # Without webhook secret, parse event directly (not recommended for production)
-        logger.warning("STRIPE_WEBHOOK_SECRET not set - skipping signature verification")
-        try:
-            event = json.loads(payload)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON")
-    
+async def process_stripe_event(event: dict):
+    """Apply a stored Stripe event (called by stripe_event_consumer, off the request path)"""
     event_type = event.get('type', '')
-    logger.info(f"Received Stripe webhook: {event_type}")
     
     if event_type == 'checkout.session.completed':
         session = event['data']['object']
@@ -576,11 +531,14 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None,
         
         if subscription_id:
             # Update subscription status
+            now = datetime.now(timezone.utc).isoformat()
             update_data = {
                 'status': 'active',
+                'payment_status': session.get('payment_status'),
                 'stripe_customer_id': session.get('customer'),
                 'stripe_subscription_id': session.get('subscription'),
-                'updated_at': datetime.now(timezone.utc).isoformat()
+                'activated_at': now,
+                'updated_at': now
             }
             
             # Get customer email from session
@@ -588,21 +546,16 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None,
             if customer_email:
                 update_data['email'] = customer_email
             
-            await db.subscriptions.update_one(
-                {'id': subscription_id},
-                {'$set': update_data}
-            )
-            
-            # Get updated subscription
-            subscription = await db.subscriptions.find_one({'id': subscription_id}, {'_id': 0})
+            # Update and read back in one round trip
+            subscription = await subscriptions_repo.update(subscription_id, update_data)
+            if subscription:
+                await analytics.record_activation(subscription)
             
             if subscription and subscription.get('email'):
                 # Send confirmation email
-                await send_email(
-                    to=subscription['email'],
-                    subject="Conferma abbonamento Arxéon - Il tuo servizio è attivo",
-                    html_content=generate_confirmation_email(subscription)
-                )
+                subject, html_content = generate_confirmation_email(subscription)
+                await send_email(to=subscription['email'], subject=subject, html_content=html_content,
+                                 message_id=event.get('id') and f"stripe:{event['id']}")
             
             logger.info(f"Subscription {subscription_id} activated successfully")
     
@@ -611,36 +564,76 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None,
         stripe_subscription_id = invoice.get('subscription')
         
         if stripe_subscription_id:
-            subscription = await db.subscriptions.find_one(
-                {'stripe_subscription_id': stripe_subscription_id},
-                {'_id': 0}
-            )
+            subscription = await subscriptions_repo.get_by_stripe_id(stripe_subscription_id)
             
             if subscription and subscription.get('email'):
-                amount = invoice.get('amount_paid', 0) / 100
-                await send_email(
-                    to=subscription['email'],
-                    subject="Ricevuta pagamento Arxéon",
-                    html_content=f"""
-                    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; background: #2a2c29; padding: 40px; border-radius: 12px;">
-                        <h1 style="color: #c8f000;">Pagamento ricevuto</h1>
-                        <p style="color: #ffffff;">Grazie, il pagamento di CHF {amount:.2f} è stato elaborato correttamente.</p>
-                        <p style="color: #9a9a96;">Pacchetto: {subscription.get('package', '').title()}</p>
-                    </div>
-                    """
+                subject, html_content = email_engine.render(
+                    'payment_receipt',
+                    subscription.get('locale'),
+                    amount=f"{invoice.get('amount_paid', 0) / 100:.2f}",
+                    package=subscription.get('package', '').title()
                 )
+                await send_email(to=subscription['email'], subject=subject, html_content=html_content,
+                                 message_id=event.get('id') and f"stripe:{event['id']}")
     
     elif event_type == 'customer.subscription.deleted':
         subscription_data = event['data']['object']
         stripe_subscription_id = subscription_data.get('id')
         
         if stripe_subscription_id:
-            await db.subscriptions.update_one(
-                {'stripe_subscription_id': stripe_subscription_id},
-                {'$set': {'status': 'cancelled', 'updated_at': datetime.now(timezone.utc).isoformat()}}
+            now = datetime.now(timezone.utc).isoformat()
+            subscription = await subscriptions_repo.update_by_stripe_id(
+                stripe_subscription_id,
+                {'status': 'cancelled', 'cancelled_at': now, 'updated_at': now}
             )
+            if subscription:
+                await analytics.record_cancellation(subscription)
             logger.info(f"Subscription {stripe_subscription_id} cancelled")
     
+
+stripe_event_consumer = StripeEventConsumer(
+    db.stripe_events,
+    db.stripe_event_locks,
+    process_stripe_event,
+    batch_size=int(os.environ.get('STRIPE_EVENTS_BATCH_SIZE', '100')),
+    concurrency=int(os.environ.get('STRIPE_EVENTS_CONCURRENCY', '8')),
+    dedup_ttl_seconds=int(os.environ.get('STRIPE_EVENTS_TTL_DAYS', '30')) * 24 * 3600
+)
+
+@api_router.post("/webhook/stripe")
+async def stripe_webhook(request: Request, stripe_signature: str = Header(None, alias="stripe-signature")):
+    """
+    Verify and store a Stripe webhook event, then acknowledge immediately.
+    The event itself is applied by stripe_event_consumer.
+    """
+    payload = await request.body()
+    
+    # Verify webhook signature
+    if STRIPE_WEBHOOK_SECRET:
+        try:
+            stripe.Webhook.construct_event(
+                payload, stripe_signature, STRIPE_WEBHOOK_SECRET
+            )
+            event = json.loads(payload)
+        except ValueError as e:
+            logger.error(f"Invalid payload: {e}")
+            raise HTTPException(status_code=400, detail="Invalid payload")
+        except stripe.error.SignatureVerificationError as e:
+            logger.error(f"Invalid signature: {e}")
+            raise HTTPException(status_code=400, detail="Invalid signature")
+    else:
+        # Without webhook secret, parse event directly (not recommended for production)
+        logger.warning("STRIPE_WEBHOOK_SECRET not set - skipping signature verification")
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+    
+    logger.info(f"Received Stripe webhook: {event.get('type', '')}")
+    if await stripe_event_consumer.record(event) is None:
+        # Redelivery of an event we already have - nothing else to do
+        return {'status': 'success', 'duplicate': True}
+    
     return {'status': 'success'}
 
 # ============================================================
@@ -648,25 +641,54 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None,
 # ============================================================
 
 @api_router.get("/subscription/{subscription_id}")
-async def get_subscription(subscription_id: str):
-    """Get subscription details"""
-    subscription = await db.subscriptions.find_one({'id': subscription_id}, {'_id': 0})
+async def get_subscription(subscription_id: str, wait: float = 0, since: Optional[int] = None):
+    """
+    Get subscription details.
+    With ?since=<version>&wait=<seconds> the response is held until the
+    subscription changes past that version (or the wait runs out).
+    """
+    subscription = await status_notifier.wait_for_change(
+        f"subscription:{subscription_id}",
+        functools.partial(subscriptions_repo.get, subscription_id),
+        since,
+        long_poll_timeout(wait)
+    )
     if not subscription:
         raise HTTPException(status_code=404, detail="Subscription not found")
     return subscription
 
 @api_router.get("/verify-session/{session_id}")
-async def verify_session(session_id: str):
-    """Verify a Stripe session and return subscription details"""
-    if not stripe.api_key:
+async def verify_session(session_id: str, wait: float = 0, since: Optional[int] = None):
+    """
+    Verify a Stripe session and return subscription details.
+    Once the webhook has recorded the payment the answer comes from our own
+    data, without a Stripe call; ?since=&wait= long-poll as in get_subscription.
+    """
+    if not STRIPE_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Stripe not configured")
     
+    subscription = await subscriptions_repo.get_by_session_id(session_id)
+    if subscription:
+        subscription = await status_notifier.wait_for_change(
+            f"subscription:{subscription['id']}",
+            functools.partial(subscriptions_repo.get, subscription['id']),
+            since,
+            long_poll_timeout(wait)
+        )
+    if subscription and subscription.get('payment_status'):
+        metrics.inc('verify_session.local')
+        return {
+            'valid': True,
+            'payment_status': subscription['payment_status'],
+            'subscription': subscription
+        }
+    
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = await stripe_gateway.retrieve_checkout_session(session_id)
         subscription_id = session.metadata.get('subscription_id')
         
         if subscription_id:
-            subscription = await db.subscriptions.find_one({'id': subscription_id}, {'_id': 0})
+            subscription = await subscriptions_repo.get(subscription_id)
             return {
                 'valid': True,
                 'payment_status': session.payment_status,
@@ -678,6 +700,9 @@ async def verify_session(session_id: str):
     except stripe.error.StripeError as e:
         logger.error(f"Error verifying session: {e}")
         return {'valid': False, 'message': str(e)}
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out verifying session {session_id}")
+        raise HTTPException(status_code=504, detail="Stripe request timed out")
 
 # ============================================================
 # ONBOARDING ENDPOINTS
@@ -691,36 +716,16 @@ async def submit_onboarding(data: OnboardingRequest):
     onboarding_dict = onboarding.model_dump()
     onboarding_dict['created_at'] = onboarding_dict['created_at'].isoformat()
     
-    await db.onboarding.insert_one(onboarding_dict)
+    await onboarding_repo.insert(onboarding_dict)
     
     # Send confirmation email
-    await send_email(
-        to=data.email,
-        subject="Onboarding Arxéon - Informazioni ricevute",
-        html_content=f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: 'Inter', Arial, sans-serif; background: #161716; color: #ffffff; padding: 40px; }}
-                .container {{ max-width: 600px; margin: 0 auto; background: #2a2c29; border-radius: 12px; padding: 40px; }}
-                h1 {{ color: #c8f000; }}
-                .highlight {{ color: #c8f000; }}
-                .cta {{ display: inline-block; background: #c8f000; color: #161716; padding: 12px 24px; border-radius: 8px; text-decoration: none; font-weight: bold; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>Grazie {data.full_name}!</h1>
-                <p>Abbiamo ricevuto le informazioni per l'onboarding di <span class="highlight">{data.company}</span>.</p>
-                <p>Il nostro team analizzerà il tuo caso e ti contatterà a breve.</p>
-                <p>Nel frattempo, puoi prenotare la tua prima consulenza:</p>
-                <a href="https://calendly.com/arxeon/30min" class="cta">Prenota ora →</a>
-            </div>
-        </body>
-        </html>
-        """
+    subject, html_content = email_engine.render(
+        'onboarding_received',
+        data.locale,
+        full_name=data.full_name,
+        company=data.company
     )
+    await send_email(to=data.email, subject=subject, html_content=html_content)
     
     return {
         'success': True,
@@ -731,7 +736,7 @@ async def submit_onboarding(data: OnboardingRequest):
 @api_router.get("/onboarding/{onboarding_id}")
 async def get_onboarding(onboarding_id: str):
     """Get onboarding details"""
-    onboarding = await db.onboarding.find_one({'id': onboarding_id}, {'_id': 0})
+    onboarding = await onboarding_repo.get(onboarding_id)
     if not onboarding:
         raise HTTPException(status_code=404, detail="Onboarding not found")
     return onboarding
@@ -754,40 +759,94 @@ async def debug_config():
         'success_url_example': f"{FRONTEND_URL}/thank-you?session_id=test"
     }
 
+@api_router.get("/debug/metrics")
+async def debug_metrics():
+    """In-process counters, gauges and latency percentiles"""
+    return metrics.snapshot()
+
+# ============================================================
+# ADMIN ANALYTICS
+# ============================================================
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Admin endpoints need the X-Admin-Key header to match ADMIN_API_KEY"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=503, detail="Admin API not configured")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+@api_router.get("/admin/analytics/summary", dependencies=[Depends(require_admin)])
+async def admin_analytics_summary(days: int = Query(30, ge=1, le=366)):
+    """MRR, package totals, add-on attach rates, category mix and funnel conversion"""
+    return await analytics.summary(days)
+
+@api_router.get("/admin/analytics/daily", dependencies=[Depends(require_admin)])
+async def admin_analytics_daily(dimension: str, since: str = '', until: str = '9999'):
+    """Daily rollup rows for one dimension (package, addon, category, status, funnel)"""
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Invalid dimension. Valid: {list(DIMENSIONS)}")
+    return await analytics.daily(dimension, since, until)
+
+@api_router.post("/admin/analytics/backfill", dependencies=[Depends(require_admin)])
+async def admin_analytics_backfill():
+    """Rebuild the rollups from subscriptions and free audits"""
+    return {'rows': await analytics.backfill()}
+
+@api_router.get("/admin/leads", dependencies=[Depends(require_admin)])
+async def admin_leads(
+    tier: Optional[Literal['hot', 'warm', 'cold']] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Free-audit leads for sales, best first"""
+    query = {'lead_tier': tier} if tier else {}
+    return await db.free_audits.find(query, LEAD_FIELDS).sort(
+        [('lead_score', -1), ('created_at', -1)]
+    ).to_list(limit)
+
+@api_router.post("/admin/leads/rescore", dependencies=[Depends(require_admin)])
+async def admin_rescore_leads():
+    """Rescore every audit not scored with the current weights"""
+    return {'updated': await rescore_all(db.free_audits, lead_scorer), 'version': lead_scorer.version}
+
+@api_router.post("/admin/benchmarks/rebuild", dependencies=[Depends(require_admin)])
+async def admin_rebuild_benchmarks():
+    """Recompute the score distributions from the scored free audits"""
+    return {'groups': await benchmarks.rebuild()}
+
+@api_router.get("/admin/export/{dataset}", dependencies=[Depends(require_admin)])
+async def admin_export(
+    dataset: str,
+    format: Literal['csv', 'parquet'] = 'csv',
+    columns: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """
+    Stream audits, onboarding or subscriptions as CSV/Parquet (see exports.py).
+    ?columns=a,b selects columns; ?since=&until= filter on created_at.
+    """
+    try:
+        chunks = export_stream(db, dataset, format, columns.split(',') if columns else None, since, until)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type=FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(dataset, format)}"'}
+    )
+
+# Only changes on a deploy, so it is serialised once
+STRIPE_CONFIG = cached_json({'publishableKey': os.environ.get('STRIPE_PUBLISHABLE_KEY', '')})
+
 @api_router.get("/config/stripe")
-async def get_stripe_config():
+async def get_stripe_config(if_none_match: Optional[str] = Header(None)):
     """Return Stripe publishable key for frontend"""
-    return {
-        'publishableKey': os.environ.get('STRIPE_PUBLISHABLE_KEY', '')
-    }
+    return json_response(STRIPE_CONFIG, if_none_match, catalog.max_age)
 
 @api_router.get("/config/addons")
-async def get_addons_config():
-    """Return available add-ons for each package (without price_ids)"""
-    addons_by_package = {
-        "basic": [],
-        "premium": [],
-        "gold": []
-    }
-    
-    for code, addon in ADDON_PRICES.items():
-        addon_info = {
-            "code": code,
-            "name": addon["name"],
-            "amount": addon["amount"],
-            "type": addon["type"]
-        }
-        for pkg in addon["allowed_packages"]:
-            addons_by_package[pkg].append(addon_info)
-    
-    return {
-        "packages": {
-            pkg: {"name": info["name"], "amount": info["amount"]}
-            for pkg, info in PACKAGE_PRICES.items()
-        },
-        "addons": addons_by_package,
-        "validCategories": VALID_CATEGORIES
-    }
+async def get_addons_config(if_none_match: Optional[str] = Header(None)):
+    """Return available add-ons for each package (without price_ids); ETag/304 aware"""
+    return catalog.addons_response(if_none_match)
 
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
@@ -798,13 +857,45 @@ async def create_status_check(input: StatusCheckCreate):
     _ = await db.status_checks.insert_one(doc)
     return status_obj
 
+STATUS_PAGE_MAX = 1000
+
+def status_check_row(check: dict) -> dict:
+    # Stored as ISO strings; very old rows may hold a BSON date
+    if isinstance(check.get('timestamp'), datetime):
+        check['timestamp'] = check['timestamp'].isoformat()
+    return check
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    return status_checks
+async def get_status_checks(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    format: Literal['json', 'ndjson'] = 'json'
+):
+    """
+    Status checks in (timestamp, id) order, keyset-paginated: a full page
+    carries an X-Next-After header to pass back as ?after= for the next one.
+    ?format=ndjson streams every row after ``after`` (up to ``limit`` if given),
+    one JSON object per line, straight off the cursor.
+    """
+    try:
+        position = decode_status_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if format == 'ndjson':
+        cursor = status_checks_repo.page(position, limit or 0)
+        
+        async def rows():
+            async for check in cursor:
+                yield json.dumps(status_check_row(check)) + "\n"
+        
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+    
+    limit = min(limit or STATUS_PAGE_MAX, STATUS_PAGE_MAX)
+    checks = [status_check_row(check) async for check in status_checks_repo.page(position, limit)]
+    headers = {'X-Next-After': encode_status_cursor(checks[-1])} if len(checks) == limit else {}
+    # Rows are already in the response shape; skip re-validating them one by one
+    return JSONResponse(checks, headers=headers)
 
 # Router will be included after all endpoints are defined
 
@@ -827,6 +918,7 @@ class FreeAuditRequest(BaseModel):
     mainProblem: str
     previousAttempts: Optional[str] = ""  # New field: tentativi precedenti
     improvementImportance: int = Field(ge=1, le=5, default=3)  # New field: importanza 1-5
+    locale: Optional[str] = None  # it/fr, language of the emails
 
 class FreeAuditResponse(BaseModel):
     id: str
@@ -908,73 +1000,125 @@ Importanza del miglioramento (1–5): {importanza}
 
 Genera la valutazione strategica completa."""
 
-async def generate_evaluation_with_ai(audit_data: dict) -> dict:
-    """Generate strategic evaluation using OpenAI GPT-4o via Emergent LLM Key"""
+# Providers in preference order, "provider/model" separated by commas
+EVALUATION_MODELS = [
+    tuple(entry.strip().split('/', 1))
+    for entry in os.environ.get('LLM_MODELS', 'openai/gpt-4o,anthropic/claude-sonnet-4-20250514').split(',')
+    if entry.strip()
+]
+EVALUATION_SYSTEM_MESSAGE = "Sei un consulente di marketing strategico senior specializzato in analisi e valutazioni per PMI."
+LLM_MAX_OUTPUT_TOKENS = int(os.environ.get('LLM_MAX_OUTPUT_TOKENS', '2000'))  # budgeted per call
+# OpenAI-compatible endpoint to use instead of the Emergent SDK (e.g. a gateway or a load-test stand-in)
+LLM_API_BASE = os.environ.get('LLM_API_BASE', '')
+
+def make_llm_client(provider: str, model: str, governor: LlmGovernor) -> LlmClient:
+    if LLM_API_BASE:
+        return HttpLlmClient(
+            EMERGENT_LLM_KEY,
+            LLM_API_BASE,
+            provider,
+            model,
+            system_message=EVALUATION_SYSTEM_MESSAGE,
+            governor=governor,
+            max_output_tokens=LLM_MAX_OUTPUT_TOKENS
+        )
+    return LlmClient(
+        EMERGENT_LLM_KEY,
+        provider,
+        model,
+        system_message=EVALUATION_SYSTEM_MESSAGE,
+        max_output_tokens=LLM_MAX_OUTPUT_TOKENS,
+        governor=governor
+    )
+
+# One client per provider for the whole process, each behind its own governor
+# so a burst of audits queues for provider capacity instead of failing; the
+# router hedges across them by rolling p95 under a deadline (see llm.py)
+llm_router = HedgedLlm(
+    [
+        make_llm_client(
+            provider,
+            model,
+            LlmGovernor(
+                name=provider,
+                max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '4')),
+                requests_per_minute=float(os.environ.get('LLM_REQUESTS_PER_MINUTE', '60')),
+                tokens_per_minute=float(os.environ.get('LLM_TOKENS_PER_MINUTE', '60000'))
+            )
+        )
+        for provider, model in EVALUATION_MODELS
+    ],
+    deadline_seconds=float(os.environ.get('LLM_DEADLINE_SECONDS', '120')),
+    hedge_delay_seconds=float(os.environ.get('LLM_HEDGE_DELAY_SECONDS', '45'))
+)
+
+# Evaluations keyed by a hash of the normalised inputs; the namespace changes
+# with the prompt and model so stale entries are never served (see evaluation_cache.py)
+evaluation_cache = EvaluationCache(
+    db.evaluation_cache,
+    ttl_seconds=int(os.environ.get('EVALUATION_CACHE_TTL_HOURS', '168')) * 3600,
+    namespace=hashlib.sha256(f"{EVALUATION_MODELS}:{EVALUATION_MASTER_PROMPT}".encode('utf-8')).hexdigest()[:16]
+)
+
+async def generate_evaluation_with_ai(audit_data: dict, on_token: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Generate strategic evaluation with the configured LLM providers via Emergent LLM Key.
+    on_token receives the answer as it streams in (not called for cached or mock results).
+    """
     if not EMERGENT_LLM_KEY:
         logger.warning("EMERGENT_LLM_KEY not configured, using mock evaluation")
-        return {
-            "text": generate_mock_evaluation(audit_data),
-            "score": 5,
-            "level": "Medio"
-        }
+        return build_evaluation_result(generate_mock_evaluation(audit_data))
     
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
-        # Prepare the prompt with business data
-        prompt = EVALUATION_MASTER_PROMPT.format(
-            nome=audit_data.get('fullName', ''),
-            azienda=audit_data.get('companyName', ''),
-            settore=audit_data.get('sector', ''),
-            area=audit_data.get('geoArea', ''),
-            canali=', '.join(audit_data.get('channels', [])),
-            obiettivo=audit_data.get('objective', ''),
-            budget=audit_data.get('budget', ''),
-            problema=audit_data.get('mainProblem', ''),
-            tentativi=audit_data.get('previousAttempts', 'Non specificato'),
-            importanza=audit_data.get('improvementImportance', 3)
+        # Identical inputs (e.g. a double-submitted form) reuse the stored evaluation
+        result = await evaluation_cache.get_or_compute(
+            audit_data, functools.partial(request_ai_evaluation, on_token=on_token)
         )
-        
-        # Initialize chat with GPT-4o
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"audit-{uuid.uuid4()}",
-            system_message="Sei un consulente di marketing strategico senior specializzato in analisi e valutazioni per PMI."
-        ).with_model("openai", "gpt-4o")
-        
-        # Send message and get response
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        # Extract score and level from response (parse from text)
-        score = 5  # Default
-        level = "Medio"  # Default
-        
-        # Try to extract score from response
-        import re
-        score_match = re.search(r'Punteggio.*?(\d+)[/\s]*10', response, re.IGNORECASE)
-        if score_match:
-            score = int(score_match.group(1))
-        
-        level_match = re.search(r'Livello.*?maturità.*?(Basso|Medio|Avanzato)', response, re.IGNORECASE)
-        if level_match:
-            level = level_match.group(1).capitalize()
-        
-        logger.info(f"AI evaluation generated successfully for {audit_data.get('email')}")
-        
-        return {
-            "text": response,
-            "score": score,
-            "level": level
-        }
-        
+        if 'evaluation' not in result:
+            # Cached before evaluations were stored parsed
+            result = build_evaluation_result(result['text'])
+        return result
     except Exception as e:
         logger.error(f"Error generating AI evaluation: {e}")
-        return {
-            "text": generate_mock_evaluation(audit_data),
-            "score": 5,
-            "level": "Medio"
-        }
+        return build_evaluation_result(generate_mock_evaluation(audit_data))
+
+def build_evaluation_result(text: str) -> dict:
+    """Parse the evaluation once; the section tree is stored and reused by the PDF, emails and API"""
+    evaluation = parse_evaluation(text)
+    return {
+        "text": text,
+        "score": evaluation_score(evaluation),
+        "level": evaluation_level(evaluation),
+        "evaluation": evaluation
+    }
+
+async def request_ai_evaluation(audit_data: dict, on_token: Optional[Callable[[str], None]] = None) -> dict:
+    """Ask the LLM providers for an evaluation; raises on failure (see generate_evaluation_with_ai)"""
+    # Prepare the prompt with business data
+    prompt = EVALUATION_MASTER_PROMPT.format(
+        nome=audit_data.get('fullName', ''),
+        azienda=audit_data.get('companyName', ''),
+        settore=audit_data.get('sector', ''),
+        area=audit_data.get('geoArea', ''),
+        canali=', '.join(audit_data.get('channels', [])),
+        obiettivo=audit_data.get('objective', ''),
+        budget=audit_data.get('budget', ''),
+        problema=audit_data.get('mainProblem', ''),
+        tentativi=audit_data.get('previousAttempts', 'Non specificato'),
+        importanza=audit_data.get('improvementImportance', 3)
+    )
+    
+    # Fastest provider first, hedged with the next one past its p95
+    chunks = []
+    async for chunk in llm_router.stream(prompt):
+        chunks.append(chunk)
+        if on_token:
+            on_token(chunk)
+    response = ''.join(chunks)
+    
+    logger.info(f"AI evaluation generated successfully for {audit_data.get('email')}")
+    
+    return build_evaluation_result(response)
 
 def generate_mock_evaluation(audit_data: dict) -> str:
     """Generate a mock evaluation when AI is not available"""
@@ -1033,303 +1177,169 @@ Documento riservato – uso informativo
 Arxéon – Marketing strategico orientato ai risultati
 """
 
-def generate_pdf_evaluation(evaluation_text: str, audit_data: dict) -> bytes:
-    """Generate PDF from evaluation text"""
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-        from reportlab.lib.colors import HexColor
-        from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm
-        )
-        
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=20,
-            textColor=HexColor('#1a1a1a'),
-            alignment=TA_CENTER
-        )
-        
-        header_style = ParagraphStyle(
-            'CustomHeader',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceBefore=15,
-            spaceAfter=10,
-            textColor=HexColor('#333333')
-        )
-        
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['Normal'],
-            fontSize=11,
-            leading=16,
-            spaceAfter=8,
-            alignment=TA_JUSTIFY
-        )
-        
-        footer_style = ParagraphStyle(
-            'CustomFooter',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=HexColor('#666666'),
-            alignment=TA_CENTER
-        )
-        
-        story = []
-        
-        # Header
-        story.append(Paragraph("Arxéon – Valutazione Strategica", title_style))
-        story.append(Spacer(1, 0.5*cm))
-        story.append(Paragraph(f"Preparata per: {audit_data.get('companyName', 'N/A')}", body_style))
-        story.append(Paragraph(f"Data: {datetime.now().strftime('%d/%m/%Y')}", body_style))
-        story.append(Spacer(1, 1*cm))
-        
-        # Process evaluation text
-        lines = evaluation_text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                story.append(Spacer(1, 0.3*cm))
-                continue
-            
-            # Detect headers (lines with uppercase or numbered sections)
-            if line.isupper() or (len(line) > 2 and line[0].isdigit() and '.' in line[:3]):
-                story.append(Paragraph(line, header_style))
-            elif line.startswith('•') or line.startswith('-'):
-                story.append(Paragraph(f"  {line}", body_style))
-            elif line.startswith('📊') or line.startswith('---'):
-                story.append(Spacer(1, 0.5*cm))
-                story.append(Paragraph(line.replace('📊', '').strip(), header_style))
-            else:
-                # Escape special characters for ReportLab
-                line = line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                story.append(Paragraph(line, body_style))
-        
-        # Footer
-        story.append(Spacer(1, 1*cm))
-        story.append(Paragraph("─" * 50, footer_style))
-        story.append(Paragraph("Documento riservato – uso informativo", footer_style))
-        story.append(Paragraph("Arxéon – Marketing strategico orientato ai risultati", footer_style))
-        
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
-        
-    except Exception as e:
-        logger.error(f"Error generating PDF: {e}")
-        # Return a simple text-based fallback
-        return evaluation_text.encode('utf-8')
-
 async def send_confirmation_email_audit(audit_data: dict) -> bool:
     """Send immediate confirmation email (Email 1)"""
     to_email = audit_data.get('email')
     first_name = audit_data.get('fullName', '').split()[0] if audit_data.get('fullName') else 'Cliente'
     
-    subject = "Abbiamo ricevuto la tua richiesta di valutazione"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'Inter', Arial, sans-serif; background: #f5f5f5; color: #333; padding: 40px; margin: 0; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: #ffffff; border-radius: 12px; padding: 40px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-            h1 {{ color: #1a1a1a; font-size: 24px; margin-bottom: 20px; }}
-            p {{ line-height: 1.7; color: #555; margin-bottom: 16px; }}
-            .highlight {{ background: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #c8f000; margin: 20px 0; }}
-            .footer {{ margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; color: #888; font-size: 13px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Grazie per la tua richiesta</h1>
-            
-            <p>Ciao {first_name},</p>
-            
-            <p>abbiamo ricevuto correttamente la tua richiesta di valutazione strategica.</p>
-            
-            <p>In questo momento stiamo analizzando le informazioni che ci hai fornito.</p>
-            
-            <div class="highlight">
-                <p style="margin: 0;"><strong>La valutazione verrà controllata e rifinita manualmente</strong> per garantirti un contenuto chiaro e preciso.</p>
-            </div>
-            
-            <p>⏱ Riceverai la tua valutazione via email <strong>entro pochi minuti</strong>.</p>
-            
-            <div class="footer">
-                <p>A presto,<br><strong>Arxéon</strong></p>
-                <p>Marketing strategico orientato ai risultati<br>info@arxeon.ch | Lugano, Svizzera</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    subject, html_content = email_engine.render('audit_received', audit_data.get('locale'), first_name=first_name)
     
     return await send_email(to_email, subject, html_content)
 
+def benchmark_peers(benchmark: dict, locale: str = None) -> str:
+    """The peer group of a stored benchmark in words, e.g. 'tra le aziende in Ticino'"""
+    strings = email_engine.locales[email_engine.normalize_locale(locale)]['benchmark']
+    return strings[benchmark['scope']].format(
+        sector=strings['sectors'].get(benchmark['sector'], benchmark['sector']),
+        area=strings['areas'].get(benchmark['geoArea'], benchmark['geoArea'])
+    )
+
 async def send_evaluation_email_with_pdf(audit_data: dict, pdf_bytes: bytes, evaluation_result: dict) -> bool:
     """Send evaluation email with PDF attachment (Email 2)"""
     to_email = audit_data.get('email')
     first_name = audit_data.get('fullName', '').split()[0] if audit_data.get('fullName') else 'Cliente'
+    # Looked up when the PDF was rendered and stored on the audit
+    benchmark = audit_data.get('benchmark')
     
-    subject = "La tua valutazione strategica è pronta"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'Inter', Arial, sans-serif; background: #f5f5f5; color: #333; padding: 40px; margin: 0; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: #ffffff; border-radius: 12px; padding: 40px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-            h1 {{ color: #1a1a1a; font-size: 24px; margin-bottom: 20px; }}
-            p {{ line-height: 1.7; color: #555; margin-bottom: 16px; }}
-            ul {{ padding-left: 20px; margin: 20px 0; }}
-            li {{ margin-bottom: 10px; color: #555; }}
-            .cta {{ display: inline-block; background: #c8f000; color: #1a1a1a; padding: 14px 28px; border-radius: 8px; text-decoration: none; font-weight: bold; margin: 20px 0; }}
-            .cta:hover {{ background: #b8e000; }}
-            .score-box {{ background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0; text-align: center; }}
-            .score {{ font-size: 36px; font-weight: bold; color: #c8f000; }}
-            .level {{ font-size: 14px; color: #666; margin-top: 5px; }}
-            .footer {{ margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; color: #888; font-size: 13px; }}
-            .secondary-link {{ color: #666; font-size: 13px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>La tua valutazione è pronta</h1>
-            
-            <p>Ciao {first_name},</p>
-            
-            <p>in allegato trovi la <strong>valutazione strategica del tuo marketing</strong>, basata sulle informazioni che ci hai fornito.</p>
-            
-            <div class="score-box">
-                <div class="score">{evaluation_result.get('score', 5)}/10</div>
-                <div class="level">Livello di maturità: {evaluation_result.get('level', 'Medio')}</div>
-            </div>
-            
-            <p>Il documento evidenzia:</p>
-            <ul>
-                <li>Le principali <strong>criticità attuali</strong></li>
-                <li>I <strong>rischi</strong> se la situazione resta invariata</li>
-                <li>Le <strong>priorità strategiche</strong> su cui intervenire</li>
-            </ul>
-            
-            <p>Se vuoi capire come intervenire in modo concreto e quale tipo di supporto è più adatto al tuo caso, puoi esplorare le opzioni disponibili:</p>
-            
-            <p style="text-align: center;">
-                <a href="{FRONTEND_URL}/servizi" class="cta">Scopri i servizi disponibili</a>
-            </p>
-            
-            <p class="secondary-link" style="text-align: center;">
-                In alternativa, puoi rispondere a questa email per un primo confronto.
-            </p>
-            
-            <div class="footer">
-                <p>A presto,<br><strong>Arxéon</strong></p>
-                <p>Marketing strategico orientato ai risultati<br>info@arxeon.ch | Lugano, Svizzera</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    subject, html_content = email_engine.render(
+        'audit_ready',
+        audit_data.get('locale'),
+        first_name=first_name,
+        score=evaluation_result.get('score', 5),
+        level=evaluation_result.get('level', 'Medio'),
+        benchmark=bool(benchmark),
+        percentile=benchmark and benchmark['percentile'],
+        peers=benchmark and benchmark_peers(benchmark, audit_data.get('locale')),
+        services_url=f"{FRONTEND_URL}/servizi"
+    )
     
-    return await send_email_resend_with_attachment(to_email, subject, html_content, pdf_bytes, "valutazione-strategica.pdf")
+    # One message per audit however often the send_email stage is retried
+    return await send_email_resend_with_attachment(
+        to_email, subject, html_content, pdf_bytes, "valutazione-strategica.pdf",
+        message_id=f"audit-email2:{audit_data['id']}"
+    )
 
-async def send_email_resend_with_attachment(to: str, subject: str, html_content: str, attachment_bytes: bytes, attachment_name: str) -> bool:
-    """Send email via Resend with PDF attachment"""
-    if RESEND_API_KEY:
-        try:
-            import resend
-            resend.api_key = RESEND_API_KEY
-            
-            # Encode attachment to base64
-            attachment_b64 = base64.b64encode(attachment_bytes).decode('utf-8')
-            
-            resend.Emails.send({
-                "from": "Arxéon <noreply@arxeon.ch>",
-                "to": [to],
-                "subject": subject,
-                "html": html_content,
-                "attachments": [
-                    {
-                        "filename": attachment_name,
-                        "content": attachment_b64,
-                    }
-                ]
-            })
-            logger.info(f"Email with attachment sent to {to}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send email with attachment via Resend: {e}")
-    
-    # Mock/Log fallback
-    logger.info(f"[MOCK EMAIL WITH ATTACHMENT] To: {to}")
-    logger.info(f"[MOCK EMAIL] Subject: {subject}")
-    logger.info(f"[MOCK EMAIL] Attachment: {attachment_name} ({len(attachment_bytes)} bytes)")
+async def send_email_resend_with_attachment(to: str, subject: str, html_content: str, attachment_bytes: bytes,
+                                            attachment_name: str, message_id: Optional[str] = None) -> bool:
+    """Queue an email with an attachment in the outbox"""
+    await email_outbox.enqueue(to, subject, html_content, attachments=[{
+        "filename": attachment_name,
+        "content": base64.b64encode(attachment_bytes).decode('utf-8'),
+    }], message_id=message_id)
     return True
 
-async def process_audit_background(audit_id: str, audit_data: dict):
-    """Background task to generate evaluation and send email after delay"""
-    try:
-        # Generate AI evaluation
-        logger.info(f"Generating AI evaluation for audit {audit_id}")
-        evaluation_result = await generate_evaluation_with_ai(audit_data)
-        
-        # Generate PDF
-        logger.info(f"Generating PDF for audit {audit_id}")
-        pdf_bytes = generate_pdf_evaluation(evaluation_result['text'], audit_data)
-        
-        # Update database with evaluation
-        await db.free_audits.update_one(
-            {'id': audit_id},
-            {'$set': {
-                'evaluation_text': evaluation_result['text'],
-                'marketing_score': evaluation_result['score'],
-                'marketing_level': evaluation_result['level'],
-                'status': 'completed',
-                'completed_at': datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
-        # Wait 5 minutes before sending the evaluation email
-        logger.info(f"Waiting 5 minutes before sending evaluation email for audit {audit_id}")
-        await asyncio.sleep(300)  # 5 minutes = 300 seconds
-        
-        # Send Email 2 with PDF
-        await send_evaluation_email_with_pdf(audit_data, pdf_bytes, evaluation_result)
-        
-        logger.info(f"Audit {audit_id} completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Error processing audit {audit_id}: {e}")
-        await db.free_audits.update_one(
-            {'id': audit_id},
-            {'$set': {'status': 'error', 'error': str(e)}}
-        )
+# Free audit pipeline, run by the job queue as separate resumable stages:
+#   generate -> render_pdf -> (wait AUDIT_EMAIL_DELAY_SECONDS) -> send_email
+# Each stage persists its output, so a restart resumes from the last finished stage.
+# Progress (stages and LLM tokens) is published on audit_events for the SSE stream.
+
+audit_events = AuditEventBus()
+
+async def get_audit_for_job(job: dict) -> dict:
+    audit_id = job['payload']['audit_id']
+    audit = await audits_repo.get(audit_id)
+    if not audit:
+        raise ValueError(f"Audit {audit_id} not found")
+    return audit
+
+async def audit_stage_generate(audit: dict) -> NextStage:
+    logger.info(f"Generating AI evaluation for audit {audit['id']}")
+    # A retried stage starts over; watchers drop any partial text on this event
+    audit_events.publish(audit['id'], 'stage', stage='generating')
+    streamed = []
+    
+    def on_token(chunk: str):
+        streamed.append(chunk)
+        audit_events.publish(audit['id'], 'token', text=chunk)
+    
+    evaluation_result = await generate_evaluation_with_ai(audit, on_token=on_token)
+    # Cached or mock evaluation, or the mock after a stream that broke off: send the stored text
+    audit_events.publish_text(audit['id'], ''.join(streamed), evaluation_result['text'])
+    await audits_repo.update(
+        audit['id'],
+        {
+            'evaluation_text': evaluation_result['text'],
+            'evaluation': evaluation_result['evaluation'],
+            'marketing_score': evaluation_result['score'],
+            'marketing_level': evaluation_result['level'],
+            'status': 'generated'
+        }
+    )
+    await benchmarks.record({**audit, 'marketing_score': evaluation_result['score']})
+    return NextStage('render_pdf')
+
+async def audit_stage_render_pdf(audit: dict) -> NextStage:
+    logger.info(f"Generating PDF for audit {audit['id']}")
+    audit_events.publish(audit['id'], 'stage', stage='rendering_pdf')
+    # Audits generated before evaluations were stored parsed only have the text
+    evaluation = audit.get('evaluation') or parse_evaluation(audit['evaluation_text'])
+    benchmark = await benchmarks.lookup(audit['sector'], audit['geoArea'], audit.get('marketing_score', 5))
+    benchmark_text = None
+    if benchmark:
+        # The PDF is in Italian whatever the email locale
+        benchmark_text = f"Posizionamento: {benchmark['percentile']}° percentile {benchmark_peers(benchmark)}"
+    pdf_bytes = await pdf_service.render(evaluation, audit, benchmark_text)
+    await db.audit_pdfs.update_one(
+        {'id': audit['id']},
+        {'$set': {'id': audit['id'], 'pdf': Binary(pdf_bytes), 'created_at': datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+    await audits_repo.update(
+        audit['id'],
+        {'status': 'completed', 'completed_at': datetime.now(timezone.utc).isoformat(), 'benchmark': benchmark}
+    )
+    logger.info(f"Evaluation email for audit {audit['id']} scheduled in {AUDIT_EMAIL_DELAY_SECONDS}s")
+    audit_events.publish(audit['id'], 'stage', stage='email_scheduled', delay_seconds=AUDIT_EMAIL_DELAY_SECONDS)
+    audit_events.publish(
+        audit['id'], 'done',
+        score=audit.get('marketing_score', 5), level=audit.get('marketing_level', 'Medio')
+    )
+    return NextStage('send_email', AUDIT_EMAIL_DELAY_SECONDS)
+
+async def audit_stage_send_email(audit: dict) -> None:
+    pdf_doc = await db.audit_pdfs.find_one({'id': audit['id']}, {'_id': 0, 'pdf': 1})
+    if not pdf_doc:
+        raise ValueError(f"PDF for audit {audit['id']} not found")
+    evaluation_result = {
+        'score': audit.get('marketing_score', 5),
+        'level': audit.get('marketing_level', 'Medio')
+    }
+    # Email 2 with PDF
+    await send_evaluation_email_with_pdf(audit, bytes(pdf_doc['pdf']), evaluation_result)
+    await audits_repo.update(
+        audit['id'],
+        {'email_sent_at': datetime.now(timezone.utc).isoformat()}
+    )
+    logger.info(f"Audit {audit['id']} completed successfully")
+
+AUDIT_STAGES = {
+    'generate': audit_stage_generate,
+    'render_pdf': audit_stage_render_pdf,
+    'send_email': audit_stage_send_email,
+}
+
+async def process_audit_job(job: dict):
+    """Job handler: run the current stage of a free audit"""
+    audit = await get_audit_for_job(job)
+    return await AUDIT_STAGES[job['stage']](audit)
+
+async def mark_audit_failed(job: dict, error: Exception):
+    """Called once an audit job has exhausted its retries"""
+    await audits_repo.update(
+        job['payload']['audit_id'],
+        {'status': 'error', 'error': str(error)}
+    )
+    audit_events.publish(job['payload']['audit_id'], 'error', message="Valutazione non riuscita")
+
+job_queue.register('free_audit', process_audit_job, on_dead=mark_audit_failed)
 
 @api_router.post("/free-audit", response_model=FreeAuditResponse)
-async def create_free_audit(request: FreeAuditRequest, background_tasks: BackgroundTasks):
+async def create_free_audit(request: FreeAuditRequest):
     """
     Create a free strategic audit request.
     1. Saves data to DB
     2. Sends immediate confirmation email
-    3. Starts background task for AI evaluation + PDF + delayed email
+    3. Enqueues a durable job for AI evaluation + PDF + delayed email
     """
     audit_id = str(uuid.uuid4())
     
@@ -1338,16 +1348,23 @@ async def create_free_audit(request: FreeAuditRequest, background_tasks: Backgro
     audit_data['id'] = audit_id
     audit_data['status'] = 'pending'
     audit_data['created_at'] = datetime.now(timezone.utc).isoformat()
+    audit_data.update(lead_scorer.score(audit_data))
     
     # Save to database
-    await db.free_audits.insert_one(audit_data)
+    await audits_repo.insert(audit_data)
+    await analytics.record_audit(audit_data)
     logger.info(f"Free audit request saved: {audit_id}")
     
     # Send immediate confirmation email (Email 1)
     await send_confirmation_email_audit(audit_data)
     
-    # Start background processing (AI + PDF + Email 2 after 5 min)
-    background_tasks.add_task(process_audit_background, audit_id, audit_data)
+    # Enqueue processing (AI + PDF + Email 2 after 5 min)
+    await job_queue.enqueue(
+        'free_audit',
+        {'audit_id': audit_id},
+        stage='generate',
+        job_id=f"free_audit:{audit_id}"
+    )
     
     return FreeAuditResponse(
         id=audit_id,
@@ -1356,13 +1373,84 @@ async def create_free_audit(request: FreeAuditRequest, background_tasks: Backgro
     )
 
 @api_router.get("/free-audit/{audit_id}")
-async def get_free_audit(audit_id: str):
-    """Get audit status and details"""
-    audit = await db.free_audits.find_one({'id': audit_id}, {'_id': 0})
+async def get_free_audit(audit_id: str, wait: float = 0, since: Optional[int] = None):
+    """
+    Get audit status (the evaluation itself is delivered by email).
+    ?since=<version>&wait=<seconds> long-polls as in get_subscription.
+    """
+    audit = await status_notifier.wait_for_change(
+        f"audit:{audit_id}",
+        functools.partial(audits_repo.get_status, audit_id),
+        since,
+        long_poll_timeout(wait)
+    )
     if not audit:
         raise HTTPException(status_code=404, detail="Audit not found")
     return audit
 
+SSE_KEEPALIVE_SECONDS = float(os.environ.get('SSE_KEEPALIVE_SECONDS', '15'))
+
+def audit_status_event(audit: dict) -> dict:
+    """Progress event derived from the stored audit (for audits processed by another worker)"""
+    status = audit.get('status')
+    if status == 'completed':
+        return {'event': 'done', 'data': {
+            'stage': 'email_sent' if audit.get('email_sent_at') else 'email_scheduled',
+            'score': audit.get('marketing_score', 5),
+            'level': audit.get('marketing_level', 'Medio'),
+        }}
+    if status == 'error':
+        return {'event': 'error', 'data': {'message': "Valutazione non riuscita"}}
+    if status == 'generated':
+        return {'event': 'stage', 'data': {'stage': 'rendering_pdf'}}
+    return {'event': 'stage', 'data': {'stage': 'queued'}}
+
+def format_sse(message: dict) -> str:
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'], ensure_ascii=False)}\n\n"
+
+@api_router.get("/free-audit/{audit_id}/stream")
+async def stream_free_audit(audit_id: str, request: Request):
+    """
+    Server-Sent Events: pipeline stages and the evaluation text as it is generated.
+    Events: stage {stage}, token {text}, done {stage, score, level}, error {message}.
+    A 'generating' stage means generation (re)started: discard any text received so far.
+    """
+    audit = await audits_repo.get_status(audit_id)
+    if not audit:
+        raise HTTPException(status_code=404, detail="Audit not found")
+    
+    async def events():
+        last = None
+        if not audit_events.history(audit_id):
+            # Nothing published in this process yet: start from the stored status
+            last = audit_status_event(audit)
+            yield format_sse(last)
+            if last['event'] in TERMINAL_EVENTS:
+                return
+        async for message in audit_events.subscribe(audit_id, idle_timeout=SSE_KEEPALIVE_SECONDS):
+            if await request.is_disconnected():
+                return
+            if message is None:
+                # Quiet for a while: the job may be running in another worker, check the database
+                current = await audits_repo.get_status(audit_id)
+                message = audit_status_event(current) if current else None
+                if message is None or message == last:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message['event'] in TERMINAL_EVENTS:
+                    # Finished in another process: release this process's topic and its watchers
+                    audit_events.close(audit_id, message)
+            last = message
+            yield format_sse(message)
+            if message['event'] in TERMINAL_EVENTS:
+                return
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Include the router after all endpoints are defined
 app.include_router(api_router)
 
@@ -1374,6 +1462,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+index_manager = IndexManager(db)
+index_manager.add('jobs', job_queue.index_models())
+index_manager.add('stripe_events', stripe_event_consumer.index_models())
+index_manager.add('email_outbox', email_outbox.index_models())
+index_manager.add('evaluation_cache', evaluation_cache.index_models())
+index_manager.add('analytics_daily', analytics.index_models())
+
+@app.on_event("startup")
+async def start_background_services():
+    await index_manager.ensure_all()
+    if os.environ.get('VERIFY_QUERY_PLANS', 'false').lower() == 'true':
+        await index_manager.verify_query_plans()
+    pdf_service.start()
+    await email_transport.start()
+    if CATALOG_FILE:
+        catalog.watch(functools.partial(catalog.reload_file, CATALOG_FILE), CATALOG_RELOAD_SECONDS)
+    elif CATALOG_FROM_DB:
+        catalog.watch(functools.partial(catalog.reload_collection, db.catalog), CATALOG_RELOAD_SECONDS)
+    if STATUS_CHANGE_STREAMS:
+        status_notifier.follow(db.subscriptions, 'subscription')
+        status_notifier.follow(db.free_audits, 'audit')
+    if JOB_WORKER_ENABLED:
+        job_queue.start()
+        stripe_event_consumer.start()
+        email_outbox.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if JOB_WORKER_ENABLED:
+        await stripe_event_consumer.stop()
+        await job_queue.stop()
+        await email_outbox.stop()
+    await status_notifier.stop()
+    await catalog.stop()
+    await email_transport.close()
+    for provider in llm_router.providers:
+        if isinstance(provider, HttpLlmClient):
+            await provider.close()
+    pdf_service.shutdown()
+    stripe_gateway.shutdown()
     client.close()
@@ -0,0 +1,135 @@
+"""
+Long-poll support for the status endpoints.
+
+Documents that clients poll (subscriptions, free audits) carry a ``version``
+counter that every repository update increments. A client sends back the
+version it last saw (``?since=``) together with a wait budget (``?wait=``);
+the endpoint answers as soon as the stored version moves past it, or with the
+current state once the budget runs out - one request instead of a polling loop.
+
+``StatusNotifier`` is the in-process wake-up: repositories call ``notify`` after
+every update, and waiting requests re-read their document only when woken.
+Updates made by another process are picked up by ``follow`` (a MongoDB change
+stream, replica set only) or, without it, when the wait expires. A stream that
+fails is reopened with backoff from its last resume token; only a server that
+does not support change streams stops it.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# The resume token is no longer in the oplog, or cannot be resumed from
+RESUME_TOKEN_LOST = (280, 286)
+
+
+class _Slot:
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.waiters = 0
+
+
+class StatusNotifier:
+    def __init__(self, retry_base_seconds: float = 1, retry_max_seconds: float = 60):
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._slots: Dict[str, _Slot] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self, key: str):
+        """Wake every request waiting on ``key``"""
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            slot.event.set()
+            metrics.inc('status_notifier.wakeups')
+
+    async def wait_for_change(
+        self,
+        key: str,
+        read: Callable[[], Awaitable[Optional[dict]]],
+        since: Optional[int],
+        timeout: float,
+    ) -> Optional[dict]:
+        """
+        Return ``read()`` once its ``version`` is greater than ``since``, or the
+        current document after ``timeout`` seconds. Without ``since`` the
+        document is returned straight away.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # Register before reading so an update between the read and the wait is not missed
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = _Slot()
+            slot.waiters += 1
+            metrics.add_gauge('status_notifier.waiters', 1)
+            try:
+                doc = await read()
+                remaining = deadline - loop.time()
+                if doc is None or since is None or doc.get('version', 0) > since or remaining <= 0:
+                    return doc
+                try:
+                    await asyncio.wait_for(slot.event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                slot.waiters -= 1
+                metrics.add_gauge('status_notifier.waiters', -1)
+                if not slot.waiters and self._slots.get(key) is slot:
+                    del self._slots[key]
+
+    async def _follow(self, collection, prefix: str):
+        # Only the id is needed: project the looked-up document down to it
+        pipeline = [
+            {'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}},
+            {'$project': {'fullDocument.id': 1}},
+        ]
+        resume_token = None
+        failures = 0
+        while True:
+            try:
+                async with collection.watch(pipeline, full_document='updateLookup', resume_after=resume_token) as stream:
+                    logger.info(f"Following changes on {collection.name}")
+                    failures = 0
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change.get('fullDocument') or {}
+                        if doc.get('id'):
+                            self.notify(f"{prefix}:{doc['id']}")
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning(f"Change streams unavailable on {collection.name} ({e}) - "
+                                   "updates from other processes are seen when waits expire")
+                    return
+                if e.code in RESUME_TOKEN_LOST:
+                    # Changes since the token are gone; waits that miss them still time out
+                    resume_token = None
+                error = e
+            except PyMongoError as e:
+                error = e
+            else:
+                error = 'closed'
+            failures += 1
+            delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (failures - 1))
+            metrics.inc('status_notifier.stream_errors')
+            logger.warning(f"Change stream on {collection.name} ended ({error}), reopening in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    def follow(self, collection, prefix: str):
+        """Wake waiters on updates written by any process (needs a replica set)"""
+        self._tasks.append(asyncio.create_task(self._follow(collection, prefix)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
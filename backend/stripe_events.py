@@ -0,0 +1,220 @@
+"""
+Persistent inbox for Stripe webhook events.
+
+The webhook endpoint only verifies the signature and calls ``record`` - the raw
+event is stored in ``stripe_events`` and the endpoint returns straight away.
+``StripeEventConsumer`` then processes pending events in batches:
+
+* events are grouped by ordering key (the Stripe subscription id), and each
+  key's events run sequentially in Stripe ``created`` order;
+* a short lease on the key in ``stripe_event_locks`` keeps two workers (or
+  processes) from handling the same subscription at once;
+* different keys run concurrently, up to ``concurrency`` at a time;
+* a failed event is retried with backoff and blocks later events for its
+  key until it succeeds or exhausts ``max_attempts``.
+
+Stripe delivers at-least-once, so ``event_id`` carries a unique index: a
+redelivered event is rejected at insert time, before any processing. A TTL
+on ``processed_at`` bounds the dedup window (unprocessed events never expire).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import IndexModel, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def ordering_key(event: dict) -> str:
+    """Events touching the same Stripe subscription share a key"""
+    obj = event.get('data', {}).get('object', {}) or {}
+    if obj.get('object') == 'subscription':
+        key = obj.get('id')
+    else:
+        key = obj.get('subscription') or obj.get('metadata', {}).get('subscription_id')
+    return key or f"event:{event.get('id')}"
+
+
+class StripeEventConsumer:
+    def __init__(
+        self,
+        collection,
+        locks_collection,
+        handler: EventHandler,
+        batch_size: int = 100,
+        concurrency: int = 8,
+        poll_interval: float = 1.0,
+        lease_seconds: int = 60,
+        max_attempts: int = 5,
+        retry_base_seconds: int = 10,
+        dedup_ttl_seconds: int = 30 * 24 * 3600,
+    ):
+        self.collection = collection
+        self.locks = locks_collection
+        self.handler = handler
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.dedup_ttl_seconds = dedup_ttl_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def index_models(self) -> List[IndexModel]:
+        return [
+            IndexModel([('event_id', 1)], unique=True),
+            IndexModel([('processed_at', 1)], expireAfterSeconds=self.dedup_ttl_seconds),
+            IndexModel([('status', 1), ('created', 1)]),
+            IndexModel([('ordering_key', 1), ('status', 1), ('created', 1)]),
+        ]
+
+    async def record(self, event: dict) -> Optional[dict]:
+        """
+        Store a verified raw event for asynchronous processing.
+        Returns None if the event was already received.
+        """
+        doc = {
+            'event_id': event.get('id') or str(uuid.uuid4()),
+            'type': event.get('type', ''),
+            'ordering_key': ordering_key(event),
+            'created': event.get('created', 0),
+            'payload': event,
+            'status': 'pending',
+            'attempts': 0,
+            'received_at': utcnow(),
+        }
+        metrics.inc('stripe_events.received')
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            metrics.inc('stripe_events.duplicate')
+            logger.info(f"Duplicate Stripe event {doc['event_id']} ({doc['type']}) ignored")
+            return None
+        finally:
+            metrics.set_gauge(
+                'stripe_events.duplicate_rate',
+                metrics.counters['stripe_events.duplicate'] / metrics.counters['stripe_events.received']
+            )
+        self._wakeup.set()
+        return doc
+
+    async def _acquire_key(self, key: str) -> bool:
+        now = utcnow()
+        try:
+            await self.locks.find_one_and_update(
+                {'_id': key, '$or': [{'lease_until': {'$lt': now}}, {'owner': self.worker_id}]},
+                {'$set': {'owner': self.worker_id, 'lease_until': now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Another worker holds the lease for this key
+            return False
+
+    async def _release_key(self, key: str):
+        await self.locks.delete_one({'_id': key, 'owner': self.worker_id})
+
+    async def _process_key(self, key: str):
+        async with self._semaphore:
+            if not await self._acquire_key(key):
+                return
+            try:
+                # Re-read under the lease so we see every pending event for the key, in order
+                events = await self.collection.find(
+                    {'ordering_key': key, 'status': 'pending'}
+                ).sort([('created', 1), ('received_at', 1)]).to_list(self.batch_size)
+
+                now = utcnow()
+                done_ids = []
+                retry = None
+                for doc in events:
+                    if doc.get('retry_at') and doc['retry_at'].replace(tzinfo=timezone.utc) > now:
+                        # Earlier event is backing off; later ones must wait for it
+                        break
+                    try:
+                        await self.handler(doc['payload'])
+                        done_ids.append(doc['_id'])
+                    except Exception as e:
+                        retry = (doc, e)
+                        break
+
+                updates = []
+                if done_ids:
+                    updates.append(UpdateMany(
+                        {'_id': {'$in': done_ids}},
+                        {'$set': {'status': 'processed', 'processed_at': utcnow()}}
+                    ))
+                if retry:
+                    doc, error = retry
+                    attempts = doc.get('attempts', 0) + 1
+                    status = 'failed' if attempts >= self.max_attempts else 'pending'
+                    logger.error(f"Stripe event {doc['event_id']} ({doc['type']}) failed, attempt {attempts}: {error}")
+                    updates.append(UpdateOne(
+                        {'_id': doc['_id']},
+                        {'$set': {
+                            'status': status,
+                            'attempts': attempts,
+                            'last_error': str(error),
+                            'retry_at': utcnow() + timedelta(seconds=self.retry_base_seconds * 2 ** (attempts - 1))
+                        }}
+                    ))
+                if updates:
+                    await self.collection.bulk_write(updates, ordered=False)
+            finally:
+                await self._release_key(key)
+
+    async def process_batch(self) -> int:
+        """Process one batch of pending events. Returns the number of events seen."""
+        pending = await self.collection.find(
+            {'status': 'pending', 'retry_at': {'$not': {'$gt': utcnow()}}}, {'ordering_key': 1}
+        ).sort('created', 1).to_list(self.batch_size)
+        keys = list(OrderedDict.fromkeys(doc['ordering_key'] for doc in pending))
+        if keys:
+            await asyncio.gather(*(self._process_key(key) for key in keys))
+        return len(pending)
+
+    async def _run(self):
+        logger.info(f"Stripe event consumer {self.worker_id} started")
+        while True:
+            self._wakeup.clear()
+            try:
+                seen = await self.process_batch()
+            except Exception as e:
+                logger.error(f"Error processing Stripe events: {e}")
+                seen = 0
+            if seen < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,69 @@
+"""
+Non-blocking gateway for Stripe API calls.
+
+The stripe library is synchronous, so every call is run on a dedicated thread
+pool instead of the event loop. The gateway owns a ``stripe.StripeClient``
+whose requests session keeps connections to api.stripe.com alive, so the
+stripe module's global configuration is left alone. A semaphore caps
+concurrent calls, each call gets an overall deadline, and latencies are
+recorded under ``stripe.<operation>``.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+import requests
+import stripe
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StripeGateway:
+    def __init__(self, api_key: str, api_base: Optional[str] = None, max_concurrency: int = 16,
+                 timeout: float = 10, max_network_retries: int = 2):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_network_retries = max_network_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='stripe')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # One pooled session shared by all threads: TLS connections are reused across calls
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self.client = stripe.StripeClient(
+            api_key,
+            base_addresses={'api': api_base} if api_base else None,
+            max_network_retries=max_network_retries,
+            http_client=stripe.RequestsClient(timeout=timeout, session=session),
+        )
+
+    async def call(self, operation: str, fn, *args, **kwargs):
+        """Run a blocking stripe function on the gateway pool"""
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            metrics.add_gauge('stripe.in_flight', 1)
+            try:
+                with metrics.timer(f"stripe.{operation}"):
+                    # Outer deadline covers retries on top of the per-request HTTP timeout
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(self._executor, partial(fn, *args, **kwargs)),
+                        timeout=self.timeout * (self.max_network_retries + 1)
+                    )
+            finally:
+                metrics.add_gauge('stripe.in_flight', -1)
+
+    async def create_checkout_session(self, **params):
+        return await self.call('checkout_session_create', self.client.v1.checkout.sessions.create, params)
+
+    async def retrieve_checkout_session(self, session_id: str):
+        return await self.call('checkout_session_retrieve', self.client.v1.checkout.sessions.retrieve, session_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
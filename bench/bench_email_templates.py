@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: cost of rendering one email with the precompiled templates.
+
+    python bench/bench_email_templates.py [iterations]
+
+Reports the one-off compile time of the engine and the per-email render time
+for each template and locale.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from email_templates import EmailTemplateEngine
+
+CONTEXT = {
+    'first_name': 'Marco',
+    'full_name': 'Marco Rossi',
+    'company': 'Rossi & Figli SA',
+    'package_name': 'Pacchetto Premium',
+    'included_category': 'Seo',
+    'has_addons': True,
+    'addons': ['Ottimizzazione SEO', 'Setup Google My Business (una tantum)'],
+    'total_monthly': '900',
+    'total_one_time': '200',
+    'onboarding_url': 'https://arxeon.ch/onboarding?subscription_id=3f1c',
+    'score': 6,
+    'level': 'Medio',
+    'benchmark': True,
+    'percentile': 35,
+    'peers': 'tra le aziende del settore «Consulenza e servizi professionali» (area: Ticino)',
+    'services_url': 'https://arxeon.ch/servizi',
+    'amount': '900.00',
+    'package': 'Premium',
+}
+
+
+def main(iterations: int = 20000):
+    start = time.perf_counter()
+    engine = EmailTemplateEngine()
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f} ms for {len(engine._compiled)} templates")
+
+    for (name, locale), template in sorted(engine._compiled.items()):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            template.render(**CONTEXT)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28} {locale}  {elapsed / iterations * 1e6:7.2f} µs/email")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,229 @@
+"""
+Local HTTP stand-ins for Stripe, Resend and an OpenAI-compatible LLM, used by
+bench/loadtest.py.
+
+Each server answers only the calls the backend makes, after an injected
+latency (``latency`` seconds, +/- ``jitter`` as a fraction of it) and fails a
+``fail_rate`` share of requests with a 500. Requests are counted per route in
+``requests``. ``handle`` answers a JSON payload, or an ``EventStream`` that is
+sent chunked as server-sent events.
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+EVALUATION_TEMPLATE = """VALUTAZIONE STRATEGICA DEL MARKETING
+
+1. INTRODUZIONE
+
+Questa valutazione analizza la situazione marketing attuale dell'azienda.
+
+2. STATO ATTUALE – DIAGNOSI
+
+• Strategia non documentata
+• Canali gestiti senza obiettivi misurabili
+
+3. RISCHI PRINCIPALI
+
+- Dispersione di budget su canali non ottimizzati
+- Perdita di opportunità di crescita
+
+4. PRIORITÀ STRATEGICHE CONSIGLIATE
+
+1. Definire una strategia marketing chiara e misurabile
+2. Ottimizzare l'allocazione del budget sui canali più performanti
+
+📊 VALUTAZIONE FINALE:
+- Livello di maturità marketing: {level}
+- Punteggio complessivo: {score}/10
+
+---
+Documento riservato – uso informativo
+"""
+
+LEVELS = {range(0, 4): 'Basso', range(4, 7): 'Medio', range(7, 11): 'Avanzato'}
+
+
+class EventStream:
+    """Server-sent events, each written (and flushed) ``interval`` seconds after the previous one"""
+
+    def __init__(self, events, interval: float = 0):
+        self.events = events
+        self.interval = interval
+
+
+class StubServer:
+    """ThreadingHTTPServer on a free local port; subclasses implement ``handle``"""
+
+    def __init__(self, latency: float = 0, jitter: float = 0, fail_rate: float = 0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                path = self.path.split('?', 1)[0]
+                with stub._lock:
+                    stub.requests[stub.route(method, path)] += 1
+                    delay = stub.latency * (1 + stub._random.uniform(-stub.jitter, stub.jitter))
+                    failing = stub._random.random() < stub.fail_rate
+                if delay > 0:
+                    time.sleep(delay)
+                if failing:
+                    status, payload = 500, {'error': {'type': 'api_error', 'message': 'injected failure'}}
+                else:
+                    status, payload = stub.handle(method, path, body, self.headers)
+                if isinstance(payload, EventStream):
+                    return self._send_events(status, payload)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_events(self, status, stream):
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for i, event in enumerate(stream.events):
+                    if i and stream.interval > 0:
+                        time.sleep(stream.interval)
+                    data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def route(self, method: str, path: str) -> str:
+        """Key of ``requests`` for a call"""
+        return f"{method} {path}"
+
+    def handle(self, method: str, path: str, body: bytes, headers) -> tuple:
+        raise NotImplementedError
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeStripeServer(StubServer):
+    """Checkout Session create and retrieve (``/v1/checkout/sessions``)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sessions = {}
+
+    def route(self, method, path):
+        if path.startswith('/v1/checkout/sessions/'):
+            return f"{method} /v1/checkout/sessions/{{id}}"
+        return super().route(method, path)
+
+    def handle(self, method, path, body, headers):
+        if method == 'POST' and path == '/v1/checkout/sessions':
+            params = dict(parse_qsl(body.decode()))
+            session_id = f"cs_test_{uuid.uuid4().hex}"
+            session = {
+                'id': session_id,
+                'object': 'checkout.session',
+                'url': f"{self.url}/pay/{session_id}",
+                'mode': params.get('mode'),
+                'status': 'open',
+                'payment_status': 'unpaid',
+                'customer_email': params.get('customer_email'),
+                'metadata': {
+                    key[len('metadata['):-1]: value for key, value in params.items() if key.startswith('metadata[')
+                },
+            }
+            with self._lock:
+                self.sessions[session_id] = session
+            return 200, session
+        if method == 'GET' and path.startswith('/v1/checkout/sessions/'):
+            session = self.sessions.get(path.rsplit('/', 1)[1])
+            if session is None:
+                return 404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}}
+            return 200, session
+        return 404, {'error': {'type': 'invalid_request_error', 'message': f"Unrecognized request URL {path}"}}
+
+
+class FakeResendServer(StubServer):
+    """``POST /emails`` and ``POST /emails/batch``"""
+
+    def handle(self, method, path, body, headers):
+        if path == '/emails/batch':
+            return 200, {'data': [{'id': str(uuid.uuid4())} for _ in json.loads(body)]}
+        if path == '/emails':
+            return 200, {'id': str(uuid.uuid4())}
+        return 404, {'message': 'not found'}
+
+
+class FakeLlmServer(StubServer):
+    """
+    OpenAI-compatible ``POST /chat/completions`` answering a well-formed
+    evaluation with a random score. With ``stream: true`` the answer is sent
+    as ``chunk_size``-character deltas, ``chunk_interval`` seconds apart
+    (``latency`` is then the time to the first chunk).
+    """
+
+    def __init__(self, chunk_size: int = 40, chunk_interval: float = 0.02, **kwargs):
+        super().__init__(**kwargs)
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+
+    def handle(self, method, path, body, headers):
+        if path != '/chat/completions':
+            return 404, {'error': {'message': 'not found'}}
+        request = json.loads(body)
+        with self._lock:
+            score = self._random.randint(2, 9)
+        level = next(name for scores, name in LEVELS.items() if score in scores)
+        text = EVALUATION_TEMPLATE.format(score=score, level=level)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if request.get('stream'):
+            deltas = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+            events = [{
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'delta': {'content': delta}, 'finish_reason': None}],
+            } for delta in deltas]
+            events[-1]['choices'][0]['finish_reason'] = 'stop'
+            return 200, EventStream(events + ['[DONE]'], self.chunk_interval)
+        return 200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'model': request.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 900, 'completion_tokens': len(text) // 4, 'total_tokens': 900 + len(text) // 4},
+        }
@@ -0,0 +1,576 @@
+"""
+End-to-end load test of the backend.
+
+Boots the app (uvicorn, in a subprocess) against a local mongod and the
+stand-ins in fake_services.py, drives a mix of traffic at a target rate and
+writes per-route latency percentiles and error rates to a JSON report that
+can be compared across commits:
+
+    python bench/loadtest.py --rps 50 --duration 60
+    python bench/loadtest.py --rps 50 --llm-latency 3 --stripe-latency 0.4 \\
+        --compare bench/results/loadtest-1a2b3c4.json --max-p95-regression 20
+
+Traffic is open-loop: operations start on schedule whether or not earlier ones
+have finished, so a slow server shows up as latency (and as ``dropped`` once
+``--max-in-flight`` operations are pending) rather than as a lower request
+rate. Operations, with relative weights set by --mix:
+
+  checkout           POST /api/stripe/create-checkout-session
+  webhook_burst      --burst-size concurrent POST /api/webhook/stripe: completes
+                     pending checkouts, plus invoice events and redeliveries
+  audit              POST /api/free-audit (runs the LLM/PDF/email pipeline)
+  poll_subscription  GET /api/subscription/{id}
+  poll_session       GET /api/verify-session/{session_id}
+  poll_audit         GET /api/free-audit/{id}
+
+Samples from the first --warmup seconds are discarded. Without --mongo-url a
+throwaway mongod (``mongod`` from PATH, or --mongod) is started on a free
+port; with it, a fresh database is used and dropped afterwards. The app's own
+/api/debug/metrics snapshot is included in the report (from one worker when
+--workers > 1).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import httpx
+
+from fake_services import FakeLlmServer, FakeResendServer, FakeStripeServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'backend')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+WEBHOOK_SECRET = 'whsec_loadtest'
+
+OPERATIONS = ('checkout', 'webhook_burst', 'audit', 'poll_subscription', 'poll_session', 'poll_audit')
+DEFAULT_MIX = 'checkout=2,webhook_burst=0.2,audit=1,poll_subscription=3,poll_session=2,poll_audit=2'
+
+SECTORS = ['consulting', 'retail', 'ecommerce', 'hospitality', 'health', 'technology', 'real_estate']
+AREAS = ['ticino', 'romandie', 'deutschschweiz', 'national', 'international']
+CHANNELS = ['social', 'ads', 'seo', 'email', 'website', 'offline']
+OBJECTIVES = ['acquisition', 'retention', 'awareness', 'sales']
+BUDGETS = ['under500', '500_1000', '1000_2000', '2000_5000', 'over5000']
+
+
+# ------------------------------------------------------------
+# Processes
+# ------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{what} exited with status {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{what} did not start listening on port {port} within {timeout}s")
+
+
+def stop_process(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def start_mongod(stack: ExitStack, binary: str) -> str:
+    path = shutil.which(binary)
+    if path is None:
+        raise RuntimeError(f"{binary} not found; install MongoDB or pass --mongo-url")
+    dbpath = stack.enter_context(tempfile.TemporaryDirectory(prefix='loadtest-mongod-'))
+    port = free_port()
+    process = subprocess.Popen(
+        [path, '--dbpath', dbpath, '--port', str(port), '--bind_ip', '127.0.0.1'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+    )
+    stack.callback(stop_process, process)
+    wait_for_port(port, process, 30, 'mongod')
+    return f"mongodb://127.0.0.1:{port}"
+
+
+def start_app(stack: ExitStack, env: dict, workers: int, log_path: str) -> str:
+    port = free_port()
+    log = stack.enter_context(open(log_path, 'w'))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'server:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    stack.callback(stop_process, process)
+    wait_for_port(port, process, 60, f"the app (see {log_path})")
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/", timeout=2).status_code == 200:
+                return base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"The app did not become ready (see {log_path})")
+
+
+def app_env(args, mongo_url: str, db_name: str, stripe: FakeStripeServer, resend: FakeResendServer,
+            llm: FakeLlmServer) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'MONGO_URL': mongo_url,
+        'DB_NAME': db_name,
+        'STRIPE_SECRET_KEY': 'sk_test_loadtest',
+        'STRIPE_API_BASE': stripe.url,
+        'STRIPE_WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'RESEND_API_KEY': 're_loadtest',
+        'RESEND_API_URL': resend.url,
+        'RESEND_RATE_LIMIT': str(args.resend_rate_limit),
+        'SMTP_HOST': '',
+        'EMERGENT_LLM_KEY': 'sk-loadtest',
+        'LLM_API_BASE': llm.url,
+        'AUDIT_EMAIL_DELAY_SECONDS': '0',
+        'JOB_WORKER_ENABLED': 'true',
+    })
+    return env
+
+
+# ------------------------------------------------------------
+# Measurement
+# ------------------------------------------------------------
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)   # route -> [(seconds, ok)]
+        self.error_statuses = defaultdict(lambda: defaultdict(int))
+        self.measuring = False
+        self.dropped = 0
+
+    def record(self, route: str, seconds: float, ok: bool, status: str):
+        self.samples[route].append((seconds, ok))
+        if not ok:
+            self.error_statuses[route][status] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        total = errors = 0
+        for route, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _ in samples)
+            failed = sum(1 for _, ok in samples if not ok)
+            total += len(samples)
+            errors += failed
+            routes[route] = {
+                'count': len(samples),
+                'rps': round(len(samples) / elapsed, 2),
+                'errors': failed,
+                'error_rate': round(failed / len(samples), 4),
+                'error_statuses': dict(self.error_statuses[route]),
+                'p50_ms': round(percentile(latencies, 50), 1),
+                'p95_ms': round(percentile(latencies, 95), 1),
+                'p99_ms': round(percentile(latencies, 99), 1),
+                'max_ms': round(latencies[-1], 1),
+            }
+        return {
+            'totals': {
+                'requests': total,
+                'rps': round(total / elapsed, 2),
+                'errors': errors,
+                'error_rate': round(errors / total, 4) if total else 0.0,
+                'dropped_operations': self.dropped,
+            },
+            'routes': routes,
+        }
+
+
+# ------------------------------------------------------------
+# Traffic
+# ------------------------------------------------------------
+
+class Traffic:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, burst_size: int):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.burst_size = burst_size
+        self.config = None
+        self.pending_sessions = deque()   # (session_id, subscription_id, email) awaiting the webhook
+        self.sessions = []                # (session_id, subscription_id)
+        self.completed = []               # (stripe subscription id, checkout.session.completed event)
+        self.audits = []
+
+    async def request(self, route: str, method: str, url: str, **kwargs):
+        measured = self.recorder.measuring
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            if measured:
+                self.recorder.record(route, time.perf_counter() - start, False, type(e).__name__)
+            return None
+        if measured:
+            self.recorder.record(route, time.perf_counter() - start, response.is_success, str(response.status_code))
+        return response if response.is_success else None
+
+    async def load_config(self):
+        response = await self.client.get('/api/config/addons')
+        response.raise_for_status()
+        self.config = response.json()
+
+    def checkout_body(self) -> dict:
+        package = self.rng.choice(list(self.config['packages']))
+        addons = [addon['code'] for addon in self.config['addons'].get(package, [])]
+        body = {
+            'package': package,
+            'selectedAddons': self.rng.sample(addons, self.rng.randint(0, min(2, len(addons)))),
+            'customerEmail': f"checkout-{uuid.uuid4().hex[:12]}@example.com",
+            'locale': self.rng.choice(['it', 'fr']),
+        }
+        if package == 'premium':
+            body['includedCategory'] = self.rng.choice(self.config['validCategories'])
+        return body
+
+    async def checkout(self):
+        body = self.checkout_body()
+        response = await self.request('POST /api/stripe/create-checkout-session', 'POST',
+                                      '/api/stripe/create-checkout-session', json=body)
+        if response is not None:
+            data = response.json()
+            self.pending_sessions.append((data['sessionId'], data['subscriptionId'], body['customerEmail']))
+            self.sessions.append((data['sessionId'], data['subscriptionId']))
+
+    def completed_event(self, session_id: str, subscription_id: str, email: str) -> dict:
+        return {
+            'id': f"evt_{uuid.uuid4().hex}",
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'created': int(time.time()),
+            'data': {'object': {
+                'id': session_id,
+                'object': 'checkout.session',
+                'status': 'complete',
+                'payment_status': 'paid',
+                'customer': f"cus_{uuid.uuid4().hex[:14]}",
+                'subscription': f"sub_{uuid.uuid4().hex[:14]}",
+                'customer_details': {'email': email},
+                'metadata': {'subscription_id': subscription_id},
+            }},
+        }
+
+    def invoice_event(self, stripe_subscription_id: str) -> dict:
+        return {
+            'id': f"evt_{uuid.uuid4().hex}",
+            'object': 'event',
+            'type': 'invoice.payment_succeeded',
+            'created': int(time.time()),
+            'data': {'object': {
+                'id': f"in_{uuid.uuid4().hex[:14]}",
+                'object': 'invoice',
+                'subscription': stripe_subscription_id,
+                'amount_paid': self.rng.choice([20000, 40000, 90000]),
+            }},
+        }
+
+    async def send_webhook(self, event: dict):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        await self.request('POST /api/webhook/stripe', 'POST', '/api/webhook/stripe', content=payload, headers={
+            'Content-Type': 'application/json',
+            'Stripe-Signature': f"t={timestamp},v1={signature}",
+        })
+
+    async def webhook_burst(self):
+        """Complete pending checkouts; fill the rest with invoices and redeliveries, as Stripe does"""
+        events = []
+        while self.pending_sessions and len(events) < self.burst_size:
+            event = self.completed_event(*self.pending_sessions.popleft())
+            self.completed.append((event['data']['object']['subscription'], event))
+            events.append(event)
+        while self.completed and len(events) < self.burst_size:
+            stripe_subscription_id, event = self.rng.choice(self.completed)
+            events.append(event if self.rng.random() < 0.3 else self.invoice_event(stripe_subscription_id))
+        await asyncio.gather(*(self.send_webhook(event) for event in events))
+
+    async def audit(self):
+        n = uuid.uuid4().hex[:10]
+        response = await self.request('POST /api/free-audit', 'POST', '/api/free-audit', json={
+            'fullName': f"Load Test {n}",
+            'email': f"audit-{n}@example.com",
+            'companyName': f"Azienda {n} SA",
+            'sector': self.rng.choice(SECTORS),
+            'geoArea': self.rng.choice(AREAS),
+            'channels': self.rng.sample(CHANNELS, self.rng.randint(1, 3)),
+            'objective': self.rng.choice(OBJECTIVES),
+            'budget': self.rng.choice(BUDGETS),
+            'mainProblem': "Generiamo pochi contatti qualificati dai canali digitali",
+            'improvementImportance': self.rng.randint(1, 5),
+            'locale': self.rng.choice(['it', 'fr']),
+        })
+        if response is not None:
+            self.audits.append(response.json()['id'])
+
+    async def poll_subscription(self):
+        if not self.sessions:
+            return await self.checkout()
+        _, subscription_id = self.rng.choice(self.sessions)
+        await self.request('GET /api/subscription/{id}', 'GET', f"/api/subscription/{subscription_id}")
+
+    async def poll_session(self):
+        if not self.sessions:
+            return await self.checkout()
+        session_id, _ = self.rng.choice(self.sessions)
+        await self.request('GET /api/verify-session/{session_id}', 'GET', f"/api/verify-session/{session_id}")
+
+    async def poll_audit(self):
+        if not self.audits:
+            return await self.audit()
+        await self.request('GET /api/free-audit/{id}', 'GET', f"/api/free-audit/{self.rng.choice(self.audits)}")
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in OPERATIONS or not weight:
+            raise argparse.ArgumentTypeError(f"Invalid mix entry {item!r}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+async def drive(args, base_url: str, recorder: Recorder) -> tuple:
+    """Run the schedule; returns (measured seconds, Traffic)"""
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        traffic = Traffic(client, recorder, random.Random(args.seed), args.burst_size)
+        await traffic.load_config()
+        names, weights = zip(*args.mix.items())
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        interval = 1 / args.rps
+        start = loop.time()
+        measured_from = start + args.warmup
+        end = measured_from + args.duration
+        n = 0
+        while start + n * interval < end:
+            due = start + n * interval
+            n += 1
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            recorder.measuring = due >= measured_from
+            if len(tasks) >= args.max_in_flight:
+                if recorder.measuring:
+                    recorder.dropped += 1
+                continue
+            operation = traffic.rng.choices(names, weights)[0]
+            task = asyncio.create_task(getattr(traffic, operation)())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elapsed = loop.time() - measured_from
+        if tasks:
+            await asyncio.wait(tasks, timeout=args.timeout)
+        return elapsed, traffic
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+
+def git_revision() -> dict:
+    def git(*argv):
+        return subprocess.run(['git', *argv], cwd=BENCH_DIR, capture_output=True, text=True).stdout.strip()
+
+    return {'commit': git('rev-parse', '--short', 'HEAD') or 'unknown', 'dirty': bool(git('status', '--porcelain'))}
+
+
+def pipeline_state(mongo_url: str, db_name: str) -> dict:
+    """Where the audits and subscriptions created by the run ended up"""
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        db = client[db_name]
+
+        def by_status(collection):
+            return {
+                row['_id'] or 'none': row['n']
+                for row in db[collection].aggregate([{'$group': {'_id': '$status', 'n': {'$sum': 1}}}])
+            }
+
+        return {
+            'audits': by_status('free_audits'),
+            'subscriptions': by_status('subscriptions'),
+            'stripe_events': db.stripe_events.count_documents({}),
+            'emails': by_status('email_outbox'),
+        }
+    finally:
+        client.close()
+
+
+def drop_database(mongo_url: str, db_name: str):
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        client.drop_database(db_name)
+    except PyMongoError as e:
+        print(f"Could not drop {db_name}: {e}", file=sys.stderr)
+    finally:
+        client.close()
+
+
+def compare(report: dict, baseline: dict, max_p95_regression: float = None) -> bool:
+    """Print per-route changes against a previous report; False if a p95 regressed beyond the limit"""
+    print(f"\nvs {baseline['revision']['commit']}{' (dirty)' if baseline['revision']['dirty'] else ''}:")
+    print(f"{'route':<46}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}{'errors':>16}")
+    ok = True
+    for route, now in report['routes'].items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            print(f"{route:<46}{'(new)':>16}")
+            continue
+        cells = [f"{before[k]:.0f}->{now[k]:.0f}" for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+        cells.append(f"{before['error_rate']:.1%}->{now['error_rate']:.1%}")
+        growth = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        flag = ''
+        if max_p95_regression is not None and growth > max_p95_regression:
+            flag = f"  p95 +{growth:.0f}%"
+            ok = False
+        print(f"{route:<46}" + ''.join(f"{cell:>16}" for cell in cells) + flag)
+    return ok
+
+
+def print_summary(report: dict):
+    totals = report['totals']
+    print(f"{totals['requests']} requests, {totals['rps']} rps, error rate {totals['error_rate']:.2%}, "
+          f"{totals['dropped_operations']} operations dropped")
+    print(f"{'route':<46}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for route, row in report['routes'].items():
+        print(f"{route:<46}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+              f"{row['error_rate']:>9.1%}")
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+def run(args) -> dict:
+    with ExitStack() as stack:
+        fake = {'jitter': args.latency_jitter, 'fail_rate': args.fail_rate, 'seed': args.seed}
+        stripe = stack.enter_context(FakeStripeServer(latency=args.stripe_latency, **fake))
+        resend = stack.enter_context(FakeResendServer(latency=args.resend_latency, **fake))
+        llm = stack.enter_context(FakeLlmServer(latency=args.llm_latency, chunk_interval=args.llm_chunk_interval, **fake))
+
+        mongo_url = args.mongo_url or start_mongod(stack, args.mongod)
+        db_name = f"loadtest_{uuid.uuid4().hex[:8]}"
+        if not args.keep_db:
+            stack.callback(drop_database, mongo_url, db_name)
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        log_path = os.path.join(RESULTS_DIR, 'loadtest-app.log')
+        base_url = start_app(stack, app_env(args, mongo_url, db_name, stripe, resend, llm), args.workers, log_path)
+        print(f"App at {base_url}, database {db_name}; {args.rps} rps for {args.duration}s after {args.warmup}s warm-up")
+
+        recorder = Recorder()
+        started_at = datetime.now(timezone.utc).isoformat()
+        elapsed, _ = asyncio.run(drive(args, base_url, recorder))
+        # Let the job queue and outbox catch up before reading where things ended up
+        time.sleep(args.settle)
+
+        app_metrics = httpx.get(f"{base_url}/api/debug/metrics", timeout=10).json()
+        report = {
+            'revision': git_revision(),
+            'started_at': started_at,
+            'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'output')},
+            **recorder.summary(elapsed),
+            'pipeline': pipeline_state(mongo_url, db_name),
+            'fake_services': {
+                'stripe': dict(stripe.requests),
+                'resend': dict(resend.requests),
+                'llm': dict(llm.requests),
+            },
+            'app_metrics': app_metrics,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the backend against local stand-ins")
+    parser.add_argument('--rps', type=float, default=20, help="operations started per second")
+    parser.add_argument('--duration', type=float, default=60, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds of traffic before measuring")
+    parser.add_argument('--settle', type=float, default=5, help="seconds to wait for background work at the end")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--burst-size', type=int, default=20, help="webhook deliveries per burst")
+    parser.add_argument('--max-in-flight', type=int, default=200, help="pending operations before dropping")
+    parser.add_argument('--timeout', type=float, default=30, help="client timeout per request (seconds)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--stripe-latency', type=float, default=0.25, help="seconds")
+    parser.add_argument('--resend-latency', type=float, default=0.15, help="seconds")
+    parser.add_argument('--llm-latency', type=float, default=2.0, help="seconds (to the first chunk when streaming)")
+    parser.add_argument('--llm-chunk-interval', type=float, default=0.02, help="seconds between streamed LLM chunks")
+    parser.add_argument('--latency-jitter', type=float, default=0.3, help="+/- fraction of each latency")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="share of fake-service calls answering 500")
+    parser.add_argument('--resend-rate-limit', type=float, default=50, help="RESEND_RATE_LIMIT for the app")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn workers")
+    parser.add_argument('--mongo-url', help="use this MongoDB instead of starting a mongod")
+    parser.add_argument('--mongod', default='mongod', help="mongod binary to start (default: from PATH)")
+    parser.add_argument('--keep-db', action='store_true', help="do not drop the test database")
+    parser.add_argument('-o', '--output', help="report path (default: bench/results/loadtest-<commit>.json)")
+    parser.add_argument('--compare', help="previous report to compare against")
+    parser.add_argument('--max-p95-regression', type=float,
+                        help="with --compare, exit 1 if any route's p95 grew by more than this percent")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run(args)
+    except RuntimeError as e:
+        sys.exit(f"loadtest: {e}")
+    revision = report['revision']
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"loadtest-{revision['commit']}{'-dirty' if revision['dirty'] else ''}.json"
+    )
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"Report written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(report, json.load(f), args.max_p95_regression):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
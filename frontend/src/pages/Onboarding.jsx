@@ -10,6 +10,7 @@ import {
   SelectValue,
 } from '../components/ui/select';
 import { toast } from 'sonner';
+import i18n from '../i18n/config';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -118,7 +119,8 @@ const Onboarding = () => {
         },
         body: JSON.stringify({
           ...formData,
-          subscription_id: subscriptionId
+          subscription_id: subscriptionId,
+          locale: i18n.resolvedLanguage
         }),
       });
 
@@ -8,7 +8,7 @@ import { useAnalytics } from '../../hooks/useAnalytics';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
 const CheckoutGold = () => {
-  const { t } = useTranslation();
+  const { t, i18n } = useTranslation();
   const [selectedAddons, setSelectedAddons] = useState([]);
   const [isProcessing, setIsProcessing] = useState(false);
   const [customerEmail, setCustomerEmail] = useState('');
@@ -82,7 +82,8 @@ const CheckoutGold = () => {
         body: JSON.stringify({
           package: 'gold',
           selectedAddons: selectedAddons,
-          customerEmail: customerEmail
+          customerEmail: customerEmail,
+          locale: i18n.resolvedLanguage
         }),
       });
 
@@ -8,7 +8,7 @@ import { useAnalytics } from '../../hooks/useAnalytics';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
 const CheckoutPremium = () => {
-  const { t } = useTranslation();
+  const { t, i18n } = useTranslation();
   const navigate = useNavigate();
   const [includedCategory, setIncludedCategory] = useState('');
   const [selectedPlatform, setSelectedPlatform] = useState('');
@@ -157,7 +157,8 @@ const CheckoutPremium = () => {
           selectedAddons: selectedAddons,
           includedCategory: includedCategory,
           selectedPlatform: selectedPlatform || null,
-          customerEmail: customerEmail
+          customerEmail: customerEmail,
+          locale: i18n.resolvedLanguage
         }),
       });
 
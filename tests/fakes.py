@@ -0,0 +1,462 @@
+"""
+Local stand-ins for external services used in tests: HTTP servers, LLM
+providers and in-memory MongoDB collections.
+"""
+
+import asyncio
+import copy
+import json
+import operator
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import UpdateResult
+
+
+class FakeResendServer:
+    """
+    Minimal Resend API: POST /emails and POST /emails/batch.
+
+    Received messages are kept in ``messages``. ``fail_next`` makes the next N
+    requests answer 500, ``latency`` delays every response (seconds) and any
+    request with a recipient in ``rejected`` answers 422.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.messages = []
+        self.requests = []
+        self.fail_next = 0
+        self.rejected = set()
+        self.latency = latency
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    fake.requests.append((self.path, self.headers.get('Authorization')))
+                    failing = fake.fail_next > 0
+                    if failing:
+                        fake.fail_next -= 1
+                if failing:
+                    return self._reply(500, {'name': 'internal_server_error', 'message': 'injected failure'})
+                batch = body if isinstance(body, list) else [body]
+                if any(to in fake.rejected for message in batch for to in message.get('to', [])):
+                    return self._reply(422, {'name': 'validation_error', 'message': 'invalid recipient'})
+                if self.path == '/emails/batch':
+                    with fake._lock:
+                        fake.messages.extend(body)
+                    return self._reply(200, {'data': [{'id': str(uuid.uuid4())} for _ in body]})
+                if self.path == '/emails':
+                    with fake._lock:
+                        fake.messages.append(body)
+                    return self._reply(200, {'id': str(uuid.uuid4())})
+                self._reply(404, {'message': 'not found'})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeStripeServer:
+    """
+    Minimal Stripe API: Checkout Session create and retrieve.
+
+    ``latency`` delays every response (seconds); ``in_flight`` and
+    ``max_in_flight`` count concurrent requests, and ``requests`` keeps
+    (method, path, Authorization) per request.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.sessions = {}
+        self.requests = []
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with fake._lock:
+                    fake.requests.append((method, self.path, self.headers.get('Authorization')))
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    self._reply(*fake.handle(method, self.path, body))
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple:
+        if method == 'POST' and path == '/v1/checkout/sessions':
+            params = dict(parse_qsl(body.decode()))
+            session_id = f"cs_test_{uuid.uuid4().hex}"
+            session = {
+                'id': session_id,
+                'object': 'checkout.session',
+                'url': f"{self.url}/pay/{session_id}",
+                'payment_status': 'unpaid',
+                'metadata': {
+                    key[len('metadata['):-1]: value for key, value in params.items() if key.startswith('metadata[')
+                },
+            }
+            with self._lock:
+                self.sessions[session_id] = session
+            return 200, session
+        if method == 'GET' and path.startswith('/v1/checkout/sessions/'):
+            session = self.sessions.get(path.rsplit('/', 1)[1])
+            if session:
+                return 200, session
+        return 404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout session'}}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeLlmProvider:
+    """
+    In-process LLM provider with the LlmClient interface plus ``stream``.
+    ``latency`` (seconds, or a callable returning seconds per call) is the
+    time to the first chunk; the text then streams word by word, one every
+    ``chunk_delay`` seconds. ``fail`` makes every call raise after the latency.
+    """
+
+    def __init__(self, name: str, latency=0.0, fail: bool = False, text: str = None, chunk_delay: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.text = text or f"Valutazione da {name}"
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def stream(self, prompt: str):
+        self.calls += 1
+        latency = self.latency() if callable(self.latency) else self.latency
+        try:
+            await asyncio.sleep(latency)
+            if self.fail:
+                raise RuntimeError(f"{self.name} unavailable")
+            words = self.text.split(' ')
+            for i, word in enumerate(words):
+                if i and self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                yield word if i == len(words) - 1 else word + ' '
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def complete(self, prompt: str) -> str:
+        return ''.join([chunk async for chunk in self.stream(prompt)])
+
+
+def _get(doc: dict, path: str):
+    for part in path.split('.'):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _comparable(a, b) -> bool:
+    """Range operators only match values of the same kind, as in MongoDB"""
+    numbers = (int, float)
+    if isinstance(a, numbers) and isinstance(b, numbers):
+        return not isinstance(a, bool) and not isinstance(b, bool)
+    return type(a) is type(b) and isinstance(a, (str, datetime))
+
+
+_RANGE_OPERATORS = {'$lt': operator.lt, '$lte': operator.le, '$gt': operator.gt, '$gte': operator.ge}
+
+
+def _matches_condition(value, condition) -> bool:
+    if not (isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition)):
+        return value == condition
+    for op, operand in condition.items():
+        if op == '$in':
+            ok = value in operand
+        elif op == '$nin':
+            ok = value not in operand
+        elif op == '$ne':
+            ok = value != operand
+        elif op == '$not':
+            ok = not _matches_condition(value, operand)
+        elif op == '$exists':
+            ok = (value is not None) == operand
+        elif op in _RANGE_OPERATORS:
+            ok = _comparable(value, operand) and _RANGE_OPERATORS[op](value, operand)
+        else:
+            raise NotImplementedError(f"FakeCollection does not support {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """Subset of the MongoDB query language used by the backend"""
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _matches_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _set(doc: dict, path: str, value):
+    *parents, last = path.split('.')
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == '$set' or op == '$setOnInsert' and inserting:
+                _set(doc, path, copy.deepcopy(value))
+            elif op == '$inc':
+                _set(doc, path, (_get(doc, path) or 0) + value)
+            elif op == '$unset':
+                *parents, last = path.split('.')
+                parent = _get(doc, '.'.join(parents)) if parents else doc
+                if isinstance(parent, dict):
+                    parent.pop(last, None)
+            elif op != '$setOnInsert':
+                raise NotImplementedError(f"FakeCollection does not support {op}")
+
+
+class FakeCursor:
+    def __init__(self, docs: list):
+        self.docs = docs
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        keys = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        for key, order in reversed(keys):
+            # None sorts first, as in MongoDB
+            self.docs.sort(key=lambda doc: (_get(doc, key) is not None, _get(doc, key) or 0), reverse=order < 0)
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int):
+        return self
+
+    def _results(self):
+        return self.docs[:self._limit] if self._limit else self.docs
+
+    async def to_list(self, length=None):
+        results = self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            yield doc
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for a Motor collection, enough for the queues and
+    inboxes: single and bulk updates with upserts, find_one_and_update,
+    unique indexes (from create_indexes) and documents returned as copies.
+    """
+
+    def __init__(self, name: str = 'fake'):
+        self.name = name
+        self.docs = []
+        self.indexes = []
+
+    async def create_indexes(self, models):
+        self.indexes.extend(model.document for model in models)
+        return [model.document['name'] for model in models]
+
+    def _unique_keys(self):
+        yield ['_id']
+        for index in self.indexes:
+            if index.get('unique'):
+                yield list(index['key'])
+
+    def _check_unique(self, doc: dict, ignore=None):
+        for keys in self._unique_keys():
+            value = [_get(doc, key) for key in keys]
+            for other in self.docs:
+                if other is not ignore and [_get(other, key) for key in keys] == value:
+                    raise DuplicateKeyError(f"E11000 duplicate key on {keys}: {value}")
+
+    def _insert(self, doc: dict) -> dict:
+        doc = copy.deepcopy(doc)
+        doc.setdefault('_id', str(uuid.uuid4()))
+        self._check_unique(doc)
+        self.docs.append(doc)
+        return doc
+
+    def _upsert_doc(self, query: dict) -> dict:
+        return {key: value for key, value in query.items()
+                if not key.startswith('$') and not (isinstance(value, dict) and any(k.startswith('$') for k in value))}
+
+    def _update(self, query: dict, update: dict, many: bool = False, upsert: bool = False) -> UpdateResult:
+        targets = [doc for doc in self.docs if matches(doc, query)]
+        if not many:
+            targets = targets[:1]
+        result = {'n': len(targets), 'nModified': 0}
+        for doc in targets:
+            updated = copy.deepcopy(doc)
+            apply_update(updated, update)
+            self._check_unique(updated, ignore=doc)
+            result['nModified'] += updated != doc
+            doc.clear()
+            doc.update(updated)
+        if not targets and upsert:
+            doc = self._upsert_doc(query)
+            apply_update(doc, update, inserting=True)
+            result['upserted'] = self._insert(doc)['_id']
+        return UpdateResult(result, True)
+
+    async def insert_one(self, doc: dict):
+        self._insert(doc)
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            self._insert(doc)
+
+    async def find_one(self, query: dict = None, projection=None):
+        for doc in self.docs:
+            if matches(doc, query or {}):
+                return copy.deepcopy(doc)
+        return None
+
+    def find(self, query: dict = None, projection=None) -> FakeCursor:
+        return FakeCursor([copy.deepcopy(doc) for doc in self.docs if matches(doc, query or {})])
+
+    async def count_documents(self, query: dict):
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> UpdateResult:
+        return self._update(query, update, upsert=upsert)
+
+    async def update_many(self, query: dict, update: dict) -> UpdateResult:
+        return self._update(query, update, many=True)
+
+    async def find_one_and_update(self, query: dict, update: dict, sort=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE, projection=None):
+        candidates = self.find(query)
+        if sort:
+            candidates.sort(sort)
+        docs = await candidates.to_list(1)
+        if docs:
+            before = docs[0]
+            target = next(doc for doc in self.docs if doc['_id'] == before['_id'])
+            self._update({'_id': target['_id']}, update)
+            return copy.deepcopy(target) if return_document == ReturnDocument.AFTER else before
+        if upsert:
+            inserted = self._update(query, update, upsert=True).upserted_id
+            return await self.find_one({'_id': inserted}) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def delete_one(self, query: dict):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return
+
+    async def delete_many(self, query: dict):
+        self.docs = [doc for doc in self.docs if not matches(doc, query)]
+
+    async def bulk_write(self, requests, ordered: bool = True):
+        # pymongo's write models keep their arguments in private attributes
+        for request in requests:
+            name = type(request).__name__
+            if name in ('UpdateOne', 'UpdateMany'):
+                self._update(request._filter, request._doc, many=name == 'UpdateMany', upsert=bool(request._upsert))
+            elif name == 'InsertOne':
+                self._insert(request._doc)
+            else:
+                raise NotImplementedError(f"FakeCollection does not support {name}")
+
+
+class FakeDatabase:
+    """Collections created on first access, by attribute or item"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
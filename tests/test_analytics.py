@@ -0,0 +1,114 @@
+"""
+Tests for the analytics rollups (backend/analytics.py).
+
+The rollup tests need a reachable MongoDB and are skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from analytics import _subscription_rows
+from test_query_plans import mongo_available
+
+TEST_DB_NAME = 'arxeon_test_analytics'
+
+PREMIUM = {
+    'id': 'sub-1', 'package': 'premium', 'included_category': 'seo',
+    'addons': ['addon_seo_monthly', 'oneshot_logo'], 'total_monthly': 90000, 'total_one_time': 65000,
+}
+BASIC = {
+    'id': 'sub-2', 'package': 'basic', 'included_category': None,
+    'addons': [], 'total_monthly': 20000, 'total_one_time': 0,
+}
+
+
+class TestSubscriptionRows(unittest.TestCase):
+    def test_activation_rows(self):
+        rows = _subscription_rows(PREMIUM, 'activations', revenue=1)
+        self.assertEqual(rows, [
+            ('funnel', 'all', {'activations': 1}),
+            ('package', 'premium', {'activations': 1, 'mrr_delta': 90000, 'one_time': 65000}),
+            ('addon', 'addon_seo_monthly', {'activations': 1}),
+            ('addon', 'oneshot_logo', {'activations': 1}),
+            ('category', 'seo', {'activations': 1}),
+        ])
+
+    def test_cancellation_removes_mrr(self):
+        rows = dict(((d, k), c) for d, k, c in _subscription_rows(BASIC, 'cancellations', revenue=-1))
+        self.assertEqual(rows[('package', 'basic')], {'cancellations': 1, 'mrr_delta': -20000})
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestAnalyticsRollups(unittest.TestCase):
+    def run_with_db(self, scenario):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from analytics import Analytics
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            try:
+                db = client[TEST_DB_NAME]
+                return await scenario(db, Analytics(db.analytics_daily, db.subscriptions, db.free_audits))
+            finally:
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        return asyncio.run(run())
+
+    async def simulate(self, db, analytics):
+        """Drive the live path and keep the source collections as the app would"""
+        now = datetime.now(timezone.utc).isoformat()
+        for audit_id in ('a1', 'a2', 'a3', 'a4'):
+            audit = {'id': audit_id, 'created_at': now}
+            await db.free_audits.insert_one(dict(audit))
+            await analytics.record_audit(audit)
+        for sub in (PREMIUM, BASIC):
+            doc = {**sub, 'status': 'pending', 'stripe_session_id': f"cs_{sub['id']}", 'created_at': now, 'updated_at': now}
+            await db.subscriptions.insert_one(dict(doc))
+            await analytics.record_checkout(doc)
+        await db.subscriptions.insert_one({**BASIC, 'id': 'sub-3', 'status': 'failed', 'created_at': now})
+        for sub in (PREMIUM, BASIC):
+            await db.subscriptions.update_one({'id': sub['id']}, {'$set': {'status': 'active', 'activated_at': now}})
+            await analytics.record_activation(sub)
+        await db.subscriptions.update_one({'id': BASIC['id']}, {'$set': {'status': 'cancelled', 'cancelled_at': now}})
+        await analytics.record_cancellation(BASIC)
+
+    def test_summary(self):
+        async def scenario(db, analytics):
+            await self.simulate(db, analytics)
+            return await analytics.summary(7)
+
+        summary = self.run_with_db(scenario)
+        self.assertEqual(summary['mrr'], 90000)
+        self.assertEqual(summary['mrr_by_package'], {'premium': 90000, 'basic': 0})
+        self.assertEqual(summary['packages']['premium']['one_time'], 65000)
+        self.assertEqual(summary['addon_attach_rates'], {'addon_seo_monthly': 0.5, 'oneshot_logo': 0.5})
+        self.assertEqual(summary['category_mix'], {'seo': 1})
+        self.assertEqual(summary['funnel'], {
+            'audits': 4, 'checkouts': 2, 'activations': 2, 'cancellations': 1,
+            'audit_to_checkout': 0.5, 'checkout_to_activation': 1.0,
+        })
+
+    def test_backfill_matches_incremental_rows(self):
+        async def scenario(db, analytics):
+            await self.simulate(db, analytics)
+            incremental = await db.analytics_daily.find().sort('_id').to_list(None)
+            rows = await analytics.backfill()
+            rebuilt = await db.analytics_daily.find().sort('_id').to_list(None)
+            return incremental, rows, rebuilt
+
+        incremental, rows, rebuilt = self.run_with_db(scenario)
+        self.assertEqual(rows, len(incremental))
+        self.assertEqual(rebuilt, incremental)
+
+
+if __name__ == '__main__':
+    unittest.main()
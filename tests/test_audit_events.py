@@ -0,0 +1,146 @@
+"""
+Tests for the in-process audit progress pub/sub (backend/audit_events.py).
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from audit_events import AuditEventBus
+
+
+async def collect(bus, key, **kwargs):
+    return [message async for message in bus.subscribe(key, **kwargs)]
+
+
+class TestAuditEventBus(unittest.TestCase):
+    def test_watchers_share_one_stream(self):
+        async def run():
+            bus = AuditEventBus()
+            watchers = [asyncio.create_task(collect(bus, 'a1')) for _ in range(3)]
+            await asyncio.sleep(0)
+            bus.publish('a1', 'stage', stage='generating')
+            bus.publish('a1', 'token', text='Ciao')
+            bus.publish('a1', 'done', score=7)
+            return await asyncio.gather(*watchers)
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 3)
+        for events in results:
+            self.assertEqual([m['event'] for m in events], ['stage', 'token', 'done'])
+            self.assertEqual(events[1]['data'], {'text': 'Ciao'})
+
+    def test_late_watcher_gets_history(self):
+        async def run():
+            bus = AuditEventBus()
+            bus.publish('a1', 'stage', stage='generating')
+            bus.publish('a1', 'token', text='uno ')
+            late = asyncio.create_task(collect(bus, 'a1'))
+            await asyncio.sleep(0)
+            bus.publish('a1', 'token', text='due')
+            bus.publish('a1', 'done')
+            after_close = await collect(bus, 'a1')
+            return await late, after_close
+
+        late, after_close = asyncio.run(run())
+        self.assertEqual([m['data'].get('text') for m in late if m['event'] == 'token'], ['uno ', 'due'])
+        self.assertEqual(late, after_close)
+
+    def test_topics_are_isolated(self):
+        async def run():
+            bus = AuditEventBus()
+            watcher = asyncio.create_task(collect(bus, 'a1'))
+            await asyncio.sleep(0)
+            bus.publish('a2', 'token', text='altro')
+            bus.publish('a1', 'error', message='x')
+            return await watcher
+
+        self.assertEqual([m['event'] for m in asyncio.run(run())], ['error'])
+
+    def test_idle_timeout_yields_none(self):
+        async def run():
+            bus = AuditEventBus()
+            async for message in bus.subscribe('a1', idle_timeout=0.01):
+                return message, bus.watchers('a1')
+
+        message, watchers = asyncio.run(run())
+        self.assertIsNone(message)
+        self.assertEqual(watchers, 1)
+
+    def test_events_after_close_are_dropped(self):
+        async def run():
+            bus = AuditEventBus()
+            bus.publish('a1', 'done')
+            bus.publish('a1', 'token', text='late')
+            return bus.history('a1')
+
+        self.assertEqual([m['event'] for m in asyncio.run(run())], ['done'])
+
+    def test_unclosed_topics_expire(self):
+        async def run():
+            bus = AuditEventBus(ttl_seconds=0.01)
+            bus.publish('a1', 'stage', stage='generating')
+            watcher = asyncio.create_task(collect(bus, 'a2', idle_timeout=0.005))
+            await asyncio.sleep(0)
+            bus.publish('a2', 'token', text='x')
+            await asyncio.sleep(0.05)
+            # a watched topic outlives its ttl
+            kept = bus.watchers('a2')
+            watcher.cancel()
+            await asyncio.sleep(0.05)
+            return bus.history('a1'), kept, bus.history('a2')
+
+        expired, kept, released = asyncio.run(run())
+        self.assertEqual(expired, [])
+        self.assertEqual(kept, 1)
+        self.assertEqual(released, [])
+
+    def test_close_ends_watchers_of_an_existing_topic(self):
+        async def run():
+            bus = AuditEventBus(retention_seconds=0.01)
+            watcher = asyncio.create_task(collect(bus, 'a1'))
+            await asyncio.sleep(0)
+            bus.close('a1', {'event': 'done', 'data': {'score': 6}})
+            bus.close('a2', {'event': 'done', 'data': {}})
+            events = await watcher
+            closed = bus.history('a1')
+            await asyncio.sleep(0.05)
+            return events, closed, bus.history('a1'), bus.history('a2')
+
+        events, closed, retained, untouched = asyncio.run(run())
+        self.assertEqual(events, [{'event': 'done', 'data': {'score': 6}}])
+        self.assertEqual(closed, events)
+        self.assertEqual((retained, untouched), ([], []))
+
+    def test_publish_text_replaces_a_broken_stream(self):
+        def watched_text(events):
+            text = ''
+            for message in events:
+                if message['event'] == 'stage' and message['data']['stage'] == 'generating':
+                    text = ''
+                elif message['event'] == 'token':
+                    text += message['data']['text']
+            return text
+
+        async def run():
+            bus = AuditEventBus()
+            watcher = asyncio.create_task(collect(bus, 'a1'))
+            await asyncio.sleep(0)
+            bus.publish('a1', 'stage', stage='generating')
+            bus.publish('a1', 'token', text='Valutazione inter')
+            # The stream broke off; the stored text is the fallback
+            bus.publish_text('a1', 'Valutazione inter', 'Valutazione di riserva')
+            bus.publish_text('a1', 'Valutazione di riserva', 'Valutazione di riserva')
+            bus.publish('a1', 'done')
+            return await watcher
+
+        events = asyncio.run(run())
+        self.assertEqual(watched_text(events), 'Valutazione di riserva')
+        self.assertEqual(len(events), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
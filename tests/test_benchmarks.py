@@ -0,0 +1,134 @@
+"""
+Tests for the peer benchmarks of marketing scores (backend/benchmarks.py).
+
+The collection tests need a reachable MongoDB and are skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from benchmarks import ScoreBenchmarks, percentile
+from fakes import FakeCollection
+from metrics import metrics
+from test_query_plans import mongo_available
+
+TEST_DB_NAME = 'arxeon_test_benchmarks'
+
+
+def random_audits(n, seed=11):
+    rng = random.Random(seed)
+    return [{
+        'id': str(i),
+        'sector': rng.choice(['consulting', 'retail', 'health']),
+        'geoArea': rng.choice(['ticino', 'romandie']),
+        'marketing_score': rng.randint(2, 9),
+    } for i in range(n)]
+
+
+class TestPercentile(unittest.TestCase):
+    def test_ties_count_half(self):
+        counts = {'3': 2, '5': 4, '8': 4}
+        self.assertEqual(percentile(counts, 10, 5), 40)   # 2 below, 4 tied
+        self.assertEqual(percentile(counts, 10, 6), 60)
+        self.assertEqual(percentile(counts, 10, 2), 0)
+        self.assertEqual(percentile(counts, 10, 10), 100)
+
+    def test_matches_sorted_scores(self):
+        scores = [random.Random(3).randint(0, 10) for _ in range(500)]
+        counts = {str(s): scores.count(s) for s in set(scores)}
+        for score in range(11):
+            below = sum(s < score for s in scores) + sum(s == score for s in scores) / 2
+            self.assertEqual(percentile(counts, len(scores), score), round(100 * below / len(scores)))
+
+
+class TestRecord(unittest.TestCase):
+    def test_retried_audit_is_counted_once(self):
+        audit = {'id': 'a1', 'sector': 'retail', 'geoArea': 'ticino', 'marketing_score': 6}
+
+        async def run():
+            audits = FakeCollection('free_audits')
+            await audits.insert_many([dict(audit), {**audit, 'id': 'a2'}])
+            benchmarks = ScoreBenchmarks(FakeCollection('score_benchmarks'), audits, min_peers=1)
+            # A generate job retried after the score was recorded
+            await asyncio.gather(*(benchmarks.record(audit) for _ in range(3)))
+            await benchmarks.record({**audit, 'id': 'a2'})
+            return audits.docs[0], await benchmarks.lookup('retail', 'ticino', 6)
+
+        duplicates = metrics.counters['benchmarks.duplicate']
+        stored, benchmark = asyncio.run(run())
+        self.assertTrue(stored['benchmark_recorded'])
+        self.assertEqual((benchmark['scope'], benchmark['peer_count']), ('sector_area', 2))
+        self.assertEqual(metrics.counters['benchmarks.duplicate'] - duplicates, 2)
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestScoreBenchmarks(unittest.TestCase):
+    def run_with_db(self, scenario, min_peers=20):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from benchmarks import ScoreBenchmarks
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            try:
+                db = client[TEST_DB_NAME]
+                return await scenario(db, ScoreBenchmarks(db.score_benchmarks, db.free_audits, min_peers=min_peers))
+            finally:
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        return asyncio.run(run())
+
+    def test_rebuild_matches_incremental(self):
+        audits = random_audits(300)
+
+        async def scenario(db, benchmarks):
+            for audit in audits:
+                await db.free_audits.insert_one(dict(audit))
+                await benchmarks.record(audit)
+            await db.free_audits.insert_one({'id': 'pending', 'sector': 'retail', 'geoArea': 'ticino'})
+            incremental = await db.score_benchmarks.find({}, {'updated_at': 0}).sort('_id').to_list(None)
+            groups = await benchmarks.rebuild(batch_size=64)
+            rebuilt = await db.score_benchmarks.find({}, {'updated_at': 0}).sort('_id').to_list(None)
+            return incremental, groups, rebuilt
+
+        incremental, groups, rebuilt = self.run_with_db(scenario)
+        # 3 x 2 pairs, 3 sectors, 2 areas and everything
+        self.assertEqual(groups, 12)
+        self.assertEqual(rebuilt, incremental)
+        everything = next(doc for doc in rebuilt if doc['_id'] == '*|*')
+        self.assertEqual(everything['total'], 300)
+
+    def test_lookup_falls_back_to_wider_groups(self):
+        audits = [{'sector': 'consulting', 'geoArea': 'ticino', 'marketing_score': s} for s in (4, 6, 8)]
+        audits += [{'sector': 'consulting', 'geoArea': 'romandie', 'marketing_score': s} for s in (2, 3, 5)]
+        audits += [{'sector': 'retail', 'geoArea': 'ticino', 'marketing_score': 9}]
+
+        async def scenario(db, benchmarks):
+            for audit in audits:
+                await benchmarks.record(audit)
+            return (
+                await benchmarks.lookup('consulting', 'ticino', 6),
+                await benchmarks.lookup('retail', 'romandie', 6),
+                await benchmarks.lookup('health', 'international', 6),
+            )
+
+        sector_area, area, everything = self.run_with_db(scenario, min_peers=3)
+        self.assertEqual(sector_area, {
+            'percentile': 50, 'scope': 'sector_area', 'sector': 'consulting', 'geoArea': 'ticino', 'peer_count': 3
+        })
+        # retail has 1 score; romandie has 3, all below 6
+        self.assertEqual((area['scope'], area['percentile'], area['peer_count']), ('area', 100, 3))
+        self.assertEqual((everything['scope'], everything['peer_count']), ('all', 7))
+        self.assertEqual(everything['percentile'], round(100 * 4.5 / 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
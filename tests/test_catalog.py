@@ -0,0 +1,82 @@
+"""
+Tests for the pre-serialised catalog responses and hot reload (backend/catalog.py).
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from catalog import Catalog, CatalogError, etag_matches
+from test_pricing import ADDONS, PACKAGES
+
+
+class TestCatalogResponses(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog(PACKAGES, ADDONS, ["sito", "seo"], max_age=60)
+
+    def test_body_and_headers(self):
+        response = self.catalog.addons_response(None)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.body), self.catalog.pricing.addons_config)
+        self.assertEqual(response.headers['cache-control'], 'public, max-age=60')
+        self.assertTrue(response.headers['etag'].startswith('"'))
+
+    def test_not_modified(self):
+        etag = self.catalog.addons_response(None).headers['etag']
+        for header in (etag, f"W/{etag}", f'"other", {etag}', '*'):
+            response = self.catalog.addons_response(header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response.body, b'')
+            self.assertEqual(response.headers['etag'], etag)
+        self.assertEqual(self.catalog.addons_response('"other"').status_code, 200)
+
+    def test_etag_matching(self):
+        self.assertFalse(etag_matches(None, '"a"'))
+        self.assertFalse(etag_matches('"ab"', '"a"'))
+        self.assertTrue(etag_matches(' "b" , W/"a"', '"a"'))
+
+
+class TestCatalogReload(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog(PACKAGES, ADDONS, ["sito", "seo"])
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+    def write(self, data):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        # Make sure the modification time moves even on coarse filesystems
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_reload_swaps_pricing_and_etag(self):
+        old_etag = self.catalog.addons_response(None).headers['etag']
+        packages = {**PACKAGES, 'basic': {**PACKAGES['basic'], 'amount': 25000}}
+        self.write({'packages': packages, 'addons': ADDONS, 'validCategories': ["sito"]})
+
+        self.assertTrue(asyncio.run(self.catalog.reload_file(self.path)))
+        self.assertEqual(self.catalog.pricing.quote('basic', []).total_monthly, 25000)
+        self.assertNotEqual(self.catalog.addons_response(None).headers['etag'], old_etag)
+        # Unchanged file: nothing to do
+        self.assertFalse(asyncio.run(self.catalog.reload_file(self.path)))
+
+    def test_invalid_catalog_keeps_current(self):
+        current = self.catalog.current
+        self.write({'packages': PACKAGES, 'addons': {'x': {'name': 'broken'}}, 'validCategories': []})
+        with self.assertRaises(CatalogError):
+            asyncio.run(self.catalog.reload_file(self.path))
+        self.write({'packages': PACKAGES})
+        with self.assertRaises(CatalogError):
+            asyncio.run(self.catalog.reload_file(self.path))
+        self.assertIs(self.catalog.current, current)
+
+
+if __name__ == '__main__':
+    unittest.main()
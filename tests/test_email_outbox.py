@@ -0,0 +1,147 @@
+"""
+Tests for the email outbox (backend/email_outbox.py).
+
+Delivery goes to a local fake Resend server (tests/fakes.py). The outbox
+tests need a reachable MongoDB and are skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from fakes import FakeResendServer
+from test_query_plans import mongo_available
+
+TEST_DB_NAME = 'arxeon_test_email_outbox'
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_respected(self):
+        from ratelimit import TokenBucket
+
+        async def run():
+            bucket = TokenBucket(rate=20, capacity=2)
+            start = time.monotonic()
+            for _ in range(6):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        # 2 tokens are available immediately, the remaining 4 take 4/20 s
+        self.assertGreaterEqual(asyncio.run(run()), 0.18)
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestEmailOutbox(unittest.TestCase):
+    def run_with_outbox(self, fake, scenario, **kwargs):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from email_outbox import EmailOutbox
+        from email_transport import ResendTransport
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            collection = client[TEST_DB_NAME].email_outbox
+            transport = ResendTransport('re_test', base_url=fake.url)
+            await transport.start()
+            try:
+                outbox = EmailOutbox(collection, transport, 'Test <noreply@example.com>',
+                                     rate_per_second=100, **kwargs)
+                return await scenario(outbox, collection)
+            finally:
+                await transport.close()
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        return asyncio.run(run())
+
+    def test_plain_emails_use_batch_endpoint(self):
+        async def scenario(outbox, collection):
+            for i in range(3):
+                await outbox.enqueue(f"user{i}@example.com", "Hello", "<p>Hi</p>")
+            self.assertEqual(await outbox.dispatch_once(), 3)
+            return await collection.count_documents({'status': 'sent'})
+
+        with FakeResendServer() as fake:
+            self.assertEqual(self.run_with_outbox(fake, scenario), 3)
+        self.assertEqual([path for path, _ in fake.requests], ['/emails/batch'])
+        self.assertEqual(len(fake.messages), 3)
+
+    def test_attachment_sent_individually(self):
+        async def scenario(outbox, collection):
+            await outbox.enqueue("a@example.com", "PDF", "<p>See attached</p>",
+                                 attachments=[{"filename": "report.pdf", "content": "JVBERi0="}])
+            await outbox.dispatch_once()
+
+        with FakeResendServer() as fake:
+            self.run_with_outbox(fake, scenario)
+        self.assertEqual([path for path, _ in fake.requests], ['/emails'])
+        self.assertEqual(fake.messages[0]['attachments'][0]['filename'], 'report.pdf')
+
+    def test_failure_is_retried(self):
+        async def scenario(outbox, collection):
+            await outbox.enqueue("a@example.com", "Retry", "<p>Hi</p>")
+            await outbox.dispatch_once()
+            first = await collection.find_one({})
+            await outbox.dispatch_once()
+            second = await collection.find_one({})
+            return first, second
+
+        with FakeResendServer() as fake:
+            fake.fail_next = 1
+            first, second = self.run_with_outbox(fake, scenario, retry_base_seconds=0)
+        self.assertEqual(first['status'], 'queued')
+        self.assertIn('last_error', first)
+        self.assertEqual(second['status'], 'sent')
+        self.assertEqual(second['attempts'], 2)
+
+    def test_rejected_message_only_fails_itself(self):
+        async def scenario(outbox, collection):
+            for to in ("a@example.com", "bad@example.com", "c@example.com"):
+                await outbox.enqueue(to, "Hello", "<p>Hi</p>")
+            await outbox.dispatch_once()
+            return {doc['message']['to'][0]: doc['status'] async for doc in collection.find({})}
+
+        with FakeResendServer() as fake:
+            fake.rejected.add("bad@example.com")
+            statuses = self.run_with_outbox(fake, scenario)
+        self.assertEqual(statuses, {'a@example.com': 'sent', 'bad@example.com': 'queued', 'c@example.com': 'sent'})
+        self.assertEqual(sorted(path for path, _ in fake.requests), ['/emails'] * 3 + ['/emails/batch'])
+
+    def test_unrecorded_delivery_is_not_retried(self):
+        async def scenario(outbox, collection):
+            async def broken(*args):
+                raise RuntimeError("write failed")
+
+            outbox._mark_sent = broken
+            for i in range(2):
+                await outbox.enqueue(f"user{i}@example.com", "Hello", "<p>Hi</p>")
+            await outbox.dispatch_once()
+            return await collection.distinct('status')
+
+        with FakeResendServer() as fake:
+            statuses = self.run_with_outbox(fake, scenario, retry_base_seconds=0)
+        # Still leased, not rescheduled
+        self.assertEqual(statuses, ['sending'])
+        self.assertEqual([path for path, _ in fake.requests], ['/emails/batch'])
+
+    def test_enqueue_with_message_id_is_idempotent(self):
+        async def scenario(outbox, collection):
+            first = await outbox.enqueue("a@example.com", "Report", "<p>Hi</p>", message_id="audit-email2:a1")
+            second = await outbox.enqueue("a@example.com", "Report", "<p>Hi</p>", message_id="audit-email2:a1")
+            await outbox.dispatch_once()
+            return first, second, await collection.count_documents({})
+
+        with FakeResendServer() as fake:
+            first, second, count = self.run_with_outbox(fake, scenario)
+        self.assertEqual((first, second, count), ("audit-email2:a1", "audit-email2:a1", 1))
+        self.assertEqual(len(fake.messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for the precompiled email templates (backend/email_templates.py).
+"""
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from email_templates import CompiledTemplate, EmailTemplateEngine, TemplateError, compile_template, inline_css
+
+
+def render(source, **context):
+    return CompiledTemplate('test', 'it', '', compile_template(source)).render(**context)
+
+
+class TestTemplateCompiler(unittest.TestCase):
+    def test_variables_are_escaped(self):
+        self.assertEqual(render("<p>{{name}}</p>", name='<script>"x"</script>'),
+                         "<p>&lt;script&gt;&quot;x&quot;&lt;/script&gt;</p>")
+
+    def test_triple_braces_are_raw(self):
+        self.assertEqual(render("{{{html}}}", html="<b>ok</b>"), "<b>ok</b>")
+
+    def test_sections(self):
+        source = "{{#items}}<li>{{.}}</li>{{/items}}{{^items}}none{{/items}}"
+        self.assertEqual(render(source, items=['a', 'b&c']), "<li>a</li><li>b&amp;c</li>")
+        self.assertEqual(render(source, items=[]), "none")
+
+    def test_unbalanced_sections_raise(self):
+        with self.assertRaises(TemplateError):
+            compile_template("{{#a}}x")
+        with self.assertRaises(TemplateError):
+            compile_template("{{#a}}x{{/b}}")
+
+
+class TestInlineCss(unittest.TestCase):
+    def test_rules_are_inlined(self):
+        source = (
+            "<html><head><style>p { color: red; } .big { font-size: 2em; } "
+            "a:hover { color: blue; }</style></head>"
+            "<body><p class=\"big\" style=\"color: green\">x</p><a href=\"#\">y</a></body></html>"
+        )
+        result = inline_css(source)
+        self.assertIn('<p class="big" style="color: green; font-size: 2em">', result)
+        self.assertIn('a:hover { color: blue; }', result)
+        self.assertNotIn('.big {', result)
+
+
+class TestEmailTemplateEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = EmailTemplateEngine()
+
+    def test_locale_fallback(self):
+        self.assertEqual(self.engine.normalize_locale('fr-CH'), 'fr')
+        self.assertEqual(self.engine.normalize_locale('de'), 'it')
+        self.assertEqual(self.engine.normalize_locale(None), 'it')
+
+    def test_every_template_renders_in_every_locale(self):
+        context = {
+            'first_name': 'Marco', 'full_name': 'Marco Rossi', 'company': 'ACME',
+            'package_name': 'Pacchetto Gold', 'included_category': '', 'has_addons': True,
+            'addons': ['SEO'], 'total_monthly': '1700', 'total_one_time': '',
+            'onboarding_url': 'https://example.com/onboarding', 'score': 6, 'level': 'Medio',
+            'services_url': 'https://example.com/servizi', 'amount': '200.00', 'package': 'Gold',
+        }
+        for (name, locale) in list(self.engine._compiled):
+            subject, html = self.engine.render(name, locale, **context)
+            self.assertTrue(subject)
+            self.assertNotIn('[[', html)
+            self.assertNotIn('{{', html)
+            self.assertIn('style="', html)
+
+    def test_user_fields_are_escaped(self):
+        _, html = self.engine.render('onboarding_received', 'it', full_name='<b>Eve</b>', company='A&B')
+        self.assertIn('Grazie &lt;b&gt;Eve&lt;/b&gt;!', html)
+        self.assertIn('A&amp;B', html)
+
+    def test_french_variant(self):
+        subject, html = self.engine.render('audit_received', 'fr', first_name='Jean')
+        it_subject, _ = self.engine.render('audit_received', 'it', first_name='Jean')
+        self.assertNotEqual(subject, it_subject)
+        self.assertIn('Jean', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,295 @@
+"""
+Tests for the email transports (backend/email_transport.py): the pooled
+Resend transport against a local fake Resend server (tests/fakes.py) and the
+SMTP transport against a local aiosmtpd server.
+"""
+
+import sys
+import os
+import asyncio
+import base64
+import socket
+import time
+import unittest
+from email import message_from_bytes
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import FakeResendServer
+from email_transport import EmailTransport, EmailTransportError, ResendTransport, SmtpTransport
+from metrics import metrics
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+except ImportError:
+    Controller = None
+
+
+def message(to):
+    return {'from': 'Test <noreply@example.com>', 'to': [to], 'subject': 'Hi', 'html': '<p>Hi</p>'}
+
+
+class TestEmailTransport(unittest.TestCase):
+    def test_send_must_be_implemented(self):
+        class Incomplete(EmailTransport):
+            async def send_batch(self, messages):
+                return []
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class TestResendTransport(unittest.TestCase):
+    def run_with_transport(self, fake, scenario, **kwargs):
+        async def run():
+            transport = ResendTransport('re_test', base_url=fake.url, **kwargs)
+            await transport.start()
+            try:
+                return await scenario(transport)
+            finally:
+                await transport.close()
+
+        return asyncio.run(run())
+
+    def test_send_and_batch(self):
+        async def scenario(transport):
+            single = await transport.send(message('a@example.com'))
+            batch = await transport.send_batch([message('b@example.com'), message('c@example.com')])
+            return single, batch
+
+        with FakeResendServer() as fake:
+            single, batch = self.run_with_transport(fake, scenario)
+        self.assertTrue(single)
+        self.assertEqual(len(batch), 2)
+        self.assertEqual([path for path, _ in fake.requests], ['/emails', '/emails/batch'])
+        self.assertEqual(fake.requests[0][1], 'Bearer re_test')
+
+    def test_sends_run_concurrently(self):
+        async def scenario(transport):
+            start = time.monotonic()
+            await asyncio.gather(*(transport.send(message(f"u{i}@example.com")) for i in range(8)))
+            return time.monotonic() - start
+
+        with FakeResendServer(latency=0.2) as fake:
+            elapsed = self.run_with_transport(fake, scenario, max_concurrency=8)
+        # 8 sequential sends would take 1.6 s
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual(len(fake.messages), 8)
+
+    def test_concurrency_cap(self):
+        async def scenario(transport):
+            start = time.monotonic()
+            await asyncio.gather(*(transport.send(message(f"u{i}@example.com")) for i in range(4)))
+            return time.monotonic() - start
+
+        with FakeResendServer(latency=0.1) as fake:
+            elapsed = self.run_with_transport(fake, scenario, max_concurrency=2)
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_errors_raise(self):
+        async def scenario(transport):
+            with self.assertRaises(EmailTransportError):
+                await transport.send(message('a@example.com'))
+
+        with FakeResendServer() as fake:
+            fake.fail_next = 1
+            self.run_with_transport(fake, scenario)
+
+    def test_send_before_start_raises(self):
+        with self.assertRaises(EmailTransportError):
+            asyncio.run(ResendTransport('re_test').send(message('a@example.com')))
+
+
+class SmtpSink:
+    """aiosmtpd handler keeping every received message with the client address it came from"""
+
+    def __init__(self):
+        self.messages = []
+        self.logins = []
+        self.rejected = set()
+        self.resets = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rejected:
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_RSET(self, server, session, envelope):
+        self.resets.append(session.peer)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.mail_from, envelope.rcpt_tos, envelope.content))
+        return '250 OK'
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        self.logins.append((auth_data.login, auth_data.password))
+        return AuthResult(success=auth_data.password == b'secret', handled=False)
+
+
+class StubConnection:
+    """Pooled aiosmtplib connection whose send fails with ``error``; RSET raises ``rset_error`` if set"""
+
+    def __init__(self, error, rset_error=None):
+        self.error = error
+        self.rset_error = rset_error
+        self.is_connected = True
+        self.resets = 0
+
+    async def send_message(self, *args, **kwargs):
+        raise self.error
+
+    async def rset(self):
+        self.resets += 1
+        if self.rset_error:
+            raise self.rset_error
+
+    def close(self):
+        self.is_connected = False
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipUnless(Controller, "aiosmtpd not installed")
+class TestSmtpTransport(unittest.TestCase):
+    def setUp(self):
+        self.port = free_port()
+        self.sink = SmtpSink()
+        self.server = self.start_server()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def start_server(self):
+        server = Controller(self.sink, hostname='127.0.0.1', port=self.port,
+                            authenticator=self.sink.authenticate, auth_require_tls=False)
+        server.start()
+        return server
+
+    def transport(self, **kwargs):
+        return SmtpTransport('127.0.0.1', self.port, username='noreply@arxeon.ch', password='secret',
+                             starttls=False, **kwargs)
+
+    def test_connections_are_reused(self):
+        async def run():
+            transport = self.transport(pool_size=2)
+            await transport.start()
+            try:
+                await transport.send_batch([message(f"u{i}@example.com") for i in range(6)])
+            finally:
+                await transport.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(self.sink.messages), 6)
+        # 6 messages over at most 2 connections, each authenticated once
+        self.assertLessEqual(len({peer for peer, *_ in self.sink.messages}), 2)
+        self.assertLessEqual(len(self.sink.logins), 2)
+        self.assertEqual(self.sink.logins[0], (b'noreply@arxeon.ch', b'secret'))
+
+    def test_pdf_attachment(self):
+        pdf = b'%PDF-1.4 test'
+        mail = {**message('a@example.com'), 'attachments': [
+            {'filename': 'valutazione-strategica.pdf', 'content': base64.b64encode(pdf).decode()}
+        ]}
+
+        async def run():
+            transport = self.transport()
+            await transport.start()
+            try:
+                return await transport.send(mail)
+            finally:
+                await transport.close()
+
+        message_id = asyncio.run(run())
+        _, mail_from, rcpt_tos, content = self.sink.messages[0]
+        self.assertEqual(mail_from, 'noreply@example.com')
+        self.assertEqual(rcpt_tos, ['a@example.com'])
+        parsed = message_from_bytes(content)
+        self.assertEqual(parsed['Message-ID'], message_id)
+        attachments = [part for part in parsed.walk() if part.get_filename()]
+        self.assertEqual(attachments[0].get_filename(), 'valutazione-strategica.pdf')
+        self.assertEqual(attachments[0].get_payload(decode=True), pdf)
+
+    def test_reconnects_after_server_restart(self):
+        async def run():
+            transport = self.transport(pool_size=1)
+            await transport.start()
+            try:
+                await transport.send(message('a@example.com'))
+                await asyncio.to_thread(self.server.stop)
+                self.server = await asyncio.to_thread(self.start_server)
+                await transport.send(message('b@example.com'))
+            finally:
+                await transport.close()
+
+        connects = metrics.counters.get('email_transport.smtp.connects', 0)
+        asyncio.run(run())
+        self.assertEqual([rcpt for _, _, rcpt, _ in self.sink.messages], [['a@example.com'], ['b@example.com']])
+        self.assertEqual(metrics.counters.get('email_transport.smtp.connects', 0) - connects, 2)
+
+    def test_connection_is_reset_after_a_rejected_message(self):
+        self.sink.rejected.add('gone@example.com')
+
+        async def run():
+            transport = self.transport(pool_size=1)
+            await transport.start()
+            try:
+                with self.assertRaises(EmailTransportError):
+                    await transport.send(message('gone@example.com'))
+                await transport.send(message('b@example.com'))
+            finally:
+                await transport.close()
+
+        connects = metrics.counters.get('email_transport.smtp.connects', 0)
+        asyncio.run(run())
+        [(peer, _, rcpt, _)] = self.sink.messages
+        self.assertEqual(rcpt, ['b@example.com'])
+        # Reset, then reused for the next message
+        self.assertIn(peer, self.sink.resets)
+        self.assertEqual(metrics.counters.get('email_transport.smtp.connects', 0) - connects, 1)
+
+    def test_failed_transaction_is_reset_before_reuse(self):
+        import aiosmtplib
+
+        async def send_on(connection):
+            transport = self.transport(pool_size=1)
+            await transport.start()
+            transport._pool.get_nowait()
+            transport._pool.put_nowait(connection)
+            with self.assertRaises(EmailTransportError):
+                await transport.send(message('a@example.com'))
+            return transport._pool.get_nowait()
+
+        rejected = aiosmtplib.SMTPResponseException(552, 'Message size exceeds limit')
+        reset = StubConnection(rejected)
+        self.assertIs(asyncio.run(send_on(reset)), reset)
+        self.assertEqual(reset.resets, 1)
+
+        broken = StubConnection(rejected, rset_error=aiosmtplib.SMTPServerDisconnected('gone'))
+        # Not returned to the pool in an unknown state
+        self.assertIsNone(asyncio.run(send_on(broken)))
+        self.assertFalse(broken.is_connected)
+
+    def test_bad_credentials_raise(self):
+        async def run():
+            transport = SmtpTransport('127.0.0.1', self.port, username='x', password='wrong', starttls=False)
+            await transport.start()
+            try:
+                await transport.send(message('a@example.com'))
+            finally:
+                await transport.close()
+
+        with self.assertRaises(EmailTransportError):
+            asyncio.run(run())
+        self.assertEqual(self.sink.messages, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
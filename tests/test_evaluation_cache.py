@@ -0,0 +1,124 @@
+"""
+Tests for the AI evaluation cache (backend/evaluation_cache.py).
+
+The cache tests need a reachable MongoDB and are skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from evaluation_cache import evaluation_cache_key
+from test_query_plans import mongo_available
+
+TEST_DB_NAME = 'arxeon_test_evaluation_cache'
+
+AUDIT = {
+    'fullName': 'Marco Rossi',
+    'email': 'marco.rossi@example.ch',
+    'companyName': 'Rossi Consulenza SA',
+    'sector': 'consulting',
+    'geoArea': 'ticino',
+    'channels': ['social', 'website'],
+    'objective': 'acquisition',
+    'budget': '500_1000',
+    'mainProblem': 'Non riesco a misurare il ritorno degli investimenti.',
+    'previousAttempts': '',
+    'improvementImportance': 4,
+}
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_normalisation(self):
+        variant = {
+            **AUDIT,
+            'companyName': '  rossi consulenza  SA ',
+            'channels': ['website', 'Social'],
+            'mainProblem': 'Non riesco a misurare\n il ritorno degli investimenti.',
+            'email': 'other@example.ch',
+        }
+        self.assertEqual(evaluation_cache_key(AUDIT), evaluation_cache_key(variant))
+
+    def test_answers_change_the_key(self):
+        self.assertNotEqual(evaluation_cache_key(AUDIT), evaluation_cache_key({**AUDIT, 'budget': 'over5000'}))
+        self.assertNotEqual(evaluation_cache_key(AUDIT), evaluation_cache_key({**AUDIT, 'improvementImportance': 5}))
+
+    def test_namespace_changes_the_key(self):
+        self.assertNotEqual(evaluation_cache_key(AUDIT, 'v1'), evaluation_cache_key(AUDIT, 'v2'))
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestEvaluationCache(unittest.TestCase):
+    def run_with_cache(self, scenario):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from evaluation_cache import EvaluationCache
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            try:
+                return await scenario(EvaluationCache(client[TEST_DB_NAME].evaluation_cache))
+            finally:
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        return asyncio.run(run())
+
+    def test_repeat_is_served_from_cache(self):
+        calls = []
+
+        async def compute(audit):
+            calls.append(audit)
+            return {'text': 'valutazione', 'score': 6, 'level': 'Medio'}
+
+        async def scenario(cache):
+            first = await cache.get_or_compute(AUDIT, compute)
+            second = await cache.get_or_compute({**AUDIT, 'email': 'again@example.ch'}, compute)
+            return first, second
+
+        first, second = self.run_with_cache(scenario)
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_duplicates_share_one_call(self):
+        calls = []
+
+        async def compute(audit):
+            calls.append(audit)
+            await asyncio.sleep(0.1)
+            return {'text': 'valutazione', 'score': 6, 'level': 'Medio'}
+
+        async def scenario(cache):
+            return await asyncio.gather(*(cache.get_or_compute(AUDIT, compute) for _ in range(3)))
+
+        results = self.run_with_cache(scenario)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({r['text'] for r in results}), 1)
+
+    def test_failures_are_not_cached(self):
+        calls = []
+
+        async def failing(audit):
+            calls.append(audit)
+            raise RuntimeError("provider down")
+
+        async def working(audit):
+            calls.append(audit)
+            return {'text': 'ok', 'score': 5, 'level': 'Medio'}
+
+        async def scenario(cache):
+            with self.assertRaises(RuntimeError):
+                await cache.get_or_compute(AUDIT, failing)
+            return await cache.get_or_compute(AUDIT, working)
+
+        self.assertEqual(self.run_with_cache(scenario)['text'], 'ok')
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
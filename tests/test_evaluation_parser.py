@@ -0,0 +1,168 @@
+"""
+Tests for the single-pass evaluation parser (backend/evaluation_parser.py).
+"""
+
+import sys
+import os
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from evaluation_parser import evaluation_level, evaluation_score, parse_evaluation
+
+PLAIN_EVALUATION = """VALUTAZIONE STRATEGICA DEL MARKETING
+
+Preparata per: Rossi & Figli
+Settore: ristorazione
+
+1. INTRODUZIONE
+
+Questa valutazione analizza la situazione marketing attuale,
+operante nel settore ristorazione.
+
+2. RISCHI PRINCIPALI
+
+Mantenere la situazione invariata potrebbe comportare:
+- Dispersione di budget
+- Perdita di opportunità
+
+3. PRIORITÀ STRATEGICHE CONSIGLIATE
+
+1. Definire una strategia chiara
+2. Misurare i risultati
+
+📊 VALUTAZIONE FINALE:
+- Livello di maturità marketing: Basso
+- Punteggio complessivo: 3/10
+- Il punteggio riflette basi fragili
+  e poca misurazione.
+
+---
+Documento riservato – uso informativo
+"""
+
+MARKDOWN_EVALUATION = """## Valutazione strategica del marketing
+
+**1. Introduzione**
+L'azienda ha una presenza **consolidata** sui social.
+
+### 2. Stato attuale
+• Sito web datato
+• Nessuna campagna attiva
+
+### 📊 Valutazione finale
+**Livello di maturità marketing:** Avanzato
+**Punteggio complessivo marketing:** 8 su 10
+Ottima base di partenza.
+"""
+
+
+class TestParseEvaluation(unittest.TestCase):
+    def test_plain_text_tree(self):
+        tree = parse_evaluation(PLAIN_EVALUATION)
+
+        self.assertEqual(tree['title'], 'VALUTAZIONE STRATEGICA DEL MARKETING')
+        self.assertEqual(tree['preamble'], [{'type': 'paragraph', 'text': 'Preparata per: Rossi & Figli Settore: ristorazione'}])
+        self.assertEqual(
+            [(s['number'], s['heading'], s['final']) for s in tree['sections']],
+            [(1, 'INTRODUZIONE', False), (2, 'RISCHI PRINCIPALI', False),
+             (3, 'PRIORITÀ STRATEGICHE CONSIGLIATE', False), (None, 'VALUTAZIONE FINALE', True)]
+        )
+        self.assertEqual(tree['sections'][0]['blocks'], [{
+            'type': 'paragraph',
+            'text': 'Questa valutazione analizza la situazione marketing attuale, operante nel settore ristorazione.'
+        }])
+        self.assertEqual(tree['sections'][1]['blocks'][1], {
+            'type': 'list', 'ordered': False, 'items': ['Dispersione di budget', 'Perdita di opportunità']
+        })
+        self.assertEqual(tree['sections'][2]['blocks'], [{
+            'type': 'list', 'ordered': True, 'items': ['Definire una strategia chiara', 'Misurare i risultati']
+        }])
+        self.assertEqual((tree['score'], tree['level']), (3, 'Basso'))
+        self.assertEqual(tree['score_explanation'], 'Il punteggio riflette basi fragili e poca misurazione.')
+        self.assertEqual(tree['footer'], ['Documento riservato – uso informativo'])
+
+    def test_markdown_tree(self):
+        tree = parse_evaluation(MARKDOWN_EVALUATION)
+
+        self.assertEqual(tree['title'], 'Valutazione strategica del marketing')
+        self.assertEqual(
+            [(s['number'], s['heading']) for s in tree['sections']],
+            [(1, 'Introduzione'), (2, 'Stato attuale'), (None, 'Valutazione finale')]
+        )
+        self.assertEqual(tree['sections'][0]['blocks'][0]['text'], "L'azienda ha una presenza consolidata sui social.")
+        self.assertEqual(tree['sections'][1]['blocks'][0]['items'], ['Sito web datato', 'Nessuna campagna attiva'])
+        self.assertEqual((tree['score'], tree['level']), (8, 'Avanzato'))
+        self.assertEqual(tree['score_explanation'], 'Ottima base di partenza.')
+
+    def test_final_block_wins_over_earlier_mentions(self):
+        tree = parse_evaluation(
+            "1. INTRODUZIONE\nUn punteggio di 9/10 è raro.\n\n"
+            "VALUTAZIONE FINALE\nPunteggio: 4/10\nLivello: Medio\n"
+        )
+        self.assertEqual((tree['score'], tree['level']), (4, 'Medio'))
+
+    def test_defaults_without_score_block(self):
+        tree = parse_evaluation("Testo libero senza struttura.")
+        self.assertEqual(tree['sections'], [])
+        self.assertEqual((evaluation_score(tree), evaluation_level(tree)), (5, 'Medio'))
+
+    def test_score_is_clamped(self):
+        self.assertEqual(parse_evaluation("Punteggio complessivo: 12/10")['score'], 10)
+
+    def test_score_with_scale_in_label(self):
+        # The label the prompt asks for carries the 0-10 scale
+        for line, score in [
+            ("Punteggio complessivo marketing (0–10): 7/10", 7),
+            ("**Punteggio complessivo marketing (0-10):** 6/10", 6),
+            ("- Punteggio complessivo marketing (0 – 10): 8 su 10", 8),
+        ]:
+            self.assertEqual(parse_evaluation(line)['score'], score, line)
+        tree = parse_evaluation("Livello di maturità marketing (Basso / Medio / Avanzato): Avanzato")
+        self.assertEqual(tree['level'], 'Avanzato')
+
+    def test_mixed_case_numbered_headings(self):
+        tree = parse_evaluation(
+            "Valutazione Strategica del Marketing\n\n"
+            "1. Introduzione personalizzata\n"
+            "Rossi & Figli opera nel settore.\n\n"
+            "2. Stato attuale – Diagnosi\n\n"
+            "- Sito datato\n\n"
+            "3. Priorità strategiche consigliate\n"
+            "1. Definire una strategia chiara\n"
+            "2. Misurare i risultati\n\n"
+            "4. Conclusione\n"
+            "1. Una sola priorità\n\n"
+            "Testo finale.\n"
+        )
+        self.assertEqual(
+            [(s['number'], s['heading']) for s in tree['sections']],
+            [(1, 'Introduzione personalizzata'), (2, 'Stato attuale – Diagnosi'),
+             (3, 'Priorità strategiche consigliate'), (4, 'Conclusione')]
+        )
+        self.assertEqual(tree['sections'][0]['blocks'], [{'type': 'paragraph', 'text': 'Rossi & Figli opera nel settore.'}])
+        self.assertEqual(tree['sections'][2]['blocks'], [{
+            'type': 'list', 'ordered': True, 'items': ['Definire una strategia chiara', 'Misurare i risultati']
+        }])
+        # Out of sequence: a one-item list, not a new section
+        self.assertEqual(tree['sections'][3]['blocks'][0], {'type': 'list', 'ordered': True, 'items': ['Una sola priorità']})
+
+    def test_pathological_input(self):
+        # Many "Punteggio" mentions without a score, all in one paragraph: the
+        # old ``Punteggio.*?(\d+)`` search backtracked over the rest of the
+        # text for each, and re-joining the paragraph per line was quadratic
+        line = 'Punteggio ' + 'x' * 5000
+        text = '\n'.join([line] * 2000)
+        start = time.perf_counter()
+        tree = parse_evaluation(text)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(tree['preamble'], [{'type': 'paragraph', 'text': ' '.join([line] * 2000)}])
+        self.assertIsNone(tree['score'])
+        # Linear parsing takes about a second here; the quadratic one took ten times that
+        self.assertLess(elapsed, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Tests for the streaming CSV/Parquet exports (backend/exports.py).
+
+Rows come from an in-memory cursor stand-in, so no database is needed.
+"""
+
+import sys
+import os
+import asyncio
+import csv
+import io
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from exports import DATASETS, ExportError, build_query, export_stream
+
+SUBSCRIPTIONS = [
+    {
+        'id': f"sub-{i}", 'created_at': f"2026-01-{i + 1:02d}T10:00:00+00:00", 'email': f"c{i}@example.ch",
+        'package': 'premium', 'addons': ['addon_seo_monthly', 'oneshot_logo'] if i % 2 else [],
+        'status': 'active', 'total_monthly': 40000 + i, 'stripe_payload': {'secret': True},
+    }
+    for i in range(7)
+]
+
+
+class FakeCursor:
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.projection = projection
+        self.batch = None
+
+    def sort(self, keys):
+        field, _ = keys[0]
+        self.docs = sorted(self.docs, key=lambda doc: doc[field])
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield {k: v for k, v in doc.items() if self.projection.get(k)}
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        bounds = query.get('created_at', {})
+        docs = [
+            doc for doc in self.docs
+            if doc['created_at'] >= bounds.get('$gte', '') and doc['created_at'] < bounds.get('$lt', '~')
+        ]
+        return FakeCursor(docs, projection)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestExports(unittest.TestCase):
+    def setUp(self):
+        self.db = {'subscriptions': FakeCollection(list(reversed(SUBSCRIPTIONS)))}
+
+    def test_csv(self):
+        chunks = asyncio.run(collect(export_stream(
+            self.db, 'subscriptions', 'csv', ['id', 'addons', 'total_monthly'], batch_size=3
+        )))
+        # One chunk per batch of 3 rows (the header goes with the first)
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual(rows[0], ['id', 'addons', 'total_monthly'])
+        self.assertEqual([row[0] for row in rows[1:]], [f"sub-{i}" for i in range(7)])
+        self.assertEqual(rows[2], ['sub-1', 'addon_seo_monthly; oneshot_logo', '40001'])
+
+    def test_csv_neutralises_formulas(self):
+        docs = [{**SUBSCRIPTIONS[0], 'id': value, 'addons': ['=HYPERLINK("x")'], 'total_monthly': -5}
+                for value in ('=1+1', '+41 91 000 00 00', '-2', '@SUM(A1)', '\tcmd', '\rcmd', 'safe=1')]
+        self.db['subscriptions'] = FakeCollection(docs)
+        chunks = asyncio.run(collect(export_stream(
+            self.db, 'subscriptions', 'csv', ['id', 'addons', 'total_monthly']
+        )))
+
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'), newline='')))[1:]
+        self.assertEqual([row[0] for row in rows],
+                         ["'=1+1", "'+41 91 000 00 00", "'-2", "'@SUM(A1)", "'\tcmd", "'\rcmd", 'safe=1'])
+        self.assertEqual({row[1] for row in rows}, {"'=HYPERLINK(\"x\")"})
+        # Numbers are not user text
+        self.assertEqual({row[2] for row in rows}, {'-5'})
+
+    def test_date_range_and_default_columns(self):
+        chunks = asyncio.run(collect(export_stream(
+            self.db, 'subscriptions', since='2026-01-02', until='2026-01-04'
+        )))
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual([row['id'] for row in rows], ['sub-1', 'sub-2'])
+        self.assertEqual(list(rows[0]), list(DATASETS['subscriptions'].columns))
+        self.assertEqual(self.db['subscriptions'].queries[-1], {'created_at': {'$gte': '2026-01-02', '$lt': '2026-01-04'}})
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        chunks = asyncio.run(collect(export_stream(
+            self.db, 'subscriptions', 'parquet', ['id', 'addons', 'total_monthly'], batch_size=3
+        )))
+        parquet = pq.ParquetFile(io.BytesIO(b''.join(chunks)))
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.column('id').to_pylist(), [f"sub-{i}" for i in range(7)])
+        self.assertEqual(table.column('addons').to_pylist()[1], ['addon_seo_monthly', 'oneshot_logo'])
+        self.assertEqual(table.column('total_monthly').to_pylist()[6], 40006)
+
+    def test_validation(self):
+        for kwargs in ({'dataset_name': 'payments'}, {'fmt': 'xlsx'}, {'columns': ['id', 'stripe_payload']}):
+            with self.assertRaises(ExportError):
+                export_stream(self.db, **{'dataset_name': 'subscriptions', **kwargs})
+
+    def test_build_query(self):
+        self.assertEqual(build_query(DATASETS['audits']), {})
+        self.assertEqual(build_query(DATASETS['audits'], since='2026-02-01'), {'created_at': {'$gte': '2026-02-01'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
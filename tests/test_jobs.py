@@ -0,0 +1,177 @@
+"""
+Tests for the durable job queue (backend/jobs.py), on the in-memory
+collection from tests/fakes.py.
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import FakeCollection
+from jobs import JobQueue, NextStage, utcnow
+
+
+def make_queue(collection=None, **kwargs):
+    return JobQueue(collection or FakeCollection('jobs'), retry_base_seconds=30, **kwargs)
+
+
+class TestJobQueue(unittest.TestCase):
+    def test_enqueue_with_job_id_is_idempotent(self):
+        async def run():
+            queue = make_queue()
+            first = await queue.enqueue('free_audit', {'audit_id': 'a1'}, stage='generate', job_id='free_audit:a1')
+            second = await queue.enqueue('free_audit', {'audit_id': 'a1'}, stage='generate', job_id='free_audit:a1')
+            return first, second, queue.collection.docs
+
+        first, second, docs = asyncio.run(run())
+        self.assertEqual((first, second), ('free_audit:a1', 'free_audit:a1'))
+        self.assertEqual(len(docs), 1)
+
+    def test_claim_is_exclusive(self):
+        async def run():
+            collection = FakeCollection('jobs')
+            workers = [make_queue(collection) for _ in range(3)]
+            await workers[0].enqueue('k', {}, job_id='j1')
+            claims = await asyncio.gather(*(worker.claim() for worker in workers))
+            return workers, claims
+
+        workers, claims = asyncio.run(run())
+        claimed = [claim for claim in claims if claim]
+        self.assertEqual(len(claimed), 1)
+        job = claimed[0]
+        self.assertEqual((job['status'], job['attempts']), ('running', 1))
+        self.assertIn(job['lease_owner'], [worker.worker_id for worker in workers])
+
+    def test_jobs_are_not_claimed_before_run_at(self):
+        async def run():
+            queue = make_queue()
+            await queue.enqueue('k', {}, delay_seconds=60)
+            return await queue.claim()
+
+        self.assertIsNone(asyncio.run(run()))
+
+    def test_expired_lease_is_reclaimed(self):
+        async def run():
+            collection = FakeCollection('jobs')
+            crashed, other = make_queue(collection), make_queue(collection)
+            await crashed.enqueue('k', {}, job_id='j1')
+            await crashed.claim()
+            while_leased = await other.claim()
+            collection.docs[0]['lease_until'] = utcnow() - timedelta(seconds=1)
+            return crashed, other, while_leased, await other.claim()
+
+        crashed, other, while_leased, reclaimed = asyncio.run(run())
+        self.assertIsNone(while_leased)
+        self.assertEqual((reclaimed['lease_owner'], reclaimed['attempts']), (other.worker_id, 2))
+
+    def test_failure_is_retried_with_backoff(self):
+        async def failing(job):
+            raise RuntimeError("provider down")
+
+        async def run():
+            queue = make_queue()
+            queue.register('k', failing)
+            await queue.enqueue('k', {}, job_id='j1')
+            retries = []
+            for _ in range(2):
+                # Skip the backoff wait
+                queue.collection.docs[0]['run_at'] = utcnow()
+                job = await queue.claim()
+                before = utcnow()
+                await queue.run_job(job)
+                doc = queue.collection.docs[0]
+                retries.append((doc['status'], doc['last_error'], (doc['run_at'] - before).total_seconds()))
+            return retries
+
+        retries = asyncio.run(run())
+        self.assertEqual([status for status, _, _ in retries], ['queued', 'queued'])
+        self.assertEqual(retries[0][1], 'provider down')
+        # retry_base_seconds * 2 ** (attempts - 1)
+        self.assertAlmostEqual(retries[0][2], 30, delta=1)
+        self.assertAlmostEqual(retries[1][2], 60, delta=1)
+
+    def test_dead_letter_after_max_attempts(self):
+        dead = []
+
+        async def failing(job):
+            raise RuntimeError("bad payload")
+
+        async def on_dead(job, error):
+            dead.append((job['_id'], str(error)))
+
+        async def run():
+            queue = make_queue(max_attempts=3)
+            queue.register('k', failing, on_dead=on_dead)
+            await queue.enqueue('k', {}, job_id='j1')
+            for _ in range(3):
+                queue.collection.docs[0]['run_at'] = utcnow()
+                await queue.run_job(await queue.claim())
+            queue.collection.docs[0]['run_at'] = utcnow()
+            return queue.collection.docs[0], await queue.claim()
+
+        doc, claim_after = asyncio.run(run())
+        self.assertEqual((doc['status'], doc['attempts']), ('dead', 3))
+        self.assertIsNone(claim_after)
+        self.assertEqual(dead, [('j1', 'bad payload')])
+
+    def test_next_stage_chaining(self):
+        seen = []
+
+        async def handler(job):
+            seen.append(job['stage'])
+            if job['stage'] == 'generate':
+                return NextStage('render_pdf')
+            if job['stage'] == 'render_pdf':
+                return NextStage('send_email', delay_seconds=300)
+            return None
+
+        async def run():
+            queue = make_queue()
+            queue.register('free_audit', handler)
+            await queue.enqueue('free_audit', {'audit_id': 'a1'}, stage='generate', job_id='j1')
+            await queue.run_job(await queue.claim())
+            after_generate = dict(queue.collection.docs[0])
+            await queue.run_job(await queue.claim())
+            after_render = dict(queue.collection.docs[0])
+            not_yet = await queue.claim()
+            queue.collection.docs[0]['run_at'] = utcnow()
+            await queue.run_job(await queue.claim())
+            return after_generate, after_render, not_yet, queue.collection.docs[0]
+
+        after_generate, after_render, not_yet, done = asyncio.run(run())
+        self.assertEqual(seen, ['generate', 'render_pdf', 'send_email'])
+        # Attempts are counted per stage
+        self.assertEqual((after_generate['stage'], after_generate['status'], after_generate['attempts']),
+                         ('render_pdf', 'queued', 0))
+        self.assertGreater((after_render['run_at'] - utcnow()).total_seconds(), 290)
+        self.assertIsNone(not_yet)
+        self.assertEqual((done['status'], done['lease_owner']), ('done', None))
+
+    def test_worker_loop_runs_jobs(self):
+        async def run():
+            finished = asyncio.Event()
+
+            async def handler(job):
+                finished.set()
+
+            queue = make_queue(poll_interval=0.01)
+            queue.register('k', handler)
+            await queue.enqueue('k', {})
+            queue.start()
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=2)
+                await asyncio.sleep(0.05)
+            finally:
+                await queue.stop()
+            return queue.collection.docs[0]['status']
+
+        self.assertEqual(asyncio.run(run()), 'done')
+
+
+if __name__ == '__main__':
+    unittest.main()
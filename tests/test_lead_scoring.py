@@ -0,0 +1,117 @@
+"""
+Tests for the vectorised lead scoring (backend/lead_scoring.py).
+
+The rescore test needs a reachable MongoDB and is skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from lead_scoring import DEFAULT_WEIGHTS, LeadScorer
+from test_query_plans import mongo_available
+
+TEST_DB_NAME = 'arxeon_test_lead_scoring'
+
+LEAD = {
+    'sector': 'consulting', 'geoArea': 'ticino', 'channels': ['social', 'website'],
+    'objective': 'acquisition', 'budget': '2000_5000', 'improvementImportance': 5,
+}
+
+
+def random_audits(n, seed=7):
+    rng = random.Random(seed)
+    w = DEFAULT_WEIGHTS
+    return [{
+        'sector': rng.choice(list(w['sector']) + ['unknown']),
+        'geoArea': rng.choice(list(w['geoArea'])),
+        'channels': rng.sample(list(w['channels']), rng.randint(0, 3)),
+        'objective': rng.choice(list(w['objective'])),
+        'budget': rng.choice(list(w['budget'])),
+        'improvementImportance': rng.randint(1, 5),
+    } for _ in range(n)]
+
+
+def reference_score(audit, w=DEFAULT_WEIGHTS):
+    """Plain-Python version of the scoring rule"""
+    total = w['bias'] + sum(w[field].get(audit.get(field), 0) for field in ('sector', 'geoArea', 'objective', 'budget'))
+    total += sum(w['channels'].get(channel, 0) for channel in set(audit.get('channels') or ()))
+    total += w['improvementImportance'] * (min(max(audit.get('improvementImportance') or 3, 1), 5) - 1) / 4
+    return min(max(round(total), 0), 100)
+
+
+class TestLeadScorer(unittest.TestCase):
+    def setUp(self):
+        self.scorer = LeadScorer()
+
+    def test_single_lead(self):
+        # 8 + 10 + 2 + 2 + 12 + 25 + 20
+        self.assertEqual(self.scorer.score(LEAD), {
+            'lead_score': 79, 'lead_tier': 'hot', 'lead_score_version': self.scorer.version
+        })
+
+    def test_batch_matches_reference(self):
+        audits = random_audits(2000)
+        scores, tiers = self.scorer.score_many(audits)
+        self.assertEqual(scores.tolist(), [reference_score(audit) for audit in audits])
+        for score, tier in zip(scores.tolist(), tiers.tolist()):
+            self.assertEqual(tier, 'hot' if score >= 65 else 'warm' if score >= 40 else 'cold')
+
+    def test_unknown_and_missing_answers(self):
+        scores, tiers = self.scorer.score_many([{}, {'sector': 'astrology', 'channels': ['carrier_pigeon']}])
+        # Only the default importance (3) counts
+        self.assertEqual(scores.tolist(), [10, 10])
+        self.assertEqual(tiers.tolist(), ['cold', 'cold'])
+
+    def test_higher_budget_scores_higher(self):
+        low = self.scorer.score({**LEAD, 'budget': 'under500'})['lead_score']
+        high = self.scorer.score({**LEAD, 'budget': 'over5000'})['lead_score']
+        self.assertGreater(high, low)
+
+    def test_version_follows_weights(self):
+        changed = LeadScorer({**DEFAULT_WEIGHTS, 'bias': 5})
+        self.assertNotEqual(changed.version, self.scorer.version)
+        self.assertEqual(LeadScorer(dict(DEFAULT_WEIGHTS)).version, self.scorer.version)
+        self.assertEqual(changed.score(LEAD)['lead_score'], 84)
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestRescore(unittest.TestCase):
+    def test_rescore_writes_back_and_skips_current(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from lead_scoring import rescore_all
+
+        audits = random_audits(250)
+        scorer = LeadScorer()
+        reweighted = LeadScorer({**DEFAULT_WEIGHTS, 'budget': {**DEFAULT_WEIGHTS['budget'], 'under500': 20}})
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            try:
+                collection = client[TEST_DB_NAME].free_audits
+                await collection.insert_many([{**audit, 'id': str(i)} for i, audit in enumerate(audits)])
+                first = await rescore_all(collection, scorer, batch_size=100)
+                again = await rescore_all(collection, scorer, batch_size=100)
+                after_change = await rescore_all(collection, reweighted, batch_size=100)
+                docs = await collection.find({}, {'_id': 0}).to_list(None)
+                return first, again, after_change, sorted(docs, key=lambda doc: int(doc['id']))
+            finally:
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        first, again, after_change, docs = asyncio.run(run())
+        self.assertEqual((first, again, after_change), (250, 0, 250))
+        expected = reweighted.score_many(audits)[0].tolist()
+        self.assertEqual([doc['lead_score'] for doc in docs], expected)
+        self.assertEqual({doc['lead_score_version'] for doc in docs}, {reweighted.version})
+
+
+if __name__ == '__main__':
+    unittest.main()
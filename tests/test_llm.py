@@ -0,0 +1,270 @@
+"""
+Tests for the LLM call governor, the hedged provider router and the
+OpenAI-compatible HTTP client (backend/llm.py). Providers are in-process
+fakes (tests/fakes.py); HTTP calls go to an httpx mock transport.
+"""
+
+import sys
+import os
+import asyncio
+import time
+import json
+import unittest
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import FakeLlmProvider
+from llm import HedgedLlm, HttpLlmClient, LlmError, LlmGovernor, estimate_tokens
+from metrics import metrics
+
+
+class TestLlmGovernor(unittest.TestCase):
+    def test_concurrency_is_capped_and_callers_queue(self):
+        active = []
+        peak = []
+
+        async def call(i):
+            active.append(i)
+            peak.append(len(active))
+            await asyncio.sleep(0.05)
+            active.remove(i)
+            return i
+
+        async def run():
+            governor = LlmGovernor('capped', max_concurrency=3, requests_per_minute=6000, tokens_per_minute=10 ** 6)
+            return await asyncio.gather(*(governor.run(call, i, estimated_tokens=10) for i in range(10)))
+
+        self.assertEqual(asyncio.run(run()), list(range(10)))
+        self.assertEqual(max(peak), 3)
+        self.assertEqual(metrics.gauges['llm.capped.in_flight'], 0)
+        self.assertEqual(metrics.gauges['llm.capped.queued'], 0)
+
+    def test_governors_publish_separate_gauges(self):
+        async def run():
+            release = asyncio.Event()
+            busy = LlmGovernor('busy', max_concurrency=1, requests_per_minute=6000, tokens_per_minute=10 ** 6)
+            idle = LlmGovernor('idle', max_concurrency=1, requests_per_minute=6000, tokens_per_minute=10 ** 6)
+            tasks = [asyncio.create_task(busy.run(release.wait, estimated_tokens=10)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            await idle.run(asyncio.sleep, 0, estimated_tokens=10)
+            gauges = {name: metrics.gauges[name] for name in (
+                'llm.busy.in_flight', 'llm.busy.queued', 'llm.idle.in_flight', 'llm.idle.queued'
+            )}
+            release.set()
+            await asyncio.gather(*tasks)
+            return gauges
+
+        self.assertEqual(asyncio.run(run()), {
+            'llm.busy.in_flight': 1, 'llm.busy.queued': 2, 'llm.idle.in_flight': 0, 'llm.idle.queued': 0
+        })
+
+    def test_callers_are_served_in_arrival_order(self):
+        order = []
+
+        async def call(i):
+            order.append(i)
+            await asyncio.sleep(0.01)
+
+        async def run():
+            governor = LlmGovernor(max_concurrency=1, requests_per_minute=6000, tokens_per_minute=10 ** 6)
+            tasks = []
+            for i in range(5):
+                tasks.append(asyncio.create_task(governor.run(call, i, estimated_tokens=10)))
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_tokens_per_minute_paces_calls(self):
+        async def call():
+            return 'ok'
+
+        async def run():
+            # 6000 tokens/min: a burst of 6000, then 100 tokens/s
+            governor = LlmGovernor(max_concurrency=10, requests_per_minute=6000, tokens_per_minute=6000)
+            await governor.run(call, estimated_tokens=3000)
+            await governor.run(call, estimated_tokens=3000)
+            start = time.monotonic()
+            await governor.run(call, estimated_tokens=20)
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.15)
+
+    def test_failures_release_the_slot(self):
+        async def failing():
+            raise RuntimeError("rate limited")
+
+        async def run():
+            governor = LlmGovernor(max_concurrency=1, requests_per_minute=6000, tokens_per_minute=10 ** 6)
+            for _ in range(3):
+                with self.assertRaises(RuntimeError):
+                    await governor.run(failing, estimated_tokens=10)
+            return governor
+
+        governor = asyncio.run(run())
+        self.assertEqual((governor.in_flight, governor.queued), (0, 0))
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens('a' * 400), 101)
+
+
+class TestHedgedLlm(unittest.TestCase):
+    def test_fast_primary_is_not_hedged(self):
+        primary = FakeLlmProvider('primary', latency=0.01)
+        secondary = FakeLlmProvider('secondary', latency=0.01)
+        router = HedgedLlm([primary, secondary], hedge_delay_seconds=0.5)
+
+        self.assertEqual(asyncio.run(router.complete('prompt')), 'Valutazione da primary')
+        self.assertEqual(secondary.calls, 0)
+
+    def test_slow_primary_is_hedged(self):
+        primary = FakeLlmProvider('primary', latency=2)
+        secondary = FakeLlmProvider('secondary', latency=0.05)
+        router = HedgedLlm([primary, secondary], hedge_delay_seconds=0.1, min_hedge_delay_seconds=0)
+
+        start = time.monotonic()
+        result = asyncio.run(router.complete('prompt'))
+        self.assertEqual(result, 'Valutazione da secondary')
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(primary.cancelled, 1)
+
+    def test_hedge_delay_follows_rolling_p95(self):
+        primary = FakeLlmProvider('primary', latency=0.02)
+        secondary = FakeLlmProvider('secondary', latency=0.01)
+        router = HedgedLlm([primary, secondary], hedge_delay_seconds=10, min_hedge_delay_seconds=0, min_samples=5)
+
+        async def run():
+            for _ in range(5):
+                await router.complete('prompt')
+            # p95 is now ~20 ms, so a primary stuck for 1 s is hedged long before the 10 s default
+            primary.latency = 1
+            start = time.monotonic()
+            result = await router.complete('prompt')
+            return result, time.monotonic() - start
+
+        result, elapsed = asyncio.run(run())
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(result, 'Valutazione da secondary')
+
+    def test_faster_provider_is_preferred(self):
+        slow = FakeLlmProvider('slow', latency=0.05)
+        fast = FakeLlmProvider('fast', latency=0.005)
+        router = HedgedLlm([slow, fast], hedge_delay_seconds=10, min_samples=3)
+        for _ in range(3):
+            router.stats['slow'].observe(0.05)
+            router.stats['fast'].observe(0.005)
+
+        self.assertEqual([provider.name for provider in router.ranked()], ['fast', 'slow'])
+
+    def test_failure_fails_over_immediately(self):
+        primary = FakeLlmProvider('primary', fail=True)
+        secondary = FakeLlmProvider('secondary', latency=0.01)
+        router = HedgedLlm([primary, secondary], hedge_delay_seconds=10)
+
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(router.complete('prompt')), 'Valutazione da secondary')
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_deadline(self):
+        router = HedgedLlm([FakeLlmProvider('a', latency=5), FakeLlmProvider('b', latency=5)],
+                           deadline_seconds=0.2, hedge_delay_seconds=0.05, min_hedge_delay_seconds=0)
+        start = time.monotonic()
+        with self.assertRaises(LlmError):
+            asyncio.run(router.complete('prompt'))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_stream_comes_from_the_winner_only(self):
+        slow = FakeLlmProvider('slow', latency=1, text="uno due tre")
+        fast = FakeLlmProvider('fast', latency=0.01, text="quattro cinque sei", chunk_delay=0.01)
+        router = HedgedLlm([slow, fast], hedge_delay_seconds=0.05, min_hedge_delay_seconds=0)
+
+        async def run():
+            return [chunk async for chunk in router.stream('prompt')]
+
+        self.assertEqual(asyncio.run(run()), ['quattro ', 'cinque ', 'sei'])
+        self.assertEqual(slow.cancelled, 1)
+
+    def test_all_providers_failing(self):
+        router = HedgedLlm([FakeLlmProvider('a', fail=True), FakeLlmProvider('b', fail=True)])
+        with self.assertRaises(LlmError):
+            asyncio.run(router.complete('prompt'))
+
+
+class TestHttpLlmClient(unittest.TestCase):
+    def complete(self, handler):
+        client = HttpLlmClient('sk-test', 'http://llm.local/v1/', 'openai', 'gpt-4o', system_message='Sistema',
+                               transport=httpx.MockTransport(handler))
+
+        async def run():
+            try:
+                return await client.complete('Valuta questa azienda')
+            finally:
+                await client.close()
+
+        return asyncio.run(run())
+
+    def test_chat_completion(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={'choices': [{'message': {'role': 'assistant', 'content': 'Valutazione'}}]})
+
+        self.assertEqual(self.complete(handler), 'Valutazione')
+        self.assertEqual(str(requests[0].url), 'http://llm.local/v1/chat/completions')
+        self.assertEqual(requests[0].headers['Authorization'], 'Bearer sk-test')
+        body = json.loads(requests[0].content)
+        self.assertEqual(body['model'], 'gpt-4o')
+        self.assertEqual(body['messages'], [
+            {'role': 'system', 'content': 'Sistema'},
+            {'role': 'user', 'content': 'Valuta questa azienda'},
+        ])
+
+    def test_error_status_raises(self):
+        with self.assertRaises(LlmError):
+            self.complete(lambda request: httpx.Response(429, json={'error': {'message': 'rate limited'}}))
+
+    def test_stream_yields_deltas(self):
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            events = [{'choices': [{'delta': {'role': 'assistant'}}]}]
+            events += [{'choices': [{'delta': {'content': text}}]} for text in ('Valuta', 'zione', ' finale')]
+            body = ''.join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+            return httpx.Response(200, text=body, headers={'Content-Type': 'text/event-stream'})
+
+        governor = LlmGovernor('stream', max_concurrency=1, requests_per_minute=6000, tokens_per_minute=10 ** 6)
+        client = HttpLlmClient('sk-test', 'http://llm.local/v1', 'openai', 'gpt-4o', system_message='Sistema',
+                               governor=governor, transport=httpx.MockTransport(handler))
+
+        async def run():
+            try:
+                return [chunk async for chunk in client.stream('Valuta questa azienda')]
+            finally:
+                await client.close()
+
+        self.assertEqual(asyncio.run(run()), ['Valuta', 'zione', ' finale'])
+        self.assertTrue(requests[0]['stream'])
+        self.assertEqual((governor.in_flight, governor.queued), (0, 0))
+
+    def test_stream_error_status_raises(self):
+        client = HttpLlmClient('sk-test', 'http://llm.local/v1', 'openai', 'gpt-4o', system_message='Sistema',
+                               transport=httpx.MockTransport(lambda request: httpx.Response(503, text='busy')))
+
+        async def run():
+            try:
+                return [chunk async for chunk in client.stream('x')]
+            finally:
+                await client.close()
+
+        with self.assertRaisesRegex(LlmError, '503'):
+            asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
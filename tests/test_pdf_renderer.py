@@ -0,0 +1,146 @@
+"""
+Tests for the PDF render pool and its plain-text fallback (backend/pdf_renderer.py).
+
+The pool tests swap the process pool for threads so a blocking render can be
+patched in.
+"""
+
+import sys
+import os
+import re
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import pdf_renderer
+from evaluation_parser import parse_evaluation
+from pdf_renderer import PdfRenderService, text_pdf
+
+AUDIT = {
+    'companyName': 'Rossi & Figli',
+    'evaluation_text': "1. INTRODUZIONE\nQuesta valutazione (sintetica) analizza il marketing.\n\nPunteggio: 6/10",
+}
+
+
+def check_pdf(test: unittest.TestCase, data: bytes):
+    """The xref table points at every object and startxref at the table"""
+    test.assertTrue(data.startswith(b'%PDF-'))
+    test.assertTrue(data.endswith(b'%%EOF\n'))
+    xref = int(re.search(rb'startxref\n(\d+)\n', data).group(1))
+    test.assertTrue(data[xref:].startswith(b'xref\n'))
+    count = int(re.match(rb'xref\n0 (\d+)\n', data[xref:]).group(1))
+    offsets = re.findall(rb'(\d{10}) 00000 n \n', data[xref:])
+    test.assertEqual(len(offsets), count - 1)
+    for number, offset in enumerate(offsets, 1):
+        test.assertTrue(data[int(offset):].startswith(b'%d 0 obj\n' % number), number)
+    for length, stream in re.findall(rb'<< /Length (\d+) >>\nstream\n(.*?)\nendstream', data, re.DOTALL):
+        test.assertEqual(int(length), len(stream))
+
+
+class TestTextPdf(unittest.TestCase):
+    def test_structure(self):
+        data = text_pdf("Arxéon – Valutazione\n\nCosti (stimati) in \\ CHF")
+        check_pdf(self, data)
+        self.assertIn(b'(Arx\xe9on \x96 Valutazione) Tj', data)
+        self.assertIn(b'(Costi \\(stimati\\) in \\\\ CHF) Tj', data)
+
+    def test_long_text_is_wrapped_and_paged(self):
+        data = text_pdf('\n'.join(['parola ' * 40] * 50), width=80, lines_per_page=60)
+        check_pdf(self, data)
+        # 50 paragraphs of 280 characters, 4 lines each
+        self.assertIn(b'/Count 4', data)
+        self.assertEqual(data.count(b') Tj T*'), 200)
+
+
+class TestPdfRenderService(unittest.TestCase):
+    def make_service(self, **kwargs):
+        service = PdfRenderService(**kwargs)
+        service._executor = ThreadPoolExecutor(max_workers=service.workers)
+        self.addCleanup(service.shutdown)
+        return service
+
+    def test_renders_in_pool(self):
+        async def run():
+            service = self.make_service()
+            return await service.render(parse_evaluation(AUDIT['evaluation_text']), AUDIT), service.fallbacks
+
+        data, fallbacks = asyncio.run(run())
+        self.assertTrue(data.startswith(b'%PDF-'))
+        self.assertEqual(fallbacks, 0)
+
+    def test_timeout_falls_back_and_keeps_the_slot(self):
+        release = threading.Event()
+
+        def blocked_render(*args):
+            release.wait(5)
+            return b'%PDF-late'
+
+        async def run():
+            service = self.make_service(workers=1, queue_depth=0, timeout=0.1)
+            data = await service.render({}, AUDIT)
+            # The worker is still busy with the abandoned render
+            busy = service._slots.locked()
+            saturated = await service.render({}, AUDIT)
+            release.set()
+            for _ in range(50):
+                if not service._slots.locked():
+                    break
+                await asyncio.sleep(0.01)
+            return data, busy, saturated, service._slots.locked(), service.fallbacks
+
+        with mock.patch.object(pdf_renderer, 'render_pdf', blocked_render):
+            data, busy, saturated, still_locked, fallbacks = asyncio.run(run())
+        check_pdf(self, data)
+        self.assertIn(b'(Preparata per: Rossi & Figli) Tj', data)
+        self.assertIn(b'(Questa valutazione \\(sintetica\\) analizza il marketing.) Tj', data)
+        self.assertTrue(busy)
+        check_pdf(self, saturated)
+        self.assertFalse(still_locked)
+        self.assertEqual(fallbacks, 2)
+
+    def test_render_error_falls_back(self):
+        def failing_render(*args):
+            raise ValueError("bad paragraph markup")
+
+        async def run():
+            service = self.make_service()
+            return await service.render({}, AUDIT, benchmark="Posizionamento: 70° percentile"), service
+
+        with mock.patch.object(pdf_renderer, 'render_pdf', failing_render):
+            data, service = asyncio.run(run())
+        check_pdf(self, data)
+        self.assertIn(b'(Posizionamento: 70\xb0 percentile) Tj', data)
+        self.assertEqual((service.fallbacks, service._slots.locked()), (1, False))
+
+    def test_queue_bound(self):
+        release = threading.Event()
+        started = []
+
+        def blocked_render(*args):
+            started.append(args[1])
+            release.wait(5)
+            return b'%PDF-rendered'
+
+        async def run():
+            service = self.make_service(workers=1, queue_depth=2, timeout=5)
+            accepted = [asyncio.create_task(service.render({}, {**AUDIT, 'companyName': str(i)})) for i in range(3)]
+            await asyncio.sleep(0.05)
+            # Three slots taken: the fourth render does not wait
+            rejected = await service.render({}, AUDIT)
+            release.set()
+            return await asyncio.gather(*accepted), rejected, service.fallbacks
+
+        with mock.patch.object(pdf_renderer, 'render_pdf', blocked_render):
+            accepted, rejected, fallbacks = asyncio.run(run())
+        self.assertEqual(accepted, [b'%PDF-rendered'] * 3)
+        self.assertEqual(started, ['0', '1', '2'])
+        check_pdf(self, rejected)
+        self.assertEqual(fallbacks, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
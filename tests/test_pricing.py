@@ -0,0 +1,98 @@
+"""
+Tests for the precomputed bundle pricing engine (backend/pricing.py).
+"""
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from pricing import PricingEngine, PricingError
+
+PACKAGES = {
+    "basic": {"price_id": "price_basic", "name": "Pacchetto Basic", "amount": 20000},
+    "premium": {"price_id": "price_premium", "name": "Pacchetto Premium", "amount": 40000},
+}
+
+ADDONS = {
+    "addon_seo_monthly": {
+        "price_id": "price_seo", "name": "Ottimizzazione SEO", "amount": 50000,
+        "type": "recurring", "allowed_packages": ["premium"]
+    },
+    "addon_gmb_monthly": {
+        "price_id": "price_gmb", "name": "Google My Business (mensile)", "amount": 10000,
+        "type": "recurring", "allowed_packages": ["basic", "premium"]
+    },
+    "oneshot_logo": {
+        "price_id": "price_logo", "name": "Creazione logo", "amount": 65000,
+        "type": "one_time", "allowed_packages": ["basic", "premium"]
+    },
+}
+
+
+class TestPricingEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = PricingEngine(PACKAGES, ADDONS, ["sito", "seo"])
+
+    def test_package_only(self):
+        bundle = self.engine.quote("basic", [])
+        self.assertEqual(bundle.addons, ())
+        self.assertEqual(bundle.total_monthly, 20000)
+        self.assertEqual(bundle.total_one_time, 0)
+        self.assertFalse(bundle.has_one_time)
+        self.assertEqual(len(bundle.line_items), 1)
+        self.assertEqual(bundle.line_items[0]['price_data']['recurring'], {'interval': 'month'})
+
+    def test_totals_and_line_item_order(self):
+        bundle = self.engine.quote("premium", ["oneshot_logo", "addon_seo_monthly"])
+        self.assertEqual(bundle.total_monthly, 90000)
+        self.assertEqual(bundle.total_one_time, 65000)
+        self.assertTrue(bundle.has_one_time)
+        names = [item['price_data']['product_data']['name'] for item in bundle.line_items]
+        self.assertEqual(names, ["Pacchetto Premium", "Ottimizzazione SEO", "Creazione logo"])
+        self.assertNotIn('recurring', bundle.line_items[-1]['price_data'])
+
+    def test_same_bundle_is_cached(self):
+        first = self.engine.quote("premium", ["addon_seo_monthly", "oneshot_logo"])
+        second = self.engine.quote("premium", ["oneshot_logo", "addon_seo_monthly", "oneshot_logo"])
+        self.assertIs(first, second)
+
+    def test_large_catalog_is_priced_lazily(self):
+        addons = {
+            f"addon_{i}": {"price_id": f"price_{i}", "name": f"Extra {i}", "amount": 1000 * (i + 1),
+                           "type": "recurring", "allowed_packages": ["basic", "premium"]}
+            for i in range(40)
+        }
+        engine = PricingEngine(PACKAGES, addons, [], max_cached_bundles=2)
+        self.assertEqual(engine.quote("basic", ["addon_39", "addon_0"]).total_monthly, 20000 + 1000 + 40000)
+        engine.quote("basic", ["addon_1"])
+        engine.quote("basic", ["addon_2"])
+        self.assertEqual(len(engine._bundles), 2)
+        self.assertEqual(engine.quote("basic", ["addon_2"]).addons, ("addon_2",))
+
+    def test_invalid_addon(self):
+        with self.assertRaisesRegex(PricingError, "Invalid addon code"):
+            self.engine.quote("basic", ["nope"])
+
+    def test_addon_not_allowed(self):
+        with self.assertRaisesRegex(PricingError, "not allowed for package 'basic'"):
+            self.engine.quote("basic", ["addon_seo_monthly"])
+
+    def test_invalid_package(self):
+        with self.assertRaises(PricingError):
+            self.engine.quote("gold", [])
+
+    def test_addons_config(self):
+        config = self.engine.addons_config
+        self.assertEqual([a['code'] for a in config['addons']['basic']], ["addon_gmb_monthly", "oneshot_logo"])
+        self.assertEqual(config['packages']['premium'], {"name": "Pacchetto Premium", "amount": 40000})
+        self.assertNotIn('price_id', str(config))
+
+    def test_summary_lines(self):
+        lines = self.engine.summary_lines(["addon_gmb_monthly", "oneshot_logo", "unknown"])
+        self.assertEqual(lines, ["Google My Business (mensile) - CHF 100/mese", "Creazione logo - CHF 650 (una tantum)"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Query-plan checks for the MongoDB indexes declared in backend/indexes.py.
+
+Creates the declared indexes in a scratch database, explains every query shape
+used by the endpoints and workers, and fails if any of them does a COLLSCAN.
+Requires a reachable MongoDB (MONGO_URL, default mongodb://localhost:27017);
+the test is skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'arxeon_test')
+
+TEST_DB_NAME = 'arxeon_test_query_plans'
+
+
+def mongo_available() -> bool:
+    from pymongo import MongoClient
+    try:
+        MongoClient(os.environ['MONGO_URL'], serverSelectionTimeoutMS=1000).admin.command('ping')
+        return True
+    except Exception:
+        return False
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestQueryPlans(unittest.TestCase):
+    def test_no_collscan(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from indexes import IndexManager, QUERY_SHAPES
+        import server
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            db = client[TEST_DB_NAME]
+            try:
+                manager = IndexManager(db)
+                manager.indexes = server.index_manager.indexes
+                await manager.ensure_all()
+                # Running twice must be a no-op
+                await manager.ensure_all()
+                return await manager.verify_query_plans(QUERY_SHAPES)
+            finally:
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        collscans = asyncio.run(run())
+        self.assertEqual(collscans, [], f"Query shapes doing a COLLSCAN: {collscans}")
+
+
+if __name__ == '__main__':
+    unittest.main()
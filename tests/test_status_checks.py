@@ -0,0 +1,67 @@
+"""
+Tests for keyset pagination of status checks (backend/repository.py).
+
+The paging tests need a reachable MongoDB and are skipped otherwise.
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from repository import decode_status_cursor, encode_status_cursor
+from test_query_plans import mongo_available
+
+TEST_DB_NAME = 'arxeon_test_status_checks'
+
+
+class TestStatusCursor(unittest.TestCase):
+    def test_round_trip(self):
+        check = {'id': 'b6f1', 'timestamp': '2026-01-05T10:00:00.123456+00:00'}
+        self.assertEqual(decode_status_cursor(encode_status_cursor(check)), (check['timestamp'], check['id']))
+
+    def test_invalid(self):
+        for after in ('', 'no-comma', ',id', 'timestamp,'):
+            with self.assertRaises(ValueError):
+                decode_status_cursor(after)
+
+
+@unittest.skipUnless(mongo_available(), "MongoDB not reachable")
+class TestStatusCheckPages(unittest.TestCase):
+    def test_pages_cover_every_row_once(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from repository import StatusCheckRepository
+
+        async def run():
+            client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+            try:
+                collection = client[TEST_DB_NAME].status_checks
+                # Several rows share a timestamp so the id tie-breaker matters
+                await collection.insert_many([
+                    {'id': f"id-{i:02d}", 'client_name': f"c{i}", 'timestamp': f"2026-01-05T10:00:0{i // 3}+00:00"}
+                    for i in reversed(range(10))
+                ])
+                repo = StatusCheckRepository(collection)
+                pages, after = [], None
+                while True:
+                    page = await repo.page(after, limit=4).to_list(None)
+                    pages.append([check['id'] for check in page])
+                    if len(page) < 4:
+                        return pages
+                    after = decode_status_cursor(encode_status_cursor(page[-1]))
+            finally:
+                await client.drop_database(TEST_DB_NAME)
+                client.close()
+
+        pages = asyncio.run(run())
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual(sum(pages, []), [f"id-{i:02d}" for i in range(10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests for the long-poll notification registry (backend/status_notifier.py).
+"""
+
+import sys
+import os
+import asyncio
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from status_notifier import StatusNotifier
+
+
+class FakeStore:
+    """A document with a version counter, updated like the repositories do"""
+
+    def __init__(self, notifier, key):
+        self.notifier = notifier
+        self.key = key
+        self.doc = {'id': 'a1', 'status': 'pending', 'version': 0}
+        self.reads = 0
+
+    async def read(self):
+        self.reads += 1
+        return dict(self.doc)
+
+    def update(self, **fields):
+        self.doc.update(fields, version=self.doc['version'] + 1)
+        self.notifier.notify(self.key)
+
+
+class FakeChangeStream:
+    def __init__(self, changes, error):
+        self.changes = changes
+        self.error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.changes:
+            change = self.changes.pop(0)
+            self.resume_token = change['_id']
+            return change
+        raise self.error
+
+
+class FakeWatchedCollection:
+    """Plays one (changes, error) script per watch() call, then idles"""
+
+    name = 'free_audits'
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.watches = []
+
+    def watch(self, pipeline, **kwargs):
+        self.watches.append(kwargs)
+        if not self.scripts:
+            return FakeChangeStream([], asyncio.CancelledError())
+        changes, error = self.scripts.pop(0)
+        return FakeChangeStream(list(changes), error)
+
+
+def change(token, audit_id):
+    return {'_id': token, 'fullDocument': {'id': audit_id}}
+
+
+class TestStatusNotifier(unittest.TestCase):
+    def test_without_since_returns_immediately(self):
+        async def run():
+            notifier = StatusNotifier()
+            store = FakeStore(notifier, 'audit:a1')
+            return await notifier.wait_for_change('audit:a1', store.read, None, timeout=5)
+
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(run())['version'], 0)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_newer_version_returns_immediately(self):
+        async def run():
+            notifier = StatusNotifier()
+            store = FakeStore(notifier, 'audit:a1')
+            store.update(status='generated')
+            return await notifier.wait_for_change('audit:a1', store.read, 0, timeout=5)
+
+        self.assertEqual(asyncio.run(run())['status'], 'generated')
+
+    def test_wakes_on_change(self):
+        async def run():
+            notifier = StatusNotifier()
+            store = FakeStore(notifier, 'audit:a1')
+            waiters = [
+                asyncio.create_task(notifier.wait_for_change('audit:a1', store.read, 0, timeout=5))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            start = time.monotonic()
+            store.update(status='completed')
+            results = await asyncio.gather(*waiters)
+            return results, time.monotonic() - start, store.reads, notifier
+
+        results, elapsed, reads, notifier = asyncio.run(run())
+        self.assertEqual([doc['status'] for doc in results], ['completed'] * 3)
+        self.assertLess(elapsed, 0.5)
+        # One read to register and one after the wake-up, per waiter
+        self.assertEqual(reads, 6)
+        self.assertEqual(notifier._slots, {})
+
+    def test_other_keys_do_not_wake(self):
+        async def run():
+            notifier = StatusNotifier()
+            store = FakeStore(notifier, 'audit:a1')
+            waiter = asyncio.create_task(notifier.wait_for_change('audit:a1', store.read, 0, timeout=0.2))
+            await asyncio.sleep(0.05)
+            notifier.notify('audit:a2')
+            return await waiter, store.reads
+
+        doc, reads = asyncio.run(run())
+        self.assertEqual(doc['version'], 0)
+        # The registering read and the final one when the wait expires
+        self.assertEqual(reads, 2)
+
+    def test_timeout_returns_current_state(self):
+        async def run():
+            notifier = StatusNotifier()
+            store = FakeStore(notifier, 'audit:a1')
+            start = time.monotonic()
+            doc = await notifier.wait_for_change('audit:a1', store.read, 0, timeout=0.1)
+            return doc, time.monotonic() - start, notifier
+
+        doc, elapsed, notifier = asyncio.run(run())
+        self.assertEqual(doc['version'], 0)
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertEqual(notifier._slots, {})
+
+    def test_missing_document(self):
+        async def run():
+            async def read():
+                return None
+            return await StatusNotifier().wait_for_change('audit:x', read, 0, timeout=5)
+
+        self.assertIsNone(asyncio.run(run()))
+
+    def test_follow_resumes_after_transient_errors(self):
+        async def run():
+            notifier = StatusNotifier(retry_base_seconds=0.001)
+            collection = FakeWatchedCollection([
+                ([change('t1', 'a1')], AutoReconnect('stepdown')),
+                ([], AutoReconnect('still down')),
+                ([change('t2', 'a2')], asyncio.CancelledError()),
+            ])
+            woken = []
+            notifier.notify = woken.append
+            notifier.follow(collection, 'audit')
+            await asyncio.gather(*notifier._tasks, return_exceptions=True)
+            return woken, collection.watches
+
+        woken, watches = asyncio.run(run())
+        self.assertEqual(woken, ['audit:a1', 'audit:a2'])
+        self.assertEqual([w['resume_after'] for w in watches], [None, 't1', 't1'])
+
+    def test_follow_stops_without_replica_set(self):
+        async def run():
+            notifier = StatusNotifier(retry_base_seconds=0.001)
+            collection = FakeWatchedCollection([([], OperationFailure('not a replica set', 40573))])
+            notifier.follow(collection, 'audit')
+            return await asyncio.gather(*notifier._tasks), collection.watches
+
+        results, watches = asyncio.run(run())
+        self.assertEqual(results, [None])
+        self.assertEqual(len(watches), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Tests for the Stripe webhook inbox (backend/stripe_events.py), on the
+in-memory collections from tests/fakes.py.
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import stripe_events
+from fakes import FakeDatabase
+from indexes import IndexManager
+from metrics import Metrics
+from stripe_events import StripeEventConsumer, utcnow
+
+
+def event(event_id, subscription, created, event_type='invoice.paid'):
+    return {
+        'id': event_id,
+        'type': event_type,
+        'created': created,
+        'data': {'object': {'object': 'invoice', 'subscription': subscription}},
+    }
+
+
+class TestStripeEventConsumer(unittest.TestCase):
+    def setUp(self):
+        self.handled = []
+        self.failures = {}
+        self.metrics = Metrics()
+        patcher = mock.patch.object(stripe_events, 'metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def handler(self, payload):
+        await asyncio.sleep(0)
+        if self.failures.get(payload['id'], 0) > 0:
+            self.failures[payload['id']] -= 1
+            raise RuntimeError(f"cannot apply {payload['id']}")
+        self.handled.append(payload['id'])
+
+    async def make_consumer(self, **kwargs):
+        db = FakeDatabase()
+        consumer = StripeEventConsumer(db.stripe_events, db.stripe_event_locks, self.handler, **kwargs)
+        await db.stripe_events.create_indexes(consumer.index_models())
+        return db, consumer
+
+    def status(self, db, event_id):
+        return next(doc for doc in db.stripe_events.docs if doc['event_id'] == event_id)
+
+    def test_redelivered_event_short_circuits(self):
+        async def run():
+            db, consumer = await self.make_consumer()
+            first = await consumer.record(event('evt_1', 'sub_a', 1))
+            redelivered = await consumer.record(event('evt_1', 'sub_a', 1))
+            rate_before_processing = self.metrics.gauges['stripe_events.duplicate_rate']
+            await consumer.process_batch()
+            # Stripe retries again after we processed it
+            late = await consumer.record(event('evt_1', 'sub_a', 1))
+            await consumer.process_batch()
+            return db, first, redelivered, rate_before_processing, late
+
+        db, first, redelivered, rate_before_processing, late = asyncio.run(run())
+        self.assertEqual(first['event_id'], 'evt_1')
+        self.assertIsNone(redelivered)
+        self.assertIsNone(late)
+        self.assertEqual(len(db.stripe_events.docs), 1)
+        self.assertEqual(self.handled, ['evt_1'])
+        self.assertEqual(self.metrics.counters['stripe_events.received'], 3)
+        self.assertEqual(self.metrics.counters['stripe_events.duplicate'], 2)
+        self.assertEqual(rate_before_processing, 0.5)
+        self.assertAlmostEqual(self.metrics.gauges['stripe_events.duplicate_rate'], 2 / 3)
+
+    def test_events_run_in_created_order_per_key(self):
+        async def run():
+            db, consumer = await self.make_consumer()
+            for evt in [event('a3', 'sub_a', 30), event('b1', 'sub_b', 15), event('a1', 'sub_a', 10),
+                        event('a2', 'sub_a', 20), event('b2', 'sub_b', 25)]:
+                await consumer.record(evt)
+            seen = await consumer.process_batch()
+            return db, seen
+
+        db, seen = asyncio.run(run())
+        self.assertEqual(seen, 5)
+        self.assertEqual([e for e in self.handled if e.startswith('a')], ['a1', 'a2', 'a3'])
+        self.assertEqual([e for e in self.handled if e.startswith('b')], ['b1', 'b2'])
+        # Keys run concurrently, so their events interleave
+        self.assertNotEqual(self.handled, ['a1', 'a2', 'a3', 'b1', 'b2'])
+        self.assertTrue(all(doc['status'] == 'processed' and doc['processed_at'] for doc in db.stripe_events.docs))
+        # Leases are released once a key is done
+        self.assertEqual(db.stripe_event_locks.docs, [])
+
+    def test_key_leased_by_another_worker_is_skipped_until_expiry(self):
+        async def run():
+            db, consumer = await self.make_consumer()
+            await consumer.record(event('a1', 'sub_a', 1))
+            await consumer.record(event('b1', 'sub_b', 2))
+            await db.stripe_event_locks.insert_one(
+                {'_id': 'sub_a', 'owner': 'other-worker', 'lease_until': utcnow() + timedelta(seconds=60)}
+            )
+            await consumer.process_batch()
+            while_leased = list(self.handled)
+            # The other worker died; its lease runs out
+            db.stripe_event_locks.docs[0]['lease_until'] = utcnow() - timedelta(seconds=1)
+            await consumer.process_batch()
+            return db, while_leased
+
+        db, while_leased = asyncio.run(run())
+        self.assertEqual(while_leased, ['b1'])
+        self.assertEqual(self.handled, ['b1', 'a1'])
+        self.assertEqual(db.stripe_event_locks.docs, [])
+
+    def test_failed_event_blocks_later_events_for_its_key(self):
+        self.failures = {'a1': 1}
+
+        async def run():
+            db, consumer = await self.make_consumer(retry_base_seconds=10)
+            for evt in [event('a1', 'sub_a', 1), event('a2', 'sub_a', 2), event('b1', 'sub_b', 3)]:
+                await consumer.record(evt)
+            await consumer.process_batch()
+            failed = dict(self.status(db, 'a1'))
+            await consumer.process_batch()
+            backing_off = list(self.handled)
+            self.status(db, 'a1')['retry_at'] = utcnow() - timedelta(seconds=1)
+            await consumer.process_batch()
+            return db, failed, backing_off
+
+        db, failed, backing_off = asyncio.run(run())
+        self.assertEqual((failed['status'], failed['attempts'], failed['last_error']), ('pending', 1, 'cannot apply a1'))
+        self.assertAlmostEqual((failed['retry_at'] - utcnow()).total_seconds(), 10, delta=1)
+        self.assertEqual(backing_off, ['b1'])
+        self.assertEqual(self.handled, ['b1', 'a1', 'a2'])
+        self.assertEqual(self.status(db, 'a2')['status'], 'processed')
+
+    def test_event_gives_up_after_max_attempts(self):
+        self.failures = {'a1': 5}
+
+        async def run():
+            db, consumer = await self.make_consumer(max_attempts=2)
+            await consumer.record(event('a1', 'sub_a', 1))
+            await consumer.record(event('a2', 'sub_a', 2))
+            for _ in range(3):
+                await consumer.process_batch()
+                self.status(db, 'a1')['retry_at'] = utcnow() - timedelta(seconds=1)
+            return db
+
+        db = asyncio.run(run())
+        self.assertEqual((self.status(db, 'a1')['status'], self.status(db, 'a1')['attempts']), ('failed', 2))
+        # A failed event stops blocking its key
+        self.assertEqual(self.handled, ['a2'])
+
+    def test_dedup_and_ttl_indexes_are_created(self):
+        async def run():
+            db = FakeDatabase()
+            consumer = StripeEventConsumer(db.stripe_events, db.stripe_event_locks, self.handler,
+                                           dedup_ttl_seconds=3600)
+            manager = IndexManager(db)
+            manager.add('stripe_events', consumer.index_models())
+            await manager.ensure_all()
+            return db.stripe_events.indexes
+
+        indexes = {tuple(index['key']): index for index in asyncio.run(run())}
+        self.assertTrue(indexes[('event_id',)]['unique'])
+        self.assertEqual(indexes[('processed_at',)]['expireAfterSeconds'], 3600)
+        self.assertIn(('ordering_key', 'status', 'created'), indexes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests for the Stripe gateway (backend/stripe_gateway.py) against a local
+stand-in for the Stripe API.
+"""
+
+import sys
+import os
+import asyncio
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import stripe
+
+from fakes import FakeStripeServer
+from stripe_gateway import StripeGateway
+
+
+class TestStripeGateway(unittest.TestCase):
+    def make_gateway(self, server, **kwargs):
+        gateway = StripeGateway('sk_test_gateway', api_base=server.url, **kwargs)
+        self.addCleanup(gateway.shutdown)
+        return gateway
+
+    def test_create_and_retrieve_session(self):
+        globals_before = (stripe.api_key, stripe.api_base, stripe.max_network_retries, stripe.default_http_client)
+
+        async def run(gateway):
+            session = await gateway.create_checkout_session(mode='payment', metadata={'subscription_id': 's1'})
+            return session, await gateway.retrieve_checkout_session(session.id)
+
+        with FakeStripeServer() as server:
+            session, retrieved = asyncio.run(run(self.make_gateway(server)))
+        self.assertEqual(retrieved.id, session.id)
+        self.assertEqual(retrieved.metadata.get('subscription_id'), 's1')
+        self.assertEqual([auth for _, _, auth in server.requests], ['Bearer sk_test_gateway'] * 2)
+        # The gateway's client carries its own configuration
+        self.assertEqual(
+            (stripe.api_key, stripe.api_base, stripe.max_network_retries, stripe.default_http_client),
+            globals_before
+        )
+
+    def test_concurrency_limit(self):
+        async def run(gateway):
+            return await asyncio.gather(*(gateway.create_checkout_session(mode='payment') for _ in range(8)))
+
+        with FakeStripeServer(latency=0.1) as server:
+            started = time.perf_counter()
+            sessions = asyncio.run(run(self.make_gateway(server, max_concurrency=2)))
+            elapsed = time.perf_counter() - started
+        self.assertEqual(len({session.id for session in sessions}), 8)
+        self.assertEqual(server.max_in_flight, 2)
+        # Four rounds of two
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    def test_request_timeout(self):
+        async def run(gateway):
+            with self.assertRaises(asyncio.TimeoutError):
+                await gateway.create_checkout_session(mode='payment')
+
+        with FakeStripeServer(latency=1) as server:
+            gateway = self.make_gateway(server, timeout=0.2, max_network_retries=0)
+            # The HTTP timeout is set on the gateway's own client
+            started = time.perf_counter()
+            with self.assertRaises(stripe.error.APIConnectionError):
+                gateway.client.v1.checkout.sessions.create({'mode': 'payment'})
+            http_elapsed = time.perf_counter() - started
+            # and the call's deadline does not wait for the response either
+            started = time.perf_counter()
+            asyncio.run(run(gateway))
+            call_elapsed = time.perf_counter() - started
+        self.assertLess(http_elapsed, 0.6)
+        self.assertLess(call_elapsed, 0.6)
+
+    def test_deadline_covers_retries(self):
+        gateway = StripeGateway('sk_test_gateway', timeout=0.1, max_network_retries=2)
+        self.addCleanup(gateway.shutdown)
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await gateway.call('slow', time.sleep, 0.5)
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        self.assertAlmostEqual(time.perf_counter() - started, 0.3, delta=0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()